@@ -1,3 +1,6 @@
+from collections.abc import Callable
+from math import ceil
+
 from flask import url_for
 
 from core.database import db
@@ -5,24 +8,37 @@ from core.database import db
 
 class PaginatedAPIMixin(object):
     @staticmethod
-    def to_collection_dict(query, page, per_page, endpoint, **kwargs):
+    def to_collection_dict(query, page, per_page, endpoint, serialize=None,
+                           **kwargs):
         resources = db.paginate(query, page=page, per_page=per_page,
                                 error_out=False)
-        data = {
-            'data': [item.to_dict() for item in resources.items],
+        # serialize permite serializar la pagina completa de una vez
+        # (p. ej. para resolver datos del usuario con una sola consulta)
+        items = (serialize(resources.items) if serialize
+                 else [item.to_dict() for item in resources.items])
+        return PaginatedAPIMixin.collection_dict(
+            items, page, per_page, resources.total,
+            lambda number: url_for(endpoint, page=number, per_page=per_page,
+                                   **kwargs)
+        )
+
+    @staticmethod
+    def collection_dict(items, page, per_page, total,
+                        link: Callable[[int], str]) -> dict:
+        # Misma forma que la paginacion de Flask-SQLAlchemy; link(n) es la
+        # URL de la pagina n (la usa tambien la API asincronica, web/asgi.py)
+        pages = ceil(total / per_page) if total else 0
+        return {
+            'data': items,
             '_meta': {
                 'page': page,
                 'per_page': per_page,
-                'total_pages': resources.pages,
-                'total_items': resources.total
+                'total_pages': pages,
+                'total_items': total
             },
             '_links': {
-                'self': url_for(endpoint, page=page, per_page=per_page,
-                                **kwargs),
-                'next': url_for(endpoint, page=page + 1, per_page=per_page,
-                                **kwargs) if resources.has_next else None,
-                'prev': url_for(endpoint, page=page - 1, per_page=per_page,
-                                **kwargs) if resources.has_prev else None
+                'self': link(page),
+                'next': link(page + 1) if page < pages else None,
+                'prev': link(page - 1) if page > 1 else None
             }
         }
-        return data
\ No newline at end of file
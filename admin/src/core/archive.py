@@ -0,0 +1,320 @@
+"""
+Archivo de las filas eliminadas en tablas frias
+
+Los sitios, imagenes, reviews, etiquetas y usuarios con borrado logico quedan en las
+tablas vivas hasta ``ARCHIVE_AFTER_DAYS`` dias despues de eliminados. ``archive_deleted``
+los mueve despues, junto con lo que depende de ellos, a tablas ``<tabla>_archive`` con las
+mismas columnas mas ``archived_at``. Cada lote corre en su propia transaccion y mueve las
+filas con un unico ``DELETE ... RETURNING`` encadenado a un ``INSERT``, de hijos a padres,
+asi las claves foraneas de las tablas vivas siguen valiendo en todo momento.
+
+Que se mueve con cada fila:
+
+- sitio: imagenes, reviews, modificaciones (con sus tipos), etiquetas, categorias y favoritos
+- etiqueta: sus asociaciones con sitios
+- usuario: sus favoritos. Un usuario con reviews o modificaciones en las tablas vivas no
+  se archiva hasta que esas filas se vayan con su sitio, y sus reclamos de moderacion se liberan
+- imagen y review: nada
+
+``restore`` hace el camino inverso: devuelve la fila con sus dependientes (y los padres
+archivados que hagan falta) tal como estaba, todavia eliminada, y reinicia el ``deleted_at``
+de lo restaurado para que la proxima corrida no lo vuelva a archivar. Las asociaciones solo vuelven si sus
+dos extremos estan en las tablas vivas. Los archivos de las imagenes no se tocan, y el
+resumen de calificaciones de un sitio archivado se descarta (``flask refresh-rating-summaries``
+lo vuelve a calcular).
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from geoalchemy2.types import Geometry
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Table,
+    case,
+    delete,
+    exists,
+    func,
+    insert,
+    select,
+    update,
+)
+from sqlalchemy.engine import Connection
+
+from core.associations import tag_historic_site
+from core.auth.models import User, user_favorite_sites
+from core.database import db
+from core.historic_site.models import (
+    HistoricSite,
+    Image,
+    Modification,
+    ModificationType,
+    category_historic_site,
+    modification_modification_type,
+)
+from core.reviews.models import Review
+from core.tags.models import Tag
+
+site = HistoricSite.__table__
+image = Image.__table__
+review = Review.__table__
+tag = Tag.__table__
+user = User.__table__
+modification = Modification.__table__
+modification_type = ModificationType.__table__
+
+
+def _archive_table(hot: Table) -> Table:
+    """Copia fria de una tabla: mismas columnas y clave primaria, sin defaults, FKs ni indices"""
+    columns = []
+    for column in hot.columns:
+        type_ = column.type
+        if isinstance(type_, Geometry):
+            type_ = Geometry(type_.geometry_type, srid=type_.srid, spatial_index=False)
+        columns.append(Column(
+            column.name, type_, primary_key=column.primary_key, nullable=column.nullable, autoincrement=False,
+        ))
+    return Table(
+        f"{hot.name}_archive",
+        db.metadata,
+        *columns,
+        Column("archived_at", DateTime(timezone=True), server_default=func.now(), nullable=False),
+    )
+
+
+ARCHIVE_TABLES: dict[str, Table] = {
+    hot.name: _archive_table(hot)
+    for hot in (
+        site, image, review, tag, user, modification, modification_type,
+        modification_modification_type, category_historic_site, tag_historic_site, user_favorite_sites,
+    )
+}
+
+# Que se puede restaurar y con que tabla
+KINDS = {"site": site, "image": image, "review": review, "tag": tag, "user": user}
+
+
+def _cold(hot: Table) -> Table:
+    return ARCHIVE_TABLES[hot.name]
+
+
+def _move(conn: Connection, hot: Table, where, counts: Counter, restore: bool = False) -> list:
+    """
+    Mueve de la tabla viva a la fria (o al reves si ``restore``) las filas que cumplen
+    ``where(tabla_origen)`` en una sola sentencia
+
+    Returns:
+        list: claves primarias de las filas movidas
+    """
+    source, target = (_cold(hot), hot) if restore else (hot, _cold(hot))
+    names = [column.name for column in hot.columns]
+    moved = (
+        delete(source)
+        .where(where(source))
+        .returning(*(source.c[name] for name in names))
+        .cte("moved")
+    )
+    values = [moved.c[name] for name in names]
+    if restore and "deleted_at" in hot.c:
+        # Lo restaurado vuelve a contar el plazo desde ahora
+        values[names.index("deleted_at")] = case((moved.c.deleted, func.now()))
+    stmt = (
+        insert(target)
+        .from_select(names, select(*values))
+        .add_cte(moved)
+        .returning(*target.primary_key.columns)
+    )
+    rows = conn.execute(stmt).all()
+    if rows:
+        counts[hot.name] += len(rows)
+    return [row[0] if len(row) == 1 else tuple(row) for row in rows]
+
+
+# Archivo --------------------------------------------------------------------
+def archive_deleted(older_than: timedelta, batch_size: int = 500) -> Counter:
+    """
+    Archiva las filas eliminadas hace mas de ``older_than``, de a ``batch_size`` por transaccion
+
+    Returns:
+        Counter: filas archivadas por tabla
+    """
+    counts = Counter()
+    # Primero los sitios: se llevan las reviews y modificaciones que frenan a los usuarios
+    for hot, archive_batch in (
+        (site, _archive_sites),
+        (review, _archive_leaves),
+        (image, _archive_leaves),
+        (tag, _archive_tags),
+        (user, _archive_users),
+    ):
+        while True:
+            with db.engine.begin() as conn:
+                ids = _candidates(conn, hot, older_than, batch_size)
+                if not ids:
+                    break
+                archive_batch(conn, hot, ids, counts)
+    return counts
+
+
+def _candidates(conn: Connection, hot: Table, older_than: timedelta, limit: int) -> list[int]:
+    """Ids eliminados hace mas de ``older_than``, bloqueados para este lote"""
+    stmt = (
+        select(hot.c.id)
+        .where(hot.c.deleted == True, hot.c.deleted_at < func.now() - older_than)
+        .order_by(hot.c.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    if hot is user:
+        # Las reviews y modificaciones vivas lo siguen referenciando
+        stmt = stmt.where(
+            ~exists().where(review.c.user_id == user.c.id),
+            ~exists().where(modification.c.id_user == user.c.id),
+        )
+    return list(conn.scalars(stmt))
+
+
+def _archive_sites(conn: Connection, hot: Table, site_ids: list[int], counts: Counter) -> None:
+    for association in (user_favorite_sites, tag_historic_site, category_historic_site):
+        _move(conn, association, lambda t: t.c.id_historic_site.in_(site_ids), counts)
+    _move(conn, image, lambda t: t.c.id_historic_site.in_(site_ids), counts)
+    _move(conn, review, lambda t: t.c.historic_site_id.in_(site_ids), counts)
+
+    site_modifications = select(modification.c.id).where(modification.c.id_historic_site.in_(site_ids))
+    links = _move(conn, modification_modification_type, lambda t: t.c.id_modification.in_(site_modifications), counts)
+    _move(conn, modification, lambda t: t.c.id_historic_site.in_(site_ids), counts)
+    type_ids = {type_id for _, type_id in links}
+    if type_ids:
+        _move(conn, modification_type, lambda t: t.c.id.in_(type_ids) & ~exists().where(
+            modification_modification_type.c.id_modification_type == t.c.id
+        ), counts)
+
+    _move(conn, site, lambda t: t.c.id.in_(site_ids), counts)
+
+
+def _archive_leaves(conn: Connection, hot: Table, ids: list[int], counts: Counter) -> None:
+    _move(conn, hot, lambda t: t.c.id.in_(ids), counts)
+
+
+def _archive_tags(conn: Connection, hot: Table, tag_ids: list[int], counts: Counter) -> None:
+    _move(conn, tag_historic_site, lambda t: t.c.id_tag.in_(tag_ids), counts)
+    _move(conn, tag, lambda t: t.c.id.in_(tag_ids), counts)
+
+
+def _archive_users(conn: Connection, hot: Table, user_ids: list[int], counts: Counter) -> None:
+    conn.execute(
+        update(review).where(review.c.claimed_by.in_(user_ids)).values(claimed_by=None, claimed_until=None)
+    )
+    _move(conn, user_favorite_sites, lambda t: t.c.id_user.in_(user_ids), counts)
+    _move(conn, user, lambda t: t.c.id.in_(user_ids), counts)
+
+
+# Restauracion ---------------------------------------------------------------
+def restore(kind: str, row_id: int) -> Counter:
+    """
+    Devuelve a las tablas vivas una fila archivada de ``KINDS`` con sus dependientes
+
+    Raises:
+        ValueError: no hay una fila archivada de ese tipo con ese id
+
+    Returns:
+        Counter: filas restauradas por tabla
+    """
+    counts = Counter()
+    with db.engine.begin() as conn:
+        if not _RESTORERS[kind](conn, row_id, counts):
+            raise ValueError(f"No hay un {kind} archivado con id {row_id}.")
+    return counts
+
+
+def _is_archived(conn: Connection, hot: Table, row_id: int) -> bool:
+    return conn.scalar(select(exists().where(_cold(hot).c.id == row_id)))
+
+
+def _restore_user(conn: Connection, user_id: int, counts: Counter) -> bool:
+    if not _move(conn, user, lambda t: t.c.id == user_id, counts, restore=True):
+        return False
+    _move(conn, user_favorite_sites, lambda t: (t.c.id_user == user_id) & t.c.id_historic_site.in_(select(site.c.id)),
+          counts, restore=True)
+    return True
+
+
+def _restore_tag(conn: Connection, tag_id: int, counts: Counter) -> bool:
+    archived = _cold(tag)
+    name = conn.scalar(select(archived.c.name).where(archived.c.id == tag_id))
+    if name is None:
+        return False
+    if conn.scalar(select(exists().where(tag.c.name == name))):
+        raise ValueError(f"Ya existe una etiqueta con el nombre '{name}'.")
+    _move(conn, tag, lambda t: t.c.id == tag_id, counts, restore=True)
+    _move(conn, tag_historic_site, lambda t: (t.c.id_tag == tag_id) & t.c.id_historic_site.in_(select(site.c.id)),
+          counts, restore=True)
+    return True
+
+
+def _restore_site(conn: Connection, site_id: int, counts: Counter) -> bool:
+    if not _move(conn, site, lambda t: t.c.id == site_id, counts, restore=True):
+        return False
+
+    # Autores de sus reviews y modificaciones que tambien se archivaron
+    archived_reviews, archived_modifications = _cold(review), _cold(modification)
+    authors = select(archived_reviews.c.user_id).where(archived_reviews.c.historic_site_id == site_id).union(
+        select(archived_modifications.c.id_user).where(archived_modifications.c.id_historic_site == site_id)
+    )
+    for user_id in conn.scalars(select(_cold(user).c.id).where(_cold(user).c.id.in_(authors))).all():
+        _restore_user(conn, user_id, counts)
+
+    _move(conn, image, lambda t: t.c.id_historic_site == site_id, counts, restore=True)
+    _move(conn, review, lambda t: t.c.historic_site_id == site_id, counts, restore=True)
+    modification_ids = _move(conn, modification, lambda t: t.c.id_historic_site == site_id, counts, restore=True)
+    if modification_ids:
+        archived_links = _cold(modification_modification_type)
+        type_ids = select(archived_links.c.id_modification_type).where(
+            archived_links.c.id_modification.in_(modification_ids)
+        )
+        _move(conn, modification_type, lambda t: t.c.id.in_(type_ids), counts, restore=True)
+        _move(conn, modification_modification_type, lambda t: t.c.id_modification.in_(modification_ids),
+              counts, restore=True)
+
+    archived_tags = _cold(tag_historic_site)
+    for tag_id in conn.scalars(select(archived_tags.c.id_tag).where(
+        archived_tags.c.id_historic_site == site_id, archived_tags.c.id_tag.in_(select(_cold(tag).c.id))
+    )).all():
+        _restore_tag(conn, tag_id, counts)
+    _move(conn, tag_historic_site, lambda t: (t.c.id_historic_site == site_id) & t.c.id_tag.in_(select(tag.c.id)),
+          counts, restore=True)
+    # Las categorias no se archivan
+    _move(conn, category_historic_site, lambda t: t.c.id_historic_site == site_id, counts, restore=True)
+    _move(conn, user_favorite_sites, lambda t: (t.c.id_historic_site == site_id) & t.c.id_user.in_(select(user.c.id)),
+          counts, restore=True)
+    return True
+
+
+def _restore_leaf(hot: Table, site_column: str):
+    """Restaurador de imagenes y reviews: si su sitio esta archivado, se restaura el sitio entero"""
+
+    def restore_leaf(conn: Connection, row_id: int, counts: Counter) -> bool:
+        archived = _cold(hot)
+        site_id = conn.scalar(select(archived.c[site_column]).where(archived.c.id == row_id))
+        if site_id is None:
+            return False
+        if _is_archived(conn, site, site_id):
+            return _restore_site(conn, site_id, counts)
+        if hot is review:
+            user_id = conn.scalar(select(archived.c.user_id).where(archived.c.id == row_id))
+            if _is_archived(conn, user, user_id):
+                _restore_user(conn, user_id, counts)
+        _move(conn, hot, lambda t: t.c.id == row_id, counts, restore=True)
+        return True
+
+    return restore_leaf
+
+
+_RESTORERS = {
+    "site": _restore_site,
+    "image": _restore_leaf(image, "id_historic_site"),
+    "review": _restore_leaf(review, "historic_site_id"),
+    "tag": _restore_tag,
+    "user": _restore_user,
+}
@@ -1,10 +1,10 @@
 from datetime import datetime
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, Index, String
+from sqlalchemy import Boolean, DateTime, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import expression
 
-from core.database import db
+from core.database import SoftDeleteMixin, db
 from core.encription import bcrypt
 
 user_favorite_sites = db.Table(
@@ -23,10 +23,12 @@ user_favorite_sites = db.Table(
         primary_key=True,
     ),
     db.Column("deleted", db.Boolean, default=False),
+    # Favoritos vigentes de un usuario; la clave primaria tambien indexa los quitados
+    Index("ix_user_favorite_sites_live", "id_user", "id_historic_site", postgresql_where=expression.text("NOT deleted")),
 )
 
 
-class User(db.Model):
+class User(db.Model, SoftDeleteMixin):
     __tablename__ = "users"
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     email: Mapped[str] = mapped_column(String, nullable=False)
@@ -48,8 +50,14 @@ class User(db.Model):
     modifications: Mapped[list["Modification"]] = relationship(backref="user")
     favorites: Mapped[list["HistoricSite"]] = relationship(secondary=user_favorite_sites)
     deleted: Mapped[bool] = mapped_column(Boolean, default=False)
-    reviews: Mapped[list["Review"]] = relationship(back_populates="user")
+    reviews: Mapped[list["Review"]] = relationship(
+        back_populates="user", foreign_keys="Review.user_id"
+    )
     avatar: Mapped[str | None] = mapped_column(String, nullable=True)
+    # Se incrementa con cada cambio de perfil, rol o estado; los JWT la llevan como claim
+    profile_version: Mapped[int] = mapped_column(
+        Integer, default=1, server_default="1", nullable=False
+    )
 
 
     # índice único solo si deleted = false
@@ -61,6 +69,8 @@ class User(db.Model):
             unique=True,
             postgresql_where=expression.false() == expression.column("deleted"),
         ),
+        # Eliminados a archivar (core.archive)
+        Index("ix_users_deleted_at", "deleted_at", postgresql_where=expression.text("deleted")),
     )
 
     def set_password(self, password: str):
@@ -82,8 +92,8 @@ class User(db.Model):
             "name": self.name,
             "last_name": self.last_name,
             "avatar": self.avatar,
-            "inserted_at": self.inserted_at.isoformat(),
-            "updated_at": self.updated_at.isoformat(),
+            "inserted_at": self.inserted_at,
+            "updated_at": self.updated_at,
         }
 
     def __repr__(self):
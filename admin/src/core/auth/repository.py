@@ -1,9 +1,11 @@
 
 from flask import current_app
-from sqlalchemy import select
+from sqlalchemy import Select, delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import joinedload
 
-from core.auth.models import Permission, Role, Role_Permission, User
+from core.auth.models import Permission, Role, Role_Permission, User, user_favorite_sites
+from core.cache import LRUCache
 from core.database import db
 from sqlalchemy.exc import IntegrityError
 import secrets
@@ -50,7 +52,7 @@ def get_user(user_id: int) -> User | None:
     stmt = (
         select(User)
         .options(joinedload(User.role))
-        .where(User.id == user_id, User.deleted == False)
+        .where(User.id == user_id)
     )
     return db.session.scalar(stmt)
 
@@ -68,12 +70,68 @@ def get_user_by_email(email: str) -> User | None:
     stmt = (
         select(User)
         .options(joinedload(User.role))
-        .where(User.email == email, User.deleted == False)
+        .where(User.email == email)
     )
     return db.session.scalar(stmt)
 
 
 # asignaciones
+# claims de perfil ----------------------------
+# Claims que viajan en el JWT ademas de la identidad
+PROFILE_CLAIMS = ("email", "name", "last_name", "avatar", "role", "ver")
+
+_profile_versions = LRUCache("user_profile_versions", maxsize=10000)
+
+
+def profile_claims(user: User) -> dict:
+    """
+    Arma los claims de perfil que se agregan al JWT del usuario.
+
+    Parámetros:
+        user (User): Usuario dueño del token.
+
+    Retorna:
+        dict: Datos de perfil, rol y la version del perfil ("ver").
+    """
+    return {
+        "email": user.email,
+        "name": user.name,
+        "last_name": user.last_name,
+        "avatar": user.avatar,
+        "role": user.role.name if user.role else None,
+        "ver": user.profile_version,
+    }
+
+
+def get_profile_version(user_id: int) -> int | None:
+    """
+    Obtiene la version actual del perfil de un usuario.
+
+    Se cachea en memoria (USER_VERSION_CACHE_TTL segundos) y se invalida en las
+    escrituras de este modulo, asi validar un token no consulta la base en cada request.
+
+    Parámetros:
+        user_id (int): ID del usuario.
+
+    Retorna:
+        int: La version del perfil, o None si el usuario no existe o está eliminado.
+    """
+    return _profile_versions.get_or_set(
+        user_id,
+        lambda: db.session.scalar(
+            select(User.profile_version).where(User.id == user_id)
+        ),
+        ttl=current_app.config.get("USER_VERSION_CACHE_TTL"),
+    )
+
+
+def _commit_profile_change(user: User) -> None:
+    """Confirma un cambio que afecta los claims del usuario e invalida los tokens emitidos antes"""
+    user.profile_version = (user.profile_version or 0) + 1
+    db.session.commit()
+    _profile_versions.delete(user.id)
+
+
 def assign_role(user: User, role: Role) -> User:
     """
     Asigna un rol a un usuario y guarda el cambio en la base de datos.
@@ -86,7 +144,7 @@ def assign_role(user: User, role: Role) -> User:
         User: El usuario actualizado con el nuevo rol.
     """
     user.role = role
-    db.session.commit()
+    _commit_profile_change(user)
     return user
 
 
@@ -110,7 +168,7 @@ def unassign_role(user: User) -> User:
         raise ValueError("No existe el rol 'Usuario público' para desasignar.")
     user.role = default_role
     user.id_role = default_role.id_role
-    db.session.commit()
+    _commit_profile_change(user)
     return user
 
 
@@ -179,7 +237,7 @@ def block_user(user_id: int) -> User | None:
     if user.role and user.role.name == "Administrador":
         raise ValueError("No se puede bloquear a un administrador")
     user.enabled = False
-    db.session.commit()
+    _commit_profile_change(user)
     return user
 
 
@@ -198,7 +256,7 @@ def unblock_user(user_id: int) -> User | None:
     if not user or is_deleted(user):
         return None
     user.enabled = True
-    db.session.commit()
+    _commit_profile_change(user)
     return user
 
 
@@ -302,7 +360,7 @@ def list_users() -> list[User]:
     Retorna:
         list[User]: Lista de objetos User.
     """
-    return db.session.query(User).filter(User.deleted == False).all()
+    return db.session.query(User).all()
 
 
 def create_user(**kwargs) -> User:
@@ -358,7 +416,7 @@ def update_user(user_id: int, **kwargs) -> User | None:
     if password:
         user.set_password(password)
 
-    db.session.commit()
+    _commit_profile_change(user)
     return user
 
 
@@ -384,7 +442,7 @@ def delete_user(user_id: int) -> User | None:
     if user.role and user.role.name == "Administrador":
         raise ValueError("No se puede eliminar a un administrador")
     user.deleted = True
-    db.session.commit()
+    _commit_profile_change(user)
     return user
 
 
@@ -418,6 +476,100 @@ def has_permission(user: User, permission_name: str) -> bool:
     return role_permission is not None
 
 
+# favoritos --------------------------------------
+
+
+def add_favorite(user_id: int, site_id: int) -> None:
+    """
+    Marca un sitio como favorito del usuario.
+
+    Es un único INSERT ... ON CONFLICT DO NOTHING, así que no depende de
+    cuántos favoritos tenga el usuario y es idempotente.
+
+    Parámetros:
+        user_id (int): ID del usuario.
+        site_id (int): ID del sitio histórico.
+    """
+    stmt = (
+        pg_insert(user_favorite_sites)
+        .values(id_user=user_id, id_historic_site=site_id, deleted=False)
+        .on_conflict_do_nothing()
+    )
+    db.session.execute(stmt)
+    db.session.commit()
+
+
+def remove_favorite(user_id: int, site_id: int) -> None:
+    """
+    Quita un sitio de los favoritos del usuario con un único DELETE.
+
+    Parámetros:
+        user_id (int): ID del usuario.
+        site_id (int): ID del sitio histórico.
+    """
+    stmt = delete(user_favorite_sites).where(
+        user_favorite_sites.c.id_user == user_id,
+        user_favorite_sites.c.id_historic_site == site_id,
+    )
+    db.session.execute(stmt)
+    db.session.commit()
+
+
+def get_favorite_site_ids(user_id: int) -> list[int]:
+    """
+    Obtiene los IDs de los sitios favoritos del usuario, ordenados.
+
+    Parámetros:
+        user_id (int): ID del usuario.
+
+    Retorna:
+        list[int]: IDs de los sitios favoritos.
+    """
+    stmt = (
+        select(user_favorite_sites.c.id_historic_site)
+        .where(
+            user_favorite_sites.c.id_user == user_id,
+            user_favorite_sites.c.deleted == False,
+        )
+        .order_by(user_favorite_sites.c.id_historic_site)
+    )
+    return list(db.session.scalars(stmt))
+
+
+def get_favorite_ids_among(user_id: int, site_ids: list[int]) -> set[int]:
+    """
+    Indica cuáles de los sitios dados son favoritos del usuario.
+
+    Parámetros:
+        user_id (int): ID del usuario.
+        site_ids (list[int]): IDs de los sitios a consultar.
+
+    Retorna:
+        set[int]: IDs (entre los dados) que el usuario marcó como favoritos.
+    """
+    if not site_ids:
+        return set()
+    return set(db.session.scalars(favorite_ids_query(user_id, site_ids)))
+
+
+def favorite_ids_query(user_id: int, site_ids: list[int]) -> Select:
+    """
+    Consulta de get_favorite_ids_among, compartida con la API asincronica (web/asgi.py).
+
+    Parámetros:
+        user_id (int): ID del usuario.
+        site_ids (list[int]): IDs de los sitios a consultar.
+
+    Retorna:
+        Select: consulta de los IDs (entre los dados) marcados como favoritos.
+    """
+    return select(user_favorite_sites.c.id_historic_site).where(
+        user_favorite_sites.c.id_user == user_id,
+        user_favorite_sites.c.id_historic_site.in_(site_ids),
+        user_favorite_sites.c.deleted == False,
+    )
+
+
 def upsert_user_from_google(email: str, name: str, picture: str | None) -> User:
     """
     Crea o actualiza un usuario autenticado con Google.
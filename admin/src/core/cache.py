@@ -0,0 +1,93 @@
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+_MISSING = object()
+_caches: "weakref.WeakSet[LRUCache]" = weakref.WeakSet()
+
+
+class LRUCache:
+    """
+    Cache en memoria del proceso, thread-safe, con desalojo LRU y expiracion opcional
+
+    Cada worker tiene su propia copia: la invalidacion explicita solo alcanza al proceso
+    que hizo la escritura, por eso conviene usar un ``ttl`` que acote lo desactualizado
+    que puede quedar el resto.
+    """
+
+    def __init__(self, name: str, maxsize: int = 128, ttl: float | None = None) -> None:
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, tuple[float | None, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        _caches.add(self)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Devuelve el valor de la clave, o ``default`` si no esta o ya vencio"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        """Guarda un valor, desalojando el menos usado si se supera ``maxsize``"""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any], ttl: float | None = None) -> Any:
+        """Devuelve el valor cacheado o lo calcula con ``factory`` y lo guarda"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value, ttl)
+        return value
+
+    def delete(self, key: Hashable) -> None:
+        """Elimina una clave si existe"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Vacia la cache"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """Tamaño actual y contadores de aciertos y fallos"""
+        with self._lock:
+            return {
+                "name": self.name,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def all_caches() -> list[LRUCache]:
+    """Devuelve las caches vivas del proceso"""
+    return list(_caches)
+
+
+def clear_all() -> None:
+    """Vacia todas las caches del proceso"""
+    for cache in all_caches():
+        cache.clear()
@@ -1,15 +1,205 @@
+import random
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import current_app, g, has_request_context, request
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Boolean, DateTime, event, func, inspect, orm, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+# Cookie que mantiene al cliente en el primario despues de escribir (read-your-writes)
+STICKY_COOKIE = "db_primary"
+
+# Argumentos de bind para escrituras que el cliente no necesita leer enseguida (contador de
+# visitas, documento del detalle guardado al leerlo): no activan la lectura desde el primario
+NOT_STICKY = {"sticky": False}
+
+# Segundos de atraso de la replica; 0 si ya aplico todo lo recibido o si no es una replica
+_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class RoutingSession(Session):
+    """
+    Sesion que manda las lecturas a una replica cuando la request la eligio (``g.db_replica``)
+
+    Los flush, las sentencias DML y los SELECT ... FOR UPDATE van siempre al primario, y
+    a partir de la primera escritura el resto de la request tambien, para que lea lo que escribio.
+    Las escrituras ejecutadas con ``bind_arguments=NOT_STICKY`` van al primario sin fijar
+    la request ni al cliente en el.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, sticky=True, **kwargs):
+        if bind is None and has_request_context():
+            if self._flushing or not _is_plain_read(clause):
+                if sticky:
+                    g.db_wrote = True
+            elif g.get("db_replica") and not g.get("db_wrote"):
+                return self._db.engines[g.db_replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _is_plain_read(clause) -> bool:
+    """Indica si la sentencia es un SELECT que no bloquea filas"""
+    return (
+        clause is not None
+        and getattr(clause, "is_select", False)
+        and getattr(clause, "_for_update_arg", None) is None
+    )
+
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+# Opcion de ejecucion para que una consulta vea tambien las filas eliminadas
+INCLUDE_DELETED = {"include_deleted": True}
+
+
+class SoftDeleteMixin:
+    """
+    Marca los modelos con borrado logico (columna ``deleted``)
+
+    Las consultas ORM de cualquier sesion solo ven sus filas activas, tambien en los joins,
+    subconsultas y colecciones cargadas a partir de ellas. Las referencias a un solo objeto
+    (``review.user``, ``image.historic_site``) lo cargan aunque este eliminado: una fila
+    activa puede apuntar a una eliminada (la review de un usuario dado de baja) y la
+    referencia no debe quedar en None. Para incluir las eliminadas se
+    ejecuta la consulta con ``execution_options=INCLUDE_DELETED``. No alcanza a los
+    UPDATE/DELETE ni a las tablas de asociacion, que siguen filtrando ``deleted`` a mano.
+
+    ``deleted_at`` se completa al marcar la fila como eliminada y se limpia al restaurarla;
+    ``core.archive`` la usa para mover a las tablas frias las eliminadas hace tiempo.
+    """
 
-db = SQLAlchemy()
+    # Los modelos pueden redefinir la columna (por ejemplo con nullable=False)
+    deleted: Mapped[bool] = mapped_column(Boolean, default=False)
+    deleted_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+@event.listens_for(orm.Session, "do_orm_execute")
+def _hide_deleted_rows(state: orm.ORMExecuteState) -> None:
+    # Los refrescos de atributos de un objeto ya cargado no deben filtrarlo, y de las cargas
+    # de relaciones solo se filtran las colecciones: las referencias muchos a uno siempre
+    # resuelven. Por eso el criterio no se propaga a los loaders de los objetos traidos
+    if (
+        not state.is_select
+        or state.is_column_load
+        or state.execution_options.get("include_deleted", False)
+    ):
+        return
+    if state.is_relationship_load and not state.loader_strategy_path.prop.uselist:
+        return
+    state.statement = state.statement.options(
+        orm.with_loader_criteria(
+            SoftDeleteMixin,
+            lambda cls: cls.deleted == False,
+            include_aliases=True,
+            propagate_to_loaders=False,
+        )
+    )
+
+
+@event.listens_for(orm.Session, "before_flush")
+def _stamp_deleted_at(session: orm.Session, flush_context, instances) -> None:
+    for obj in session.dirty:
+        if isinstance(obj, SoftDeleteMixin) and inspect(obj).attrs.deleted.history.has_changes():
+            obj.deleted_at = func.now() if obj.deleted else None
+
+
+_replica_lag: dict[str, tuple[float, float]] = {}
+_replica_lag_lock = threading.Lock()
 
 
 def init_app(app):
     db.init_app(app)
+    app.after_request(_stick_to_primary_after_write)
     return db
 
 
+def replica_keys() -> list[str]:
+    """Binds de replicas configurados (ver ``SQLALCHEMY_BINDS``)"""
+    return [key for key in db.engines if key and key.startswith("replica")]
+
+
+def use_replica() -> None:
+    """
+    Envia las lecturas de la request actual a una replica sana, salvo que el cliente
+    haya escrito hace poco. Si no hay replicas o todas atrasan, se queda en el primario
+    """
+    if request.cookies.get(STICKY_COOKIE):
+        return
+    healthy = [
+        key for key in replica_keys()
+        if replica_lag(key) <= current_app.config["REPLICA_MAX_LAG_SECONDS"]
+    ]
+    if healthy:
+        g.db_replica = random.choice(healthy)
+
+
+@contextmanager
+def use_primary() -> Iterator[None]:
+    """
+    Lee del primario dentro del bloque aunque la request haya elegido una replica, sin fijar
+    al cliente en el. Para lo que se arma a partir de lo leido y se guarda como vigente
+    (documentos del detalle): una replica atrasada lo dejaria armado con datos viejos
+    """
+    replica = g.pop("db_replica", None) if has_request_context() else None
+    try:
+        yield
+    finally:
+        if replica is not None:
+            g.db_replica = replica
+
+
+def replica_lag(key: str) -> float:
+    """
+    Atraso en segundos de una replica, medido como mucho cada
+    ``REPLICA_LAG_CHECK_SECONDS``. Una replica que no responde cuenta como infinitamente atrasada
+    """
+    now = time.monotonic()
+    with _replica_lag_lock:
+        checked_at, lag = _replica_lag.get(key, (None, None))
+    if checked_at is not None and now - checked_at < current_app.config["REPLICA_LAG_CHECK_SECONDS"]:
+        return lag
+    try:
+        with db.engines[key].connect() as conn:
+            lag = float(conn.execute(_LAG_QUERY).scalar() or 0)
+    except Exception:
+        current_app.logger.warning("replica %s unavailable, reading from primary", key, exc_info=True)
+        lag = float("inf")
+    with _replica_lag_lock:
+        _replica_lag[key] = (now, lag)
+    return lag
+
+
+def _stick_to_primary_after_write(response):
+    """
+    Si la request escribio, el cliente lee del primario durante ``REPLICA_STICKY_SECONDS``.
+    Las respuestas publicas no llevan la cookie: una cache compartida se la serviria a todos
+    """
+    if g.get("db_wrote") and replica_keys() and not response.cache_control.public:
+        response.set_cookie(
+            STICKY_COOKIE,
+            "1",
+            max_age=current_app.config["REPLICA_STICKY_SECONDS"],
+            httponly=True,
+            samesite=current_app.config.get("JWT_COOKIE_SAMESITE", "Lax"),
+            secure=current_app.config.get("JWT_COOKIE_SECURE", False),
+        )
+    return response
+
+
 def reset_db():
+    from core import migrations
+
     print("Resetting database...")
     db.metadata.drop_all(bind=db.engine)
     db.metadata.create_all(bind=db.engine)
+    # create_all ya deja el esquema de la ultima migracion
+    migrations.stamp(db.engine)
     print("Database reset complete.")
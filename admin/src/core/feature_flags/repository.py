@@ -1,5 +1,6 @@
 from datetime import UTC, datetime, timedelta
 
+from core import signals
 from core.database import db
 from core.feature_flags.models import FeatureFlag, Flag
 
@@ -19,6 +20,7 @@ def create_flag(**data):
     flag = FeatureFlag(**data)
     db.session.add(flag)
     db.session.commit()
+    signals.flag_changed.send(FeatureFlag, flag_ids=[flag.id])
     return flag
 
 
@@ -33,6 +35,7 @@ def update_flag(flag_id, enabled, modified_by=None, maintenance_message=None):
         if maintenance_message is not None:
             flag.maintenance_message = maintenance_message
         db.session.commit()
+        signals.flag_changed.send(FeatureFlag, flag_ids=[flag.id])
     return flag
 
 
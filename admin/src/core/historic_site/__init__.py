@@ -1,5 +1,5 @@
 from geoalchemy2 import WKTElement
-from marshmallow import Schema, fields, validate, validates, ValidationError
+from marshmallow import Schema, fields, post_load, validate, validates, ValidationError
 
 from core.historic_site import repository
 
@@ -64,6 +64,27 @@ class HistoricSiteQuerySchema(Schema):
             raise ValidationError("Must be a valid longitude")
 
 
+class SiteIdsQuerySchema(Schema):
+    """Schema para validar la lista de ids de /api/sites/batch (``ids=1,2,3``)."""
+
+    ids = fields.Str(required=True)
+
+    def __init__(self, max_ids: int, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.max_ids = max_ids
+
+    @validates("ids")
+    def validate_ids(self, value: str, data_key: str) -> None:
+        ids = [part.strip() for part in value.split(",")]
+        if not all(part.isdigit() for part in ids):
+            raise ValidationError("Must be a comma separated list of ids")
+        if len(ids) > self.max_ids:
+            raise ValidationError(f"Must have at most {self.max_ids} ids")
+
+    @post_load
+    def split_ids(self, data: dict, **kwargs) -> dict:
+        data["ids"] = [int(part) for part in data["ids"].split(",")]
+        return data
 
 
 def prepare_site_data(json: dict, tags_repository) -> dict:
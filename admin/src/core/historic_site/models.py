@@ -1,18 +1,18 @@
-from geoalchemy2.shape import to_shape
+from flask import current_app, url_for
 from geoalchemy2.types import Geometry
 from shapely.geometry import Point
-from sqlalchemy import Boolean, DateTime, ForeignKey, Index, Integer, String
-from sqlalchemy.dialects.postgresql import ENUM
+from sqlalchemy import Boolean, DateTime, Float, ForeignKey, Index, Integer, LargeBinary, String
+from sqlalchemy.dialects.postgresql import ARRAY, ENUM
 from sqlalchemy.orm import Mapped, mapped_column, relationship, column_property
 from sqlalchemy.sql import func, select, expression
 
 from core import PaginatedAPIMixin
 from core.associations import tag_historic_site
-from core.database import db
-from core.reviews.models import Review
+from core.database import SoftDeleteMixin, db
+from core.reviews.models import Review, SiteRatingSummary
 
 
-class HistoricSite(db.Model, PaginatedAPIMixin):
+class HistoricSite(db.Model, SoftDeleteMixin, PaginatedAPIMixin):
     __tablename__ = "historic_site"
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
@@ -41,13 +41,25 @@ class HistoricSite(db.Model, PaginatedAPIMixin):
     )
 
     reviews: Mapped[list["Review"]] = relationship(back_populates="historic_site",cascade="all, delete-orphan")
-    rating = column_property( select(func.avg(Review.rating))
-                             .where(Review.historic_site_id == id)
-                             .correlate_except(Review)
-                             .scalar_subquery() 
+    rating_summary: Mapped["SiteRatingSummary | None"] = relationship(
+        lazy="selectin", viewonly=True
+    )
+    # Promedio de reviews aprobadas, leido del resumen precalculado
+    rating = column_property(
+        select(
+            SiteRatingSummary.rating_sum * 1.0
+            / func.nullif(SiteRatingSummary.total, 0)
+        )
+        .where(SiteRatingSummary.historic_site_id == id)
+        .correlate_except(SiteRatingSummary)
+        .scalar_subquery()
     )
 
     visit_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    # Coordenadas calculadas por PostGIS al leer la fila, sin decodificar el WKB en Python
+    lat = column_property(func.ST_Y(location))
+    lon = column_property(func.ST_X(location))
     
     __table_args__ = (
         Index(
@@ -56,6 +68,10 @@ class HistoricSite(db.Model, PaginatedAPIMixin):
             unique=True,
             postgresql_where=expression.false() == expression.column("deleted"),
         ),
+        # Listado del panel ordenado por fecha de alta; solo filas activas
+        Index("ix_historic_site_live_inserted_at", "inserted_at", postgresql_where=expression.text("NOT deleted")),
+        # Eliminados a archivar (core.archive)
+        Index("ix_historic_site_deleted_at", "deleted_at", postgresql_where=expression.text("deleted")),
     )
 
     images: Mapped[list["Image"]] = relationship(
@@ -75,28 +91,16 @@ class HistoricSite(db.Model, PaginatedAPIMixin):
         onupdate=db.func.now(),
     )
 
-    @property
-    def lat(self) -> float:
-        """Devuelve la latitud del punto"""
-        if self.location:
-            point = to_shape(self.location)
-            return point.y  # latitude
-        return None
+    def to_dict(self, detail: bool = False, reviews: list["Review"] | None = None) -> dict:
+        """Convierte el objeto sitio histórico a un diccionario
 
-    @property
-    def lon(self) -> float:
-        """Devuelve la longitud del punto"""
-        if self.location:
-            point = to_shape(self.location)
-            return point.x  # longitude
-        return None
-    
-    def to_dict(self) -> dict:
-        """Convierte el objeto sitio histórico a un diccionario"""
+        El detalle embebe solo las primeras reviews aprobadas (``API_EMBEDDED_REVIEWS``)
+        y el enlace a la pagina siguiente; los listados no embeben reviews.
+        """
         images_list = [
             img.to_dict() for img in self.active_images
         ]
-        return {
+        data = {
             "id": self.id,
             "name": self.name,
             "short_description": self.short_description,
@@ -109,11 +113,15 @@ class HistoricSite(db.Model, PaginatedAPIMixin):
             "inauguration_year": self.inauguration_year,
             "category": [cat.name for cat in self.category],
             "tags": [tag.name for tag in self.tags],
-            "inserted_at": self.inserted_at.isoformat(),
-            "updated_at": self.updated_at.isoformat(),
+            "inserted_at": self.inserted_at,
+            "updated_at": self.updated_at,
             "user_id": self.modifications[0].id_user,
             "rating": float(self.rating) if self.rating is not None else None,
-            "reviews":[review.to_dict() for review in self.reviews if not review.deleted],
+            "rating_summary": (
+                self.rating_summary.to_dict()
+                if self.rating_summary
+                else SiteRatingSummary.empty_dict()
+            ),
             "visit_count": self.visit_count,
             "cover_image": {
                 "url": self.cover_image.image,
@@ -122,6 +130,33 @@ class HistoricSite(db.Model, PaginatedAPIMixin):
             "images_list": images_list,
             # "visible": self.visible, # TODO: Preguntar si el sitio no esta visible deberia devolverlo la api
         }
+        if detail:
+            data.update(self._embedded_reviews(reviews))
+        return data
+
+    def _embedded_reviews(self, reviews: list["Review"] | None = None) -> dict:
+        """Primeras reviews aprobadas del sitio y enlace al resto del listado paginado"""
+        from core.reviews import repository as reviews_repo
+
+        limit = current_app.config.get("API_EMBEDDED_REVIEWS", 5)
+        if reviews is None:
+            reviews = reviews_repo.latest_approved_reviews([self.id], limit)[self.id]
+        total = self.rating_summary.total if self.rating_summary else 0
+        return {
+            "reviews": [review.to_dict() for review in reviews],
+            "reviews_next": url_for(
+                "api_bp.get_all_site_reviews", site_id=self.id, page=2, per_page=limit
+            ) if total > limit else None,
+        }
+
+    @classmethod
+    def detail_dicts(cls, sites: list["HistoricSite"]) -> list[dict]:
+        """Serializa el detalle de varios sitios trayendo sus reviews en una sola consulta"""
+        from core.reviews import repository as reviews_repo
+
+        limit = current_app.config.get("API_EMBEDDED_REVIEWS", 5)
+        reviews = reviews_repo.latest_approved_reviews([site.id for site in sites], limit)
+        return [site.to_dict(detail=True, reviews=reviews[site.id]) for site in sites]
         
     @property
     def cover_image(self):
@@ -144,6 +179,85 @@ class HistoricSite(db.Model, PaginatedAPIMixin):
         )
 
 
+class SiteCard(db.Model, PaginatedAPIMixin):
+    """
+    Proyeccion desnormalizada de un sitio para los listados del portal: una fila por
+    sitio no eliminado con sus tags, portada y calificacion ya resueltas, para filtrar
+    y ordenar sin joins. La mantiene ``historic_site.repository.refresh_site_cards``
+
+    Tambien guarda el documento JSON del detalle del sitio (ver
+    ``historic_site.repository.get_site_document``)
+    """
+
+    __tablename__ = "site_card"
+
+    id: Mapped[int] = mapped_column(
+        ForeignKey("historic_site.id", ondelete="CASCADE"), primary_key=True
+    )
+    name: Mapped[str] = mapped_column(String(100), nullable=False)
+    short_description: Mapped[str] = mapped_column(String(255), nullable=False)
+    city: Mapped[str] = mapped_column(String(50), nullable=False)
+    province: Mapped[str] = mapped_column(String(50), nullable=False)
+    state_of_conservation: Mapped[str] = mapped_column(
+        ENUM("bueno", "regular", "malo", name="state_of_conservation_enum", create_type=False),
+        nullable=False,
+    )
+    inauguration_year: Mapped[int] = mapped_column(Integer, nullable=False)
+    visible: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    tags: Mapped[list[str]] = mapped_column(ARRAY(String), nullable=False, server_default="{}")
+    cover_url: Mapped[str | None] = mapped_column(String(500))
+    cover_title: Mapped[str | None] = mapped_column(String(200))
+    rating: Mapped[float | None] = mapped_column(Float)
+    rating_count: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    visit_count: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    # Solo se usa en filtros; la respuesta lee lat/lon ya calculados
+    location: Mapped[Point] = mapped_column(
+        Geometry(geometry_type="POINT", srid=4326), nullable=False, deferred=True
+    )
+    inserted_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=False)
+    updated_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=False)
+    lat = column_property(func.ST_Y(location))
+    lon = column_property(func.ST_X(location))
+    # Detalle del sitio ya serializado (sin visit_count) y la version que lo invalida:
+    # cada refresco de la tarjeta o de su calificacion la incrementa y borra el documento
+    document: Mapped[bytes | None] = mapped_column(LargeBinary, deferred=True)
+    document_version: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+
+    __table_args__ = (
+        Index("ix_site_card_tags", "tags", postgresql_using="gin"),
+        Index("ix_site_card_inserted_at", "inserted_at"),
+        Index("ix_site_card_visit_count", "visit_count"),
+        Index("ix_site_card_rating", rating.desc().nullslast()),
+        Index("ix_site_card_province", "province"),
+        Index("ix_site_card_city", "city"),
+        Index("ix_site_card_state", "state_of_conservation"),
+    )
+
+    def to_dict(self) -> dict:
+        """Convierte la tarjeta al formato de los listados de la API"""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "short_description": self.short_description,
+            "city": self.city,
+            "province": self.province,
+            "lat": self.lat,
+            "long": self.lon,
+            "state_of_conservation": self.state_of_conservation,
+            "inauguration_year": self.inauguration_year,
+            "tags": list(self.tags),
+            "inserted_at": self.inserted_at,
+            "updated_at": self.updated_at,
+            "rating": self.rating,
+            "rating_count": self.rating_count,
+            "visit_count": self.visit_count,
+            "cover_image": {
+                "url": self.cover_url,
+                "title": self.cover_title,
+            } if self.cover_url else None,
+        }
+
+
 category_historic_site = db.Table(
     "category_historic_site",
     db.metadata,
@@ -163,7 +277,7 @@ category_historic_site = db.Table(
 )
 
 
-class Category(db.Model):
+class Category(db.Model, SoftDeleteMixin):
     __tablename__ = "category"
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
@@ -171,7 +285,7 @@ class Category(db.Model):
     deleted: Mapped[bool] = mapped_column(Boolean, default=False)
 
 
-class Image(db.Model):
+class Image(db.Model, SoftDeleteMixin):
     __tablename__ = "image"
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
@@ -204,6 +318,17 @@ class Image(db.Model):
         server_default=db.func.now(),
         onupdate=db.func.now(),
     )
+
+    __table_args__ = (
+        # Imagenes activas de un sitio en su orden (galeria, portada, carga de HistoricSite.images)
+        Index(
+            "ix_image_live_site_order",
+            "id_historic_site",
+            "order_index",
+            postgresql_where=expression.text("NOT deleted"),
+        ),
+        Index("ix_image_deleted_at", "deleted_at", postgresql_where=expression.text("deleted")),
+    )
     
     def to_dict(self) -> dict:
         """Convierte el objeto imagen a un diccionario"""
@@ -216,11 +341,11 @@ class Image(db.Model):
             "is_cover": self.is_cover,
             "content_type": self.content_type,
             "size": self.size,
-            "created_at": self.created_at.isoformat(),
-            "updated_at": self.updated_at.isoformat(),
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
         }
 
-class Modification(db.Model):
+class Modification(db.Model, SoftDeleteMixin):
     __tablename__ = "modification"
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
@@ -237,6 +362,15 @@ class Modification(db.Model):
     id_user: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
     deleted: Mapped[bool] = mapped_column(Boolean, default=False)
 
+    __table_args__ = (
+        Index(
+            "ix_modification_live_site_date_time",
+            "id_historic_site",
+            "date_time",
+            postgresql_where=expression.text("NOT deleted"),
+        ),
+    )
+
 
 modification_modification_type = db.Table(
     "modification_modification_type",
@@ -257,7 +391,7 @@ modification_modification_type = db.Table(
 )
 
 
-class ModificationType(db.Model):
+class ModificationType(db.Model, SoftDeleteMixin):
     __tablename__ = "modification_type"
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
@@ -1,22 +1,29 @@
 import csv
 import io
+from collections.abc import Iterator
 from datetime import datetime
 from typing import Any, List
 
-from geoalchemy2.shape import to_shape
 from shapely import wkt
-from sqlalchemy import func, select
+from sqlalchemy import Select, String, Update, delete, distinct, func, literal_column, select, true, tuple_, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by, array, insert as pg_insert
 from sqlalchemy.orm import selectinload
 
-from core.auth.models import User
-from core.database import db
+from core import signals
+from core.associations import tag_historic_site
+from core.auth.models import User, user_favorite_sites
+from core.cache import LRUCache
+from core.database import NOT_STICKY, db, use_primary
 from core.historic_site.models import (
     Category,
     HistoricSite,
     Image,
     Modification,
     ModificationType,
+    SiteCard,
 )
+from core.reviews.models import SiteRatingSummary
+from core.tags import repository as tags_repository
 from core.tags.models import Tag
 from flask import current_app
 
@@ -30,7 +37,7 @@ def get_historic_site_by_name(name: str) -> HistoricSite | None:
     """ "Obtiene un sitio historico por su nombre"""
     return (
         db.session.query(HistoricSite)
-        .filter(HistoricSite.name == name, HistoricSite.deleted == False)
+        .filter(HistoricSite.name == name)
         .first()
     )
 
@@ -49,16 +56,48 @@ def list_historic_sites_paginated(
     per_page: int = 25,
 ) -> Any:
     """Lista los sitios historicos con paginación y filtros opcionales"""
-    historic_sites = (
-        select(HistoricSite)
-        .options(
-            selectinload(HistoricSite.images),
-            selectinload(HistoricSite.tags),
-            selectinload(HistoricSite.category),
-        )
-        .filter(HistoricSite.deleted == False)
-        .order_by(HistoricSite.id.asc())
+    historic_sites = historic_sites_query(
+        search, city, province, tags, state, visible, fecha_rango, order
+    ).options(
+        selectinload(HistoricSite.images),
+        selectinload(HistoricSite.tags),
+        selectinload(HistoricSite.category),
+    )
+    return db.paginate(historic_sites, page=page, per_page=per_page, error_out=False)
+
+
+def iter_historic_sites_for_export(batch_size: int = 500, **filters) -> Iterator[HistoricSite]:
+    """
+    Recorre los sitios filtrados del panel (mismos filtros que
+    ``list_historic_sites_paginated``) de a ``batch_size`` filas con un cursor del
+    servidor, para exportarlos sin tenerlos todos en memoria. Solo carga sus tags:
+    el CSV no usa imagenes ni categorias
+    """
+    query = (
+        historic_sites_query(**filters)
+        .options(selectinload(HistoricSite.tags))
+        .execution_options(yield_per=batch_size)
     )
+    yield from db.session.scalars(query)
+
+
+def historic_sites_exist(**filters) -> bool:
+    """Indica si algun sitio cumple los filtros del panel"""
+    return db.session.scalar(select(historic_sites_query(**filters).order_by(None).exists()))
+
+
+def historic_sites_query(
+    search: str = "",
+    city: str = "",
+    province: str = "",
+    tags: list[str] | None = None,
+    state: str = "",
+    visible: bool = False,
+    fecha_rango: str = "",
+    order: str = "alfabetico_nombre",
+) -> Select:
+    """Consulta de los sitios del panel con los filtros y el orden del listado"""
+    historic_sites = select(HistoricSite).order_by(HistoricSite.id.asc())
 
     # filtros
     if search:
@@ -103,12 +142,263 @@ def list_historic_sites_paginated(
         historic_sites = historic_sites.order_by(HistoricSite.inserted_at.desc())
     elif order == "antiguos":
         historic_sites = historic_sites.order_by(HistoricSite.inserted_at.asc())
-    return db.paginate(historic_sites, page=page, per_page=per_page, error_out=False)
+    return historic_sites
 
 
 def list_historic_sites() -> list[HistoricSite]:
     """Lista todos los sitios historicos"""
-    return db.session.query(HistoricSite).filter(HistoricSite.deleted == False).all()
+    return db.session.query(HistoricSite).all()
+
+
+# API ----------------------------
+def filter_api_sites(query: Any, params: dict, favorites_of: int | None = None) -> Any:
+    """
+    Aplica los filtros de busqueda de la API publica a una consulta de tarjetas de sitios
+
+    Args:
+        query (Any): consulta (Query o select) sobre SiteCard
+        params (dict): parametros validados por HistoricSiteQuerySchema
+        favorites_of (int | None, optional): si se indica, solo los favoritos de ese usuario
+
+    Returns:
+        Any: la consulta con los filtros aplicados
+    """
+    if favorites_of is not None:
+        query = query.join(
+            user_favorite_sites, user_favorite_sites.c.id_historic_site == SiteCard.id
+        ).filter(user_favorite_sites.c.id_user == favorites_of, user_favorite_sites.c.deleted == False)
+
+    # Filtros de texto
+    if params.get("name"):
+        query = query.filter(SiteCard.name.ilike(f"%{params['name']}%"))
+    if params.get("description"):
+        # La descripcion completa no esta en la tarjeta
+        query = query.filter(SiteCard.id.in_(
+            select(HistoricSite.id).where(HistoricSite.description.ilike(f"%{params['description']}%"))
+        ))
+    if params.get("city"):
+        query = query.filter(SiteCard.city.ilike(f"%{params['city']}%"))
+    if params.get("province"):
+        query = query.filter(SiteCard.province.ilike(f"%{params['province']}%"))
+    if params.get("state_of_conservation"):
+        query = query.filter(SiteCard.state_of_conservation == params["state_of_conservation"])
+
+    # Filtro por tags: alcanza con que el sitio tenga alguno (operador && sobre el indice GIN)
+    if params.get("tags"):
+        tag_list = [t.strip() for t in params["tags"].split(",") if t.strip()]
+        if tag_list:
+            query = query.filter(SiteCard.tags.overlap(array(tag_list, type_=String)))
+
+    # Filtro lat, long, radius
+    lat, long, radius = params.get("lat"), params.get("long"), params.get("radius")
+    if lat is not None and long is not None and radius is not None:
+        # radius en km, PostGIS ST_DWithin usa metros
+        radius_m = radius * 1000
+        point = func.ST_SetSRID(func.ST_MakePoint(long, lat), 4326)
+        query = query.filter(func.ST_DWithin(SiteCard.location, point, radius_m))
+    return query
+
+
+def order_api_sites(query: Any, order_by: str) -> Any:
+    """
+    Ordena una consulta de tarjetas de sitios segun el criterio ``order_by`` de la API publica
+
+    Args:
+        query (Any): consulta (Query o select) sobre SiteCard
+        order_by (str): criterio de orden validado por HistoricSiteQuerySchema
+
+    Returns:
+        Any: la consulta ordenada
+    """
+    if order_by == "oldest":
+        return query.order_by(SiteCard.inserted_at.asc())
+    if order_by == "rating-5-1":
+        return query.order_by(SiteCard.rating.desc().nullslast())
+    if order_by == "rating-1-5":
+        return query.order_by(SiteCard.rating.asc().nullslast())
+    if order_by == "most-visited":
+        return query.order_by(SiteCard.visit_count.desc())
+    if order_by == "least-visited":
+        return query.order_by(SiteCard.visit_count.asc())
+    # latest por defecto
+    return query.order_by(SiteCard.inserted_at.desc())
+
+
+# Parametros que no cambian el conjunto filtrado y no forman parte de la clave de cache
+_FACETS_IGNORED_PARAMS = {"page", "per_page", "order_by", "only_favorites"}
+_facets_cache = LRUCache("site_facets", maxsize=256)
+
+
+def _invalidate_facets(sender, **extra) -> None:
+    _facets_cache.clear()
+
+
+signals.site_changed.connect(_invalidate_facets)
+signals.tag_changed.connect(_invalidate_facets)
+
+
+def get_site_facets(params: dict, favorites_of: int | None = None) -> dict:
+    """
+    Cuenta los sitios por provincia, ciudad, tag, estado de conservacion y rango de
+    año de inauguracion para el conjunto filtrado por ``params``
+
+    El resultado se cachea por combinacion de filtros y se invalida ante cualquier
+    escritura de sitios o tags. Los filtros por favoritos dependen del usuario y no se cachean.
+
+    Args:
+        params (dict): parametros validados por HistoricSiteQuerySchema
+        favorites_of (int | None, optional): si se indica, solo los favoritos de ese usuario
+
+    Returns:
+        dict: total de sitios y lista de ``{"value", "count"}`` por cada faceta
+    """
+    if favorites_of is not None:
+        return _compute_site_facets(params, favorites_of)
+    key = tuple(sorted(
+        (name, value) for name, value in params.items()
+        if name not in _FACETS_IGNORED_PARAMS and value is not None
+    ))
+    return _facets_cache.get_or_set(
+        key,
+        lambda: _compute_site_facets(params),
+        ttl=current_app.config.get("FACETS_CACHE_TTL"),
+    )
+
+
+def _compute_site_facets(params: dict, favorites_of: int | None = None) -> dict:
+    """Resuelve todas las facetas en una sola consulta con GROUPING SETS sobre site_card"""
+    bucket_size = int(current_app.config.get("FACETS_YEAR_BUCKET", 50))
+    facet_tag = func.unnest(SiteCard.tags).table_valued("name").lateral("facet_tag")
+    facets = {
+        "provinces": SiteCard.province,
+        "cities": SiteCard.city,
+        "states_of_conservation": SiteCard.state_of_conservation,
+        # Literal para que la expresion del SELECT coincida con la del GROUP BY
+        "inauguration_years": (
+            (SiteCard.inauguration_year // literal_column(str(bucket_size)))
+            * literal_column(str(bucket_size))
+        ),
+        "tags": facet_tag.c.name,
+    }
+    stmt = (
+        select(
+            *[column.label(name) for name, column in facets.items()],
+            *[func.grouping(column).label(f"grouping_{name}") for name, column in facets.items()],
+            func.count(distinct(SiteCard.id)).label("count"),
+        )
+        .select_from(SiteCard)
+        .outerjoin(facet_tag, true())
+        .group_by(func.grouping_sets(*facets.values(), tuple_()))
+    )
+    stmt = filter_api_sites(stmt, params, favorites_of)
+
+    result = {"total": 0, **{name: [] for name in facets}}
+    for row in db.session.execute(stmt).mappings():
+        grouped = [name for name in facets if row[f"grouping_{name}"] == 0]
+        if not grouped:
+            result["total"] = row["count"]
+            continue
+        name = grouped[0]
+        value = row[name]
+        if value is None:
+            continue
+        if name == "inauguration_years":
+            start = int(value)
+            result[name].append({"from": start, "to": start + bucket_size - 1, "count": row["count"]})
+        else:
+            result[name].append({"value": value, "count": row["count"]})
+
+    for name in facets:
+        if name == "inauguration_years":
+            result[name].sort(key=lambda facet: facet["from"])
+        else:
+            result[name].sort(key=lambda facet: (-facet["count"], facet["value"]))
+    return result
+
+
+# Proyeccion site_card ----------------------------
+def refresh_site_cards(site_ids: list[int] | None = None) -> None:
+    """
+    Reconstruye las tarjetas de los sitios indicados a partir de sus tablas de origen:
+    inserta o actualiza las de sitios activos y borra las de sitios eliminados.
+    No hace commit, asi la tarjeta se guarda junto con el cambio que la origino
+
+    Args:
+        site_ids (list[int] | None, optional): sitios a reconstruir, todos si es None
+    """
+    if site_ids is not None and not site_ids:
+        return
+    tag_names = (
+        select(func.array_agg(aggregate_order_by(Tag.name, Tag.name)))
+        .join(tag_historic_site, tag_historic_site.c.id_tag == Tag.id)
+        .where(tag_historic_site.c.id_historic_site == HistoricSite.id, Tag.deleted == False)
+        .scalar_subquery()
+    )
+    # Misma eleccion que HistoricSite.cover_image: la marcada como portada o la primera activa
+    cover = (
+        select(Image.image, Image.title)
+        .where(Image.id_historic_site == HistoricSite.id, Image.deleted == False)
+        .order_by(Image.is_cover.desc(), Image.id)
+        .limit(1)
+        .lateral("cover")
+    )
+    columns = {
+        "id": HistoricSite.id,
+        "name": HistoricSite.name,
+        "short_description": HistoricSite.short_description,
+        "city": HistoricSite.city,
+        "province": HistoricSite.province,
+        "state_of_conservation": HistoricSite.state_of_conservation,
+        "inauguration_year": HistoricSite.inauguration_year,
+        "visible": func.coalesce(HistoricSite.visible, False),
+        "tags": func.coalesce(tag_names, literal_column("'{}'::varchar[]")),
+        "cover_url": cover.c.image,
+        "cover_title": cover.c.title,
+        "rating": SiteRatingSummary.rating_sum * 1.0 / func.nullif(SiteRatingSummary.total, 0),
+        "rating_count": func.coalesce(SiteRatingSummary.total, 0),
+        "visit_count": HistoricSite.visit_count,
+        "location": HistoricSite.location,
+        "inserted_at": HistoricSite.inserted_at,
+        "updated_at": HistoricSite.updated_at,
+    }
+    rows = (
+        select(*columns.values())
+        .select_from(HistoricSite)
+        .outerjoin(cover, true())
+        .outerjoin(SiteRatingSummary, SiteRatingSummary.historic_site_id == HistoricSite.id)
+        .where(HistoricSite.deleted == False)
+    )
+    removed = delete(SiteCard).where(
+        SiteCard.id.in_(select(HistoricSite.id).where(HistoricSite.deleted == True))
+    )
+    if site_ids is not None:
+        rows = rows.where(HistoricSite.id.in_(set(site_ids)))
+        removed = removed.where(SiteCard.id.in_(set(site_ids)))
+
+    stmt = pg_insert(SiteCard).from_select(list(columns), rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SiteCard.id],
+        set_={
+            **{name: stmt.excluded[name] for name in columns if name != "id"},
+            "document": None,
+            "document_version": SiteCard.__table__.c.document_version + 1,
+        },
+    )
+    db.session.execute(stmt)
+    db.session.execute(removed, execution_options={"synchronize_session": False})
+
+
+def _refresh_cards_of_tags(sender, tag_ids: list[int], **extra) -> None:
+    """Un cambio de nombre o baja de tag se refleja en las tarjetas de sus sitios"""
+    site_ids = db.session.scalars(
+        select(tag_historic_site.c.id_historic_site).where(tag_historic_site.c.id_tag.in_(tag_ids))
+    ).all()
+    if site_ids:
+        refresh_site_cards(site_ids)
+        db.session.commit()
+
+
+signals.tag_changed.connect(_refresh_cards_of_tags)
 
 
 def create_historic_site(user_id: int, **kwargs) -> HistoricSite | None:
@@ -119,6 +409,9 @@ def create_historic_site(user_id: int, **kwargs) -> HistoricSite | None:
     else:
         raise ValueError("El nombre del sitio historico ya está en uso.")
     db.session.add(new_historic_site)
+    db.session.flush()
+    tags_repository.adjust_usage_counts(added={tag.id for tag in new_historic_site.tags})
+    refresh_site_cards([new_historic_site.id])
     db.session.commit()
     modifications = []
     modifications.append(create_modification_type("Creación"))
@@ -128,6 +421,7 @@ def create_historic_site(user_id: int, **kwargs) -> HistoricSite | None:
         id_user=user_id,
         date_time=db.func.now(),
     )
+    signals.site_changed.send(HistoricSite, site_ids=[new_historic_site.id])
     return new_historic_site
 
 
@@ -160,7 +454,7 @@ def update_historic_site(
         or kwargs.get("province") != historic_site.province
         or new_inauguration_year != historic_site.inauguration_year
         or new_visible != historic_site.visible
-        or compare_location(kwargs.get("location"), historic_site.location)
+        or compare_location(kwargs.get("location"), historic_site)
         or kwargs.get("category") != historic_site.category
     ):
         cambio_de_edicion = create_modification_type("Edición")
@@ -173,22 +467,27 @@ def update_historic_site(
         date_time=db.func.now(),
     )
 
+    old_tags = {tag.id for tag in historic_site.tags}
     historic_site.tags.clear()
     historic_site.category.clear()
     for key, value in kwargs.items():
         setattr(historic_site, key, value)
+    tags_repository.adjust_usage_counts(
+        added={tag.id for tag in historic_site.tags}, removed=old_tags
+    )
+    refresh_site_cards([historic_site.id])
     db.session.commit()
+    signals.site_changed.send(HistoricSite, site_ids=[historic_site.id])
     return historic_site
 
 
-def compare_location(new_location, old_location) -> bool:
-    """Compara dos ubicaciones (WKT) y devuelve True si son diferentes"""
+def compare_location(new_location, historic_site: HistoricSite) -> bool:
+    """Compara una ubicacion (WKT) con la del sitio y devuelve True si son diferentes"""
     new_location_shape = wkt.loads(new_location.data)
-    historic_site_shape = to_shape(old_location)
     tolerance = 1e-7
     return (
-        abs(new_location_shape.x - historic_site_shape.x) > tolerance
-        or abs(new_location_shape.y - historic_site_shape.y) > tolerance
+        abs(new_location_shape.x - historic_site.lon) > tolerance
+        or abs(new_location_shape.y - historic_site.lat) > tolerance
     )
 
 
@@ -198,6 +497,8 @@ def delete_historic_site(historic_site_id: int, user_id: int) -> HistoricSite |
     if not historic_site:
         return None
     historic_site.deleted = True
+    tags_repository.adjust_usage_counts(removed={tag.id for tag in historic_site.tags})
+    refresh_site_cards([historic_site.id])
     db.session.commit()
     modifications = []
     modifications.append(create_modification_type("Eliminación"))
@@ -207,14 +508,187 @@ def delete_historic_site(historic_site_id: int, user_id: int) -> HistoricSite |
         id_user=user_id,
         date_time=db.func.now(),
     )
+    signals.site_changed.send(HistoricSite, site_ids=[historic_site.id])
     return historic_site
 
-def increment_visit_count(historic_site_id: int) -> None:
-    """Incrementa el contador de visitas de un sitio historico"""
-    historic_site = get_historic_site(historic_site_id)
-    if historic_site:
-        historic_site.visit_count += 1
-        db.session.commit()
+def increment_visit_count(historic_site_id: int) -> Any:
+    """
+    Incrementa el contador de visitas de un sitio historico y de su tarjeta
+
+    Args:
+        historic_site_id (int): id del sitio
+
+    Returns:
+        Any: fila con ``visit_count`` y ``document_version`` de la tarjeta, None si el
+        sitio no existe o esta eliminado
+    """
+    # Contar la visita no hace que el cliente tenga que leer del primario
+    visits = db.session.scalar(
+        site_visit_update(historic_site_id),
+        execution_options={"synchronize_session": False},
+        bind_arguments=NOT_STICKY,
+    )
+    if visits is None:
+        db.session.rollback()
+        return None
+    card = db.session.execute(
+        card_visit_update(historic_site_id, visits),
+        execution_options={"synchronize_session": False},
+        bind_arguments=NOT_STICKY,
+    ).first()
+    db.session.commit()
+    return card
+
+
+def site_visit_update(historic_site_id: int) -> Update:
+    """Suma una visita al sitio (si no esta eliminado) y devuelve el nuevo ``visit_count``"""
+    return (
+        update(HistoricSite)
+        .where(HistoricSite.id == historic_site_id, HistoricSite.deleted == False)
+        .values(visit_count=HistoricSite.visit_count + 1)
+        .returning(HistoricSite.visit_count)
+    )
+
+
+def card_visit_update(historic_site_id: int, visits: int) -> Update:
+    """Copia ``visit_count`` a la tarjeta y devuelve el contador y la version de su documento"""
+    return (
+        update(SiteCard)
+        .where(SiteCard.id == historic_site_id)
+        .values(visit_count=visits)
+        .returning(SiteCard.visit_count, SiteCard.document_version)
+    )
+
+
+_documents_cache = LRUCache("site_documents", maxsize=1024)
+
+
+def get_site_document(site_id: int, version: int) -> bytes | None:
+    """
+    Devuelve el detalle del sitio serializado en JSON, sin ``visit_count`` (cambia en
+    cada visita y lo agrega quien responde)
+
+    El documento se arma una vez por cambio: se busca en la cache del proceso y despues
+    en ``site_card.document``, y solo si ninguno corresponde a ``version`` se serializa
+    el sitio y se guarda en ambos lugares. Cualquier refresco de la tarjeta incrementa la
+    version, asi que todos los procesos ven el cambio sin depender de una expiracion.
+
+    Args:
+        site_id (int): id del sitio
+        version (int): ``document_version`` actual de la tarjeta (ver ``increment_visit_count``)
+
+    Returns:
+        bytes | None: documento JSON, None si el sitio no tiene tarjeta
+    """
+    return get_site_documents({site_id: version}).get(site_id)
+
+
+def get_site_documents(versions: dict[int, int]) -> dict[int, bytes]:
+    """
+    Version de ``get_site_document`` para varios sitios: una consulta para los documentos
+    guardados y una sola serializacion (con las reviews embebidas de todos juntas) para
+    los que haya que rearmar
+
+    Args:
+        versions (dict[int, int]): ``document_version`` actual de cada sitio, por id
+
+    Returns:
+        dict[int, bytes]: documento JSON de cada sitio que tiene tarjeta
+    """
+    documents = {}
+    missing = {}
+    for site_id, version in versions.items():
+        document = cached_site_document(site_id, version)
+        if document is not None:
+            documents[site_id] = document
+        else:
+            missing[site_id] = version
+    if not missing:
+        return documents
+
+    # Lo que se lee aca queda guardado como el documento de ``version``: se lee del primario,
+    # que ya tiene esa version (viene del UPDATE ... RETURNING), y no de una replica atrasada
+    with use_primary():
+        stale = {}
+        for stored in db.session.execute(stored_site_documents_query(list(missing))):
+            version = missing[stored.id]
+            if stored.document is not None and stored.document_version == version:
+                documents[stored.id] = stored.document
+                remember_site_document(stored.id, version, stored.document)
+            else:
+                stale[stored.id] = version
+        if not stale:
+            return documents
+        serialized = _serialize_site_documents(list(stale))
+
+    for site_id, document in serialized.items():
+        # Si otra escritura cambio la version mientras tanto, no se pisa su invalidacion
+        db.session.execute(
+            update(SiteCard)
+            .where(SiteCard.id == site_id, SiteCard.document_version == stale[site_id])
+            .values(document=document),
+            execution_options={"synchronize_session": False},
+            bind_arguments=NOT_STICKY,
+        )
+        documents[site_id] = document
+        remember_site_document(site_id, stale[site_id], document)
+    db.session.commit()
+    return documents
+
+
+def get_site_document_versions(site_ids: list[int]) -> dict[int, Any]:
+    """
+    Lee ``visit_count`` y ``document_version`` de las tarjetas de varios sitios, sin
+    sumar visitas
+
+    Args:
+        site_ids (list[int]): ids de los sitios
+
+    Returns:
+        dict[int, Any]: fila de cada sitio no eliminado, por id
+    """
+    if not site_ids:
+        return {}
+    # Las versiones deciden que documento se arma y se guarda: se leen del primario
+    with use_primary():
+        rows = db.session.execute(
+            select(SiteCard.id, SiteCard.visit_count, SiteCard.document_version).where(SiteCard.id.in_(site_ids))
+        ).all()
+    return {row.id: row for row in rows}
+
+
+def cached_site_document(site_id: int, version: int) -> bytes | None:
+    """Documento del sitio en la cache del proceso, si corresponde a ``version``"""
+    cached = _documents_cache.get(site_id)
+    return cached[1] if cached is not None and cached[0] == version else None
+
+
+def remember_site_document(site_id: int, version: int, document: bytes) -> None:
+    _documents_cache.set(site_id, (version, document))
+
+
+def stored_site_documents_query(site_ids: list[int]) -> Select:
+    """Documentos guardados en las tarjetas y la version a la que corresponde cada uno"""
+    return select(SiteCard.id, SiteCard.document, SiteCard.document_version).where(SiteCard.id.in_(site_ids))
+
+
+def _serialize_site_documents(site_ids: list[int]) -> dict[int, bytes]:
+    sites = (
+        db.session.query(HistoricSite)
+        .options(
+            selectinload(HistoricSite.images),
+            selectinload(HistoricSite.tags),
+            selectinload(HistoricSite.category),
+            selectinload(HistoricSite.modifications),
+        )
+        .filter(HistoricSite.id.in_(site_ids))
+        .all()
+    )
+    documents = {}
+    for data in HistoricSite.detail_dicts(sites):
+        del data["visit_count"]
+        documents[data["id"]] = current_app.json.dumps(data).encode()
+    return documents
 
 
 # Category ----------------------------
@@ -297,8 +771,11 @@ def create_modification_type(name: str) -> Modification:
 
 
 # Otras funciones ----------------------------
-def generate_csv_content(historic_sites):
-    """Genera el contenido CSV de los sitios historicos proporcionados"""
+def generate_csv_content(historic_sites, chunk_rows: int = 500):
+    """
+    Genera el contenido CSV de los sitios historicos proporcionados, de a
+    ``chunk_rows`` filas, para poder enviarlo mientras se escribe
+    """
     output = io.StringIO()
     writer = csv.writer(output, delimiter=",", quotechar='"', quoting=csv.QUOTE_MINIMAL)
 
@@ -319,7 +796,7 @@ def generate_csv_content(historic_sites):
     writer.writerow(headers)
 
     # Escribir datos
-    for site in historic_sites:
+    for index, site in enumerate(historic_sites, start=1):
         # Obtener tags como string
         tags = "|".join([tag.name for tag in site.tags]) if site.tags else ""
 
@@ -338,9 +815,12 @@ def generate_csv_content(historic_sites):
             tags,
         ]
         writer.writerow(row)
+        if index % chunk_rows == 0:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
 
-    output.seek(0)
-    return output
+    yield output.getvalue()
 
 
 def get_all_cities() -> list[tuple[str]]:
@@ -365,7 +845,7 @@ def get_active_images(site_id: int):
     """Obtiene las imágenes activas de un sitio ordenadas por order_index"""
     return (
         Image.query
-        .filter_by(id_historic_site=site_id, deleted=False)
+        .filter_by(id_historic_site=site_id)
         .order_by(Image.order_index.asc()) 
         .all()
     )
@@ -415,7 +895,9 @@ def upload_images(site_id: int, files, current_user_id: int, titles: list = None
         db.session.add(image)
         uploaded += 1
 
+    refresh_site_cards([site_id])
     db.session.commit()
+    signals.site_changed.send(HistoricSite, site_ids=[site_id])
     return uploaded
 
 
@@ -427,7 +909,9 @@ def set_cover_image(site_id: int, image_id: int):
     if image.id_historic_site != site_id or image.deleted:
         raise ValueError("Imagen no válida")
     image.is_cover = True
+    refresh_site_cards([site_id])
     db.session.commit()
+    signals.site_changed.send(HistoricSite, site_ids=[site_id])
 
 
 def delete_image(image_id: int, site_id: int):
@@ -440,7 +924,9 @@ def delete_image(image_id: int, site_id: int):
         raise ValueError("No se puede eliminar la imagen de portada. Cambia la portada primero.")
 
     image.deleted = True
+    refresh_site_cards([site_id])
     db.session.commit()
+    signals.site_changed.send(HistoricSite, site_ids=[site_id])
 
 
 def reorder_images(site_id: int, image_ids: list[int]):
@@ -450,4 +936,7 @@ def reorder_images(site_id: int, image_ids: list[int]):
         if image:
             image.order_index = index  
     
-    db.session.commit()
\ No newline at end of file
+    # El orden de las imagenes es parte del documento de detalle del sitio
+    refresh_site_cards([site_id])
+    db.session.commit()
+    signals.site_changed.send(HistoricSite, site_ids=[site_id])
\ No newline at end of file
@@ -0,0 +1,142 @@
+"""
+Migraciones versionadas del esquema
+
+Cada migracion es un modulo de ``core/migrations/versions`` llamado ``<version>_<nombre>.py``
+(la version es un numero correlativo de cuatro digitos) con ``upgrade(conn)`` y
+``downgrade(conn)``. Las versiones aplicadas quedan en la tabla ``schema_migrations``.
+
+Una base vacia se crea con ``create_all``, porque los modelos ya describen el esquema de
+la ultima version, y se marca con todas las versiones. Sobre una base existente se aplican
+solo las pendientes, en orden. Por eso cada migracion debe tolerar que lo que crea ya
+exista (``IF NOT EXISTS``).
+
+Las migraciones con ``TRANSACTIONAL = False`` (por ejemplo ``CREATE INDEX CONCURRENTLY``,
+que no bloquea las escrituras pero no puede correr dentro de una transaccion) se ejecutan
+en autocommit; el resto corre en una transaccion junto con su registro.
+"""
+
+import importlib
+import pkgutil
+from dataclasses import dataclass
+from types import ModuleType
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    MetaData,
+    String,
+    Table,
+    delete,
+    func,
+    insert,
+    inspect,
+    select,
+)
+from sqlalchemy.engine import Engine
+
+from core.database import db
+
+VERSIONS_PACKAGE = "core.migrations.versions"
+
+# Fuera de db.metadata: create_all y drop_all de los modelos no la tocan
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", String(16), primary_key=True),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now(), nullable=False),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: str
+    name: str
+    module: ModuleType
+
+    @property
+    def description(self) -> str:
+        return (self.module.__doc__ or self.name).strip().splitlines()[0]
+
+    @property
+    def transactional(self) -> bool:
+        return getattr(self.module, "TRANSACTIONAL", True)
+
+
+def discover() -> list[Migration]:
+    """Migraciones de ``core/migrations/versions``, ordenadas por version"""
+    package = importlib.import_module(VERSIONS_PACKAGE)
+    migrations = []
+    for info in pkgutil.iter_modules(package.__path__):
+        version, _, name = info.name.partition("_")
+        if version.isdigit():
+            module = importlib.import_module(f"{VERSIONS_PACKAGE}.{info.name}")
+            migrations.append(Migration(version, name, module))
+    return sorted(migrations, key=lambda migration: migration.version)
+
+
+def applied_versions(engine: Engine) -> list[str]:
+    """Versiones registradas en ``schema_migrations``, en orden"""
+    schema_migrations.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        return list(conn.scalars(select(schema_migrations.c.version).order_by(schema_migrations.c.version)))
+
+
+def pending(engine: Engine) -> list[Migration]:
+    applied = set(applied_versions(engine))
+    return [migration for migration in discover() if migration.version not in applied]
+
+
+def upgrade(engine: Engine, target: str | None = None) -> list[Migration]:
+    """
+    Aplica las migraciones pendientes hasta ``target`` (inclusive; por defecto todas)
+
+    Returns:
+        list[Migration]: las migraciones aplicadas; vacia si la base se creo desde cero
+    """
+    if not any(inspect(engine).has_table(table) for table in db.metadata.tables):
+        db.metadata.create_all(bind=engine)
+        stamp(engine)
+        return []
+
+    migrations = [m for m in pending(engine) if target is None or m.version <= target]
+    for migration in migrations:
+        _run(engine, migration, migration.module.upgrade, insert(schema_migrations).values(version=migration.version))
+    return migrations
+
+
+def downgrade(engine: Engine, target: str) -> list[Migration]:
+    """
+    Revierte, de la mas nueva a la mas vieja, las migraciones aplicadas posteriores a ``target``
+
+    Returns:
+        list[Migration]: las migraciones revertidas
+    """
+    applied = set(applied_versions(engine))
+    migrations = [m for m in reversed(discover()) if m.version in applied and m.version > target]
+    for migration in migrations:
+        _run(engine, migration, migration.module.downgrade,
+             delete(schema_migrations).where(schema_migrations.c.version == migration.version))
+    return migrations
+
+
+def stamp(engine: Engine) -> None:
+    """Marca todas las migraciones como aplicadas (la base tiene el esquema de los modelos)"""
+    schema_migrations.create(engine, checkfirst=True)
+    with engine.begin() as conn:
+        conn.execute(delete(schema_migrations))
+        versions = [{"version": migration.version} for migration in discover()]
+        if versions:
+            conn.execute(insert(schema_migrations), versions)
+
+
+def _run(engine: Engine, migration: Migration, step, record) -> None:
+    if migration.transactional:
+        with engine.begin() as conn:
+            step(conn)
+            conn.execute(record)
+        return
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT")
+        step(conn)
+        conn.execute(record)
+
@@ -0,0 +1,67 @@
+"""
+Esquema creado con create_all antes de las migraciones versionadas
+
+Las bases creadas antes de la serie pueden no tener lo que se agrego despues con
+create_all: el reclamo de reviews de la cola de moderacion, ``users.profile_version``,
+``tag.usage_count`` y las tablas ``site_rating_summary`` y ``site_card`` (con el documento
+del detalle). Se crean si faltan y, lo recien creado, se completa desde las tablas de
+origen: sin tarjetas ni resumenes la API no encuentra ningun sitio.
+
+Corre fuera de una transaccion: la DDL queda confirmada antes de que el relleno, que usa
+los repositorios y por lo tanto ``db.session``, lea las tablas nuevas. Todo es ``IF NOT
+EXISTS``, asi que volver a correrla tras un error es seguro.
+"""
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+from core.database import db
+from core.historic_site import repository as historic_repo
+from core.historic_site.models import SiteCard
+from core.reviews import repository as reviews_repo
+from core.reviews.models import SiteRatingSummary
+from core.tags import repository as tags_repo
+
+TRANSACTIONAL = False
+
+COLUMNS = {
+    "review": {
+        "claimed_by": "INTEGER REFERENCES users (id)",
+        "claimed_until": "TIMESTAMP WITH TIME ZONE",
+    },
+    "users": {"profile_version": "INTEGER NOT NULL DEFAULT 1"},
+    "tag": {"usage_count": "INTEGER NOT NULL DEFAULT 0"},
+    "site_card": {"document": "BYTEA", "document_version": "INTEGER NOT NULL DEFAULT 0"},
+}
+
+INDEXES = {
+    "ix_review_pending_queue": "review (inserted_at, id) WHERE state = 'PENDING' AND NOT deleted",
+}
+
+
+def upgrade(conn: Connection) -> None:
+    existing = inspect(conn)
+    new_summaries = not existing.has_table(SiteRatingSummary.__tablename__)
+    new_cards = not existing.has_table(SiteCard.__tablename__)
+    new_usage_counts = "usage_count" not in {column["name"] for column in existing.get_columns("tag")}
+
+    SiteRatingSummary.__table__.create(conn, checkfirst=True)
+    SiteCard.__table__.create(conn, checkfirst=True)
+    for table, columns in COLUMNS.items():
+        for name, definition in columns.items():
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {name} {definition}"))
+    for name, definition in INDEXES.items():
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}"))
+
+    # Los resumenes primero: las tarjetas copian su calificacion
+    if new_summaries:
+        reviews_repo.refresh_rating_summaries()
+    if new_cards:
+        historic_repo.refresh_site_cards()
+    if new_usage_counts:
+        tags_repo.refresh_usage_counts()
+    db.session.commit()
+
+
+def downgrade(conn: Connection) -> None:
+    pass
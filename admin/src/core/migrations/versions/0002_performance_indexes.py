@@ -0,0 +1,34 @@
+"""
+Indices para los caminos de acceso principales
+
+- historic_site: listado del panel por fecha de alta, sin los eliminados
+- review: reviews de un sitio por estado (listado publico, embebidas en el detalle)
+- modification: historial de un sitio ordenado por fecha
+- image: imagenes de un sitio en su orden
+
+Los favoritos de un usuario ya usan la clave primaria (id_user, id_historic_site) y los
+ordenes por visitas de la API leen site_card, que tiene sus propios indices.
+Se crean con CONCURRENTLY para no bloquear las escrituras en produccion.
+"""
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+TRANSACTIONAL = False
+
+INDEXES = {
+    "ix_historic_site_deleted_inserted_at": "historic_site (deleted, inserted_at)",
+    "ix_review_site_state": "review (historic_site_id, state) WHERE NOT deleted",
+    "ix_modification_site_date_time": "modification (id_historic_site, date_time)",
+    "ix_image_site_order": "image (id_historic_site, order_index)",
+}
+
+
+def upgrade(conn: Connection) -> None:
+    for name, definition in INDEXES.items():
+        conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}"))
+
+
+def downgrade(conn: Connection) -> None:
+    for name in INDEXES:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
@@ -0,0 +1,46 @@
+"""
+Indices parciales sobre las filas activas (WHERE NOT deleted)
+
+Todas las lecturas filtran el borrado logico (ver ``core.database.SoftDeleteMixin``), asi
+que los indices de los caminos calientes pasan a cubrir solo las filas activas: no crecen
+con las eliminadas y las consultas no recorren entradas muertas. Reemplaza a los indices
+completos de historic_site, image, modification y tag, y agrega los de las reviews de un
+usuario y los favoritos vigentes.
+"""
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+TRANSACTIONAL = False
+
+INDEXES = {
+    "ix_historic_site_live_inserted_at": "historic_site (inserted_at) WHERE NOT deleted",
+    "ix_image_live_site_order": "image (id_historic_site, order_index) WHERE NOT deleted",
+    "ix_modification_live_site_date_time": "modification (id_historic_site, date_time) WHERE NOT deleted",
+    "ix_tag_live_usage_count": "tag (usage_count DESC, name) WHERE NOT deleted",
+    "ix_review_live_user_inserted_at": "review (user_id, inserted_at) WHERE NOT deleted",
+    "ix_user_favorite_sites_live": "user_favorite_sites (id_user, id_historic_site) WHERE NOT deleted",
+}
+
+# Indices completos reemplazados, para volver a crearlos al revertir
+REPLACED = {
+    "ix_historic_site_deleted_inserted_at": "historic_site (deleted, inserted_at)",
+    "ix_image_site_order": "image (id_historic_site, order_index)",
+    "ix_modification_site_date_time": "modification (id_historic_site, date_time)",
+    "ix_tag_usage_count": "tag (usage_count DESC, name)",
+}
+
+
+def upgrade(conn: Connection) -> None:
+    # Primero los nuevos, asi las consultas nunca se quedan sin indice
+    for name, definition in INDEXES.items():
+        conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}"))
+    for name in REPLACED:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+
+def downgrade(conn: Connection) -> None:
+    for name, definition in REPLACED.items():
+        conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}"))
+    for name in INDEXES:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
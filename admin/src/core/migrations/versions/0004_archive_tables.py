@@ -0,0 +1,61 @@
+"""
+Fecha de borrado logico y tablas frias para archivar las filas eliminadas
+
+Agrega ``deleted_at`` a las tablas con borrado logico (las filas ya eliminadas toman la
+fecha de la migracion), indices parciales sobre las eliminadas para elegir que archivar y
+las tablas ``<tabla>_archive`` de ``core.archive``: las mismas columnas, sin defaults, FKs
+ni indices, mas ``archived_at``.
+"""
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+TRANSACTIONAL = False
+
+SOFT_DELETE_TABLES = (
+    "historic_site", "image", "review", "tag", "users", "category", "modification", "modification_type",
+)
+
+# Tablas que se archivan, con su clave primaria
+ARCHIVED = {
+    "historic_site": "id",
+    "image": "id",
+    "review": "id",
+    "tag": "id",
+    "users": "id",
+    "modification": "id",
+    "modification_type": "id",
+    "modification_modification_type": "id_modification, id_modification_type",
+    "category_historic_site": "id_historic_site, id_category",
+    "tag_historic_site": "id_historic_site, id_tag",
+    "user_favorite_sites": "id_user, id_historic_site",
+}
+
+DELETED_AT_INDEXES = ("historic_site", "image", "review", "tag", "users")
+
+
+def upgrade(conn: Connection) -> None:
+    for table in SOFT_DELETE_TABLES:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP WITH TIME ZONE"))
+        conn.execute(text(f"UPDATE {table} SET deleted_at = now() WHERE deleted AND deleted_at IS NULL"))
+    for table in DELETED_AT_INDEXES:
+        conn.execute(text(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_deleted_at ON {table} (deleted_at) WHERE deleted"
+        ))
+    for table, primary_key in ARCHIVED.items():
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {table}_archive ("
+            f"LIKE {table}, archived_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(), PRIMARY KEY ({primary_key}))"
+        ))
+
+
+def downgrade(conn: Connection) -> None:
+    for table in ARCHIVED:
+        if conn.scalar(text(f"SELECT EXISTS (SELECT 1 FROM {table}_archive)")):
+            raise RuntimeError(f"{table}_archive tiene filas: restaurarlas antes de revertir")
+    for table in ARCHIVED:
+        conn.execute(text(f"DROP TABLE IF EXISTS {table}_archive"))
+    for table in DELETED_AT_INDEXES:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS ix_{table}_deleted_at"))
+    for table in SOFT_DELETE_TABLES:
+        conn.execute(text(f"ALTER TABLE {table} DROP COLUMN IF EXISTS deleted_at"))
@@ -1,11 +1,11 @@
 from datetime import datetime
 from enum import Enum
 
-from sqlalchemy import DateTime, String, Integer, ForeignKey, Enum as SAEnum
+from sqlalchemy import DateTime, String, Integer, ForeignKey, Index, Enum as SAEnum, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from core import PaginatedAPIMixin
-from core.database import db
+from core.database import SoftDeleteMixin, db
 
 
 class ReviewState(Enum):
@@ -14,7 +14,7 @@ class ReviewState(Enum):
     REJECTED = "rechazada"
 
 
-class Review(db.Model, PaginatedAPIMixin):
+class Review(db.Model, SoftDeleteMixin, PaginatedAPIMixin):
     __tablename__ = "review"
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     comment: Mapped[str] = mapped_column(String, nullable=False)
@@ -41,9 +41,39 @@ class Review(db.Model, PaginatedAPIMixin):
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
     historic_site_id: Mapped[int] = mapped_column(Integer, ForeignKey("historic_site.id"), nullable=False)
 
-    user = relationship("User", back_populates="reviews")
+    # Reclamo temporal de la review por un moderador (cola de moderacion)
+    claimed_by: Mapped[int | None] = mapped_column(Integer, ForeignKey("users.id"), nullable=True)
+    claimed_until: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    user = relationship("User", back_populates="reviews", foreign_keys=[user_id])
     historic_site = relationship("HistoricSite", back_populates="reviews")
 
+    __table_args__ = (
+        # Cola de moderacion: pendientes en orden de llegada (keyset por inserted_at, id)
+        Index(
+            "ix_review_pending_queue",
+            "inserted_at",
+            "id",
+            postgresql_where=text("state = 'PENDING' AND NOT deleted"),
+        ),
+        # Reviews de un sitio por estado (listado publico, embebidas, resumen)
+        Index(
+            "ix_review_site_state",
+            "historic_site_id",
+            "state",
+            postgresql_where=text("NOT deleted"),
+        ),
+        # Reviews de un usuario (/api/me/reviews)
+        Index(
+            "ix_review_live_user_inserted_at",
+            "user_id",
+            "inserted_at",
+            postgresql_where=text("NOT deleted"),
+        ),
+        # Eliminadas a archivar (core.archive)
+        Index("ix_review_deleted_at", "deleted_at", postgresql_where=text("deleted")),
+    )
+
     def to_dict(self) -> dict:
         """Convierte el objeto Review a un diccionario."""
         user_name = f"{self.user.name} {self.user.last_name}" if self.user else "Unknown"
@@ -52,12 +82,65 @@ class Review(db.Model, PaginatedAPIMixin):
             "historic_site_id": self.historic_site_id,
             "rating": self.rating,
             "comment": self.comment,
-            "inserted_at": self.inserted_at.isoformat(),
-            "updated_at": self.updated_at.isoformat(),
+            "inserted_at": self.inserted_at,
+            "updated_at": self.updated_at,
             "state": self.state.value,
             "user_id": self.user_id,
             "user_name": user_name,
         }
 
     def __repr__(self):
-        return f"<Review id={self.id} state={self.state}>"
\ No newline at end of file
+        return f"<Review id={self.id} state={self.state}>"
+
+
+class SiteRatingSummary(db.Model):
+    """Histograma de calificaciones aprobadas de un sitio, mantenido de forma incremental"""
+    __tablename__ = "site_rating_summary"
+    historic_site_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("historic_site.id", ondelete="CASCADE"), primary_key=True
+    )
+    count_1: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    count_2: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    count_3: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    count_4: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    count_5: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    total: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    rating_sum: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=db.func.now(),
+        onupdate=db.func.now(),
+        nullable=False,
+    )
+
+    @property
+    def average(self) -> float | None:
+        """Promedio de las calificaciones aprobadas, o None si no hay ninguna"""
+        return round(self.rating_sum / self.total, 2) if self.total else None
+
+    def to_dict(self) -> dict:
+        """Convierte el resumen de calificaciones a un diccionario."""
+        return {
+            "histogram": {
+                "1": self.count_1,
+                "2": self.count_2,
+                "3": self.count_3,
+                "4": self.count_4,
+                "5": self.count_5,
+            },
+            "total": self.total,
+            "average": self.average,
+        }
+
+    @staticmethod
+    def empty_dict() -> dict:
+        """Resumen de un sitio que todavia no tiene reviews aprobadas."""
+        return {
+            "histogram": {str(star): 0 for star in range(1, 6)},
+            "total": 0,
+            "average": None,
+        }
+
+    def __repr__(self):
+        return f"<SiteRatingSummary site={self.historic_site_id} total={self.total}>"
+
@@ -1,7 +1,10 @@
-from core import db
-from core.reviews.models import Review, ReviewState
+from core import db, signals
+from core.reviews.models import Review, ReviewState, SiteRatingSummary
 from core.auth.models import User
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import aliased, joinedload
 
 def list_reviews() -> list[Review]:
     """Obtiene todas las reviews
@@ -36,7 +39,44 @@ def reviews_paginated(site_id: int|None , page: int,rating: int|None , state: st
     Returns:
         list[Review]: reviews del sitio historico
     """
-    query = db.session.query(Review)
+    query = filter_reviews(
+        db.session.query(Review),
+        site_id=site_id,
+        rating=rating,
+        state=state,
+        date=date,
+        user=user,
+    )
+    query = query.order_by(None)
+
+    if order == "recientes":
+        query = query.order_by(Review.inserted_at.desc())
+    elif order == "antiguas":
+        query = query.order_by(Review.inserted_at.asc())
+    elif order == "mejor calificadas":
+        query = query.order_by(Review.rating.desc())
+    elif order == "peor calificadas":
+        query = query.order_by(Review.rating.asc())
+    return db.paginate(query, per_page=25, page=page, error_out=False)
+
+
+def filter_reviews(query, site_id: int | None = None, rating: int | None = None, state: str = "", date: str = "", user: str = ""):
+    """Aplica los filtros del listado de reviews a una consulta
+
+    Sirve tanto para consultas ``Query`` como para ``select``, de modo que el
+    listado paginado y las acciones masivas usan exactamente los mismos filtros.
+
+    Args:
+        query: consulta sobre Review a filtrar
+        site_id (int | None, optional): id del sitio historico. Defaults to None.
+        rating (int | None, optional): calificacion exacta. Defaults to None.
+        state (str, optional): estado de la review. Defaults to "".
+        date (str, optional): rango de fechas "AAAA-MM-DD a AAAA-MM-DD". Defaults to "".
+        user (str, optional): email o nombre (parcial) del autor. Defaults to "".
+
+    Returns:
+        consulta filtrada, excluyendo las reviews eliminadas
+    """
     if site_id:
         query = query.filter(Review.historic_site_id == site_id)
     if state:
@@ -51,20 +91,22 @@ def reviews_paginated(site_id: int|None , page: int,rating: int|None , state: st
             fecha_fin = datetime.strptime(fechas[1], "%Y-%m-%d")
             query = query.filter(Review.inserted_at.between(fecha_inicio, fecha_fin))
     if user:
-        query = query.join(User).filter(Review.user.has(db.or_(db.func.lower(User.email).like(f"%{user.lower()}%"), db.func.lower(User.name).like(f"%{user.lower()}%"))))
-    
-    query = query.order_by(None)
+        query = query.join(Review.user).filter(Review.user.has(db.or_(db.func.lower(User.email).like(f"%{user.lower()}%"), db.func.lower(User.name).like(f"%{user.lower()}%"))))
+    return query.filter(Review.deleted == False)
 
-    if order == "recientes":
-        query = query.order_by(Review.inserted_at.desc())
-    elif order == "antiguas":
-        query = query.order_by(Review.inserted_at.asc())
-    elif order == "mejor calificadas":
-        query = query.order_by(Review.rating.desc())
-    elif order == "peor calificadas":
-        query = query.order_by(Review.rating.asc())
-    query = query.filter(Review.deleted == False)
-    return db.paginate(query, per_page=25, page=page, error_out=False)
+def _lock_for_moderation(review: Review) -> None:
+    """Bloquea la fila de la review y recarga su estado antes de moderarla
+
+    Dos moderadores sobre la misma review se esperan, y el segundo ve el estado que dejo
+    el primero: el cambio del resumen de calificaciones se decide con el estado vigente
+    y no con el que se cargo al abrir la review.
+
+    Args:
+        review (Review): review a moderar
+    """
+    # refresh descarta los cambios sin guardar del objeto: se guardan antes
+    db.session.flush()
+    db.session.refresh(review, with_for_update=True)
 
 def aprove_review(review: Review) -> Review:
     """Aprueba una review
@@ -75,9 +117,14 @@ def aprove_review(review: Review) -> Review:
     Returns:
         Review: review aprobada
     """
+    _lock_for_moderation(review)
+    if review.state != ReviewState.APPROVED and not review.deleted:
+        _apply_rating_delta(review.historic_site_id, review.rating, 1)
     review.state = ReviewState.APPROVED
     review.rejected_reason = None
+    _release_claim(review)
     db.session.commit()
+    signals.review_changed.send(Review, site_ids=[review.historic_site_id])
     return review
 
 def reject_review(review: Review, reason: str) -> Review:
@@ -94,11 +141,16 @@ def reject_review(review: Review, reason: str) -> Review:
         raise ValueError("Se debe proporcionar un motivo para rechazar la reseña.")
     if len(reason) > 200:
         raise ValueError("El motivo de rechazo no puede exceder los 200 caracteres.")
+    _lock_for_moderation(review)
     if review.state == ReviewState.REJECTED:
         raise ValueError("La reseña ya ha sido rechazada previamente.")
+    if review.state == ReviewState.APPROVED and not review.deleted:
+        _apply_rating_delta(review.historic_site_id, review.rating, -1)
     review.state = ReviewState.REJECTED
     review.rejected_reason = reason
+    _release_claim(review)
     db.session.commit()
+    signals.review_changed.send(Review, site_ids=[review.historic_site_id])
     return review
 
 def delete_review_db(review: Review) -> None:
@@ -107,8 +159,405 @@ def delete_review_db(review: Review) -> None:
     Args:
         review (Review): review a eliminar
     """
+    _lock_for_moderation(review)
+    if review.state == ReviewState.APPROVED and not review.deleted:
+        _apply_rating_delta(review.historic_site_id, review.rating, -1)
     review.deleted = True
+    _release_claim(review)
+    db.session.commit()
+    signals.review_changed.send(Review, site_ids=[review.historic_site_id])
+
+def _bulk_target(review_ids: list[int] | None, filters: dict | None, confirm_all: bool = False):
+    """Arma la condicion que selecciona las reviews de una accion masiva
+
+    Con filtros vacios la accion alcanzaria a todas las reseñas, por lo que
+    en ese caso se exige ``confirm_all``.
+
+    Args:
+        review_ids (list[int] | None): ids explicitos de reviews
+        filters (dict | None): filtros de ``filter_reviews`` si no hay ids
+        confirm_all (bool, optional): confirma aplicar la accion sin ningun filtro. Defaults to False.
+
+    Raises:
+        ValueError: no se indicaron reviews ni filtros, o los filtros estan vacios sin confirmar
+
+    Returns:
+        condicion SQL sobre Review.id
+    """
+    if review_ids:
+        ids = select(Review.id).where(Review.id.in_(review_ids), Review.deleted == False)
+    elif filters is not None:
+        if not confirm_all and all(value in (None, "") for value in filters.values()):
+            raise ValueError("Se debe aplicar al menos un filtro o confirmar la acción sobre todas las reseñas.")
+        ids = filter_reviews(select(Review.id), **filters)
+    else:
+        raise ValueError("Se deben seleccionar reseñas o aplicar filtros.")
+    return Review.id.in_(ids)
+
+
+def _bulk_update(condition, **values) -> tuple[int, set[int]]:
+    """Ejecuta un UPDATE masivo sobre reviews en una sola transaccion
+
+    Los resumenes de calificaciones se recalculan una sola vez por sitio afectado.
+
+    Args:
+        condition: condicion que deben cumplir las reviews a modificar
+        values: columnas a modificar
+
+    Returns:
+        tuple[int, set[int]]: cantidad de reviews modificadas e ids de los sitios afectados
+    """
+    stmt = (
+        update(Review)
+        .where(condition)
+        .values(claimed_by=None, claimed_until=None, **values)
+        .returning(Review.historic_site_id)
+        .execution_options(synchronize_session=False)
+    )
+    site_ids = db.session.scalars(stmt).all()
+    affected_sites = set(site_ids)
+    refresh_rating_summaries(affected_sites)
+    db.session.commit()
+    if affected_sites:
+        signals.review_changed.send(Review, site_ids=sorted(affected_sites))
+    return len(site_ids), affected_sites
+
+
+def bulk_approve_reviews(review_ids: list[int] | None = None, filters: dict | None = None, confirm_all: bool = False) -> tuple[int, set[int]]:
+    """Aprueba varias reviews con un unico UPDATE
+
+    Args:
+        review_ids (list[int] | None, optional): ids de las reviews a aprobar. Defaults to None.
+        filters (dict | None, optional): filtros del listado, usados si no hay ids. Defaults to None.
+        confirm_all (bool, optional): confirma la accion con los filtros vacios. Defaults to False.
+
+    Returns:
+        tuple[int, set[int]]: cantidad de reviews aprobadas e ids de los sitios afectados
+    """
+    condition = _bulk_target(review_ids, filters, confirm_all)
+    return _bulk_update(
+        condition & (Review.state != ReviewState.APPROVED),
+        state=ReviewState.APPROVED,
+        rejected_reason=None,
+    )
+
+
+def bulk_reject_reviews(reason: str, review_ids: list[int] | None = None, filters: dict | None = None, confirm_all: bool = False) -> tuple[int, set[int]]:
+    """Rechaza varias reviews con un unico UPDATE
+
+    Las reviews que ya estaban rechazadas no se modifican.
+
+    Args:
+        reason (str): motivo del rechazo
+        review_ids (list[int] | None, optional): ids de las reviews a rechazar. Defaults to None.
+        filters (dict | None, optional): filtros del listado, usados si no hay ids. Defaults to None.
+        confirm_all (bool, optional): confirma la accion con los filtros vacios. Defaults to False.
+
+    Returns:
+        tuple[int, set[int]]: cantidad de reviews rechazadas e ids de los sitios afectados
+    """
+    if not reason:
+        raise ValueError("Se debe proporcionar un motivo para rechazar la reseña.")
+    if len(reason) > 200:
+        raise ValueError("El motivo de rechazo no puede exceder los 200 caracteres.")
+    condition = _bulk_target(review_ids, filters, confirm_all)
+    return _bulk_update(
+        condition & (Review.state != ReviewState.REJECTED),
+        state=ReviewState.REJECTED,
+        rejected_reason=reason,
+    )
+
+
+def bulk_delete_reviews(review_ids: list[int] | None = None, filters: dict | None = None, confirm_all: bool = False) -> tuple[int, set[int]]:
+    """Elimina (borrado logico) varias reviews con un unico UPDATE
+
+    Args:
+        review_ids (list[int] | None, optional): ids de las reviews a eliminar. Defaults to None.
+        filters (dict | None, optional): filtros del listado, usados si no hay ids. Defaults to None.
+        confirm_all (bool, optional): confirma la accion con los filtros vacios. Defaults to False.
+
+    Returns:
+        tuple[int, set[int]]: cantidad de reviews eliminadas e ids de los sitios afectados
+    """
+    condition = _bulk_target(review_ids, filters, confirm_all)
+    return _bulk_update(condition, deleted=True, deleted_at=db.func.now())
+
+
+def _release_claim(review: Review) -> None:
+    """Libera el reclamo de la cola de moderacion sobre una review
+
+    Args:
+        review (Review): review moderada
+    """
+    review.claimed_by = None
+    review.claimed_until = None
+
+
+def _pending_queue():
+    """Condicion de las reviews pendientes que forman la cola de moderacion"""
+    return (Review.state == ReviewState.PENDING) & (Review.deleted == False)
+
+
+def claimed_reviews(moderator_id: int) -> list[Review]:
+    """Obtiene las reviews pendientes reclamadas (y vigentes) por un moderador
+
+    Args:
+        moderator_id (int): id del moderador
+
+    Returns:
+        list[Review]: reviews reclamadas, en orden de llegada
+    """
+    stmt = (
+        select(Review)
+        .options(joinedload(Review.user), joinedload(Review.historic_site))
+        .where(
+            _pending_queue(),
+            Review.claimed_by == moderator_id,
+            Review.claimed_until > db.func.now(),
+        )
+        .order_by(Review.inserted_at.asc(), Review.id.asc())
+    )
+    return db.session.scalars(stmt).all()
+
+
+def claim_pending_reviews(
+    moderator_id: int,
+    batch_size: int = 25,
+    ttl: timedelta = timedelta(minutes=5),
+    after: tuple[datetime, int] | None = None,
+) -> list[Review]:
+    """Reclama el siguiente lote de reviews pendientes para un moderador
+
+    Las filas se toman con ``FOR UPDATE SKIP LOCKED``, por lo que varios
+    moderadores reclamando a la vez obtienen lotes disjuntos sin esperarse.
+    El reclamo vence a los ``ttl``; si el moderador no termina el lote, las
+    reviews vuelven a la cola. El recorrido es por keyset sobre
+    (inserted_at, id), asi que el costo depende del lote y no del tamaño de la cola.
+
+    Args:
+        moderator_id (int): id del moderador que reclama
+        batch_size (int, optional): cantidad de reviews del lote. Defaults to 25.
+        ttl (timedelta, optional): duracion del reclamo. Defaults to 5 minutos.
+        after (tuple[datetime, int] | None, optional): ultima posicion (inserted_at, id)
+            ya vista; el lote empieza despues de ella. Defaults to None.
+
+    Returns:
+        list[Review]: reviews reclamadas, en orden de llegada
+    """
+    candidates = (
+        select(Review.id)
+        .where(
+            _pending_queue(),
+            db.or_(Review.claimed_until.is_(None), Review.claimed_until < db.func.now()),
+        )
+        .order_by(Review.inserted_at.asc(), Review.id.asc())
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    if after is not None:
+        candidates = candidates.where(
+            tuple_(Review.inserted_at, Review.id)
+            > tuple_(*after, types=[Review.inserted_at.type, Review.id.type])
+        )
+
+    stmt = (
+        update(Review)
+        .where(Review.id.in_(candidates))
+        # El reclamo no es una modificacion de la review: se conserva updated_at
+        .values(
+            claimed_by=moderator_id,
+            claimed_until=db.func.now() + ttl,
+            updated_at=Review.updated_at,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(stmt)
     db.session.commit()
+    return claimed_reviews(moderator_id)
+
+
+def release_claims(moderator_id: int) -> None:
+    """Devuelve a la cola las reviews que el moderador tenia reclamadas
+
+    Args:
+        moderator_id (int): id del moderador
+    """
+    stmt = (
+        update(Review)
+        .where(Review.claimed_by == moderator_id)
+        .values(claimed_by=None, claimed_until=None, updated_at=Review.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(stmt)
+    db.session.commit()
+
+
+# Reviews embebidas en el detalle de sitios ----------------------------
+def approved_reviews_order():
+    """Orden en que se listan las reviews aprobadas de un sitio (mas recientes primero)"""
+    return (Review.inserted_at.desc(), Review.id.desc())
+
+
+def latest_approved_reviews(site_ids: list[int], limit: int) -> dict[int, list[Review]]:
+    """Obtiene las primeras ``limit`` reviews aprobadas de cada sitio con una sola consulta
+
+    Usa ``row_number() over (partition by historic_site_id)`` para cortar por
+    sitio en la base, y carga los autores en la misma consulta.
+
+    Args:
+        site_ids (list[int]): ids de los sitios historicos
+        limit (int): cantidad maxima de reviews por sitio
+
+    Returns:
+        dict[int, list[Review]]: reviews de cada sitio, en el orden del listado publico
+    """
+    result = {site_id: [] for site_id in site_ids}
+    if not site_ids or limit <= 0:
+        return result
+
+    ranked = (
+        select(
+            Review,
+            db.func.row_number()
+            .over(partition_by=Review.historic_site_id, order_by=approved_reviews_order())
+            .label("position"),
+        )
+        .where(
+            Review.historic_site_id.in_(site_ids),
+            Review.state == ReviewState.APPROVED,
+            Review.deleted == False,
+        )
+        .subquery()
+    )
+    ranked_review = aliased(Review, ranked)
+    stmt = (
+        select(ranked_review)
+        .options(joinedload(ranked_review.user))
+        .where(ranked.c.position <= limit)
+        .order_by(ranked_review.historic_site_id, ranked.c.position)
+    )
+    for review in db.session.scalars(stmt):
+        result[review.historic_site_id].append(review)
+    return result
+
+
+# Resumen de calificaciones ----------------------------
+def get_rating_summary(site_id: int) -> dict:
+    """Obtiene el histograma de calificaciones aprobadas de un sitio
+
+    Args:
+        site_id (int): id del sitio historico
+
+    Returns:
+        dict: conteos por estrella, total y promedio
+    """
+    summary = db.session.get(SiteRatingSummary, site_id)
+    return summary.to_dict() if summary else SiteRatingSummary.empty_dict()
+
+
+def _apply_rating_delta(site_id: int, rating: int, delta: int) -> None:
+    """Suma (o resta) una calificacion al resumen de un sitio dentro de la transaccion actual
+
+    Usa un UPSERT atomico, de modo que moderaciones concurrentes sobre el
+    mismo sitio no pisan los conteos.
+
+    Args:
+        site_id (int): id del sitio historico
+        rating (int): calificacion (1 a 5) de la review
+        delta (int): 1 si la review pasa a contar, -1 si deja de contar
+    """
+    column = f"count_{rating}"
+    table = SiteRatingSummary.__table__
+    stmt = pg_insert(table).values(
+        historic_site_id=site_id,
+        total=max(delta, 0),
+        rating_sum=max(delta, 0) * rating,
+        **{column: max(delta, 0)},
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.historic_site_id],
+        set_={
+            column: table.c[column] + delta,
+            "total": table.c.total + delta,
+            "rating_sum": table.c.rating_sum + delta * rating,
+            "updated_at": db.func.now(),
+        },
+    )
+    db.session.execute(stmt)
+    _sync_site_card_ratings({site_id})
+
+
+def refresh_rating_summaries(site_ids: set[int] | None = None) -> None:
+    """Recalcula desde las reviews el resumen de calificaciones de los sitios indicados
+
+    Se usa tras las acciones masivas y para reconstruir los resumenes
+    (``site_ids=None`` recalcula todos los sitios). No hace commit.
+
+    Args:
+        site_ids (set[int] | None, optional): ids de los sitios a recalcular. Defaults to None.
+    """
+    if site_ids is not None and not site_ids:
+        return
+    from core.historic_site.models import HistoricSite
+
+    approved = (Review.historic_site_id == HistoricSite.id) & (
+        Review.state == ReviewState.APPROVED
+    ) & (Review.deleted == False)
+    counts = {
+        f"count_{star}": db.func.count(Review.id).filter(Review.rating == star)
+        for star in range(1, 6)
+    }
+    rows = (
+        select(
+            HistoricSite.id,
+            *counts.values(),
+            db.func.count(Review.id),
+            db.func.coalesce(db.func.sum(Review.rating), 0),
+        )
+        .select_from(HistoricSite)
+        .outerjoin(Review, approved)
+        .group_by(HistoricSite.id)
+    )
+    if site_ids is not None:
+        rows = rows.where(HistoricSite.id.in_(site_ids))
+
+    table = SiteRatingSummary.__table__
+    columns = ["historic_site_id", *counts.keys(), "total", "rating_sum"]
+    stmt = pg_insert(table).from_select(columns, rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.historic_site_id],
+        set_={
+            **{name: stmt.excluded[name] for name in columns[1:]},
+            "updated_at": db.func.now(),
+        },
+    )
+    db.session.execute(stmt)
+    _sync_site_card_ratings(site_ids)
+
+
+def _sync_site_card_ratings(site_ids: set[int] | None = None) -> None:
+    """Copia promedio y cantidad del resumen a las tarjetas (site_card) de los sitios indicados
+
+    Args:
+        site_ids (set[int] | None, optional): ids de los sitios, todos si es None
+    """
+    from core.historic_site.models import SiteCard
+
+    stmt = (
+        update(SiteCard)
+        .where(SiteRatingSummary.historic_site_id == SiteCard.id)
+        .values(
+            rating=SiteRatingSummary.rating_sum * 1.0 / db.func.nullif(SiteRatingSummary.total, 0),
+            rating_count=SiteRatingSummary.total,
+            # El detalle embebe las reviews aprobadas: se invalida su documento
+            document=None,
+            document_version=SiteCard.document_version + 1,
+        )
+    )
+    if site_ids is not None:
+        stmt = stmt.where(SiteCard.id.in_(site_ids))
+    db.session.execute(stmt, execution_options={"synchronize_session": False})
+
 
 def create_review(user_id, site_id, rating, comment, visible=True):
     review = Review(
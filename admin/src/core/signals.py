@@ -0,0 +1,17 @@
+from blinker import Namespace
+
+# Señales que emiten los repositorios despues de confirmar una escritura.
+# Las caches y estructuras derivadas se suscriben para invalidarse.
+_signals = Namespace()
+
+# sender: HistoricSite, kwargs: site_ids (list[int])
+site_changed = _signals.signal("site-changed")
+
+# sender: Tag, kwargs: tag_ids (list[int])
+tag_changed = _signals.signal("tag-changed")
+
+# sender: Review, kwargs: site_ids (list[int]) de los sitios cuyas reviews visibles cambiaron
+review_changed = _signals.signal("review-changed")
+
+# sender: FeatureFlag, kwargs: flag_ids (list[int])
+flag_changed = _signals.signal("flag-changed")
@@ -0,0 +1,349 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+from dataclasses import dataclass
+
+from flask import current_app
+from sqlalchemy import select
+
+from core import signals
+from core.associations import tag_historic_site
+from core.database import INCLUDE_DELETED, db
+from core.historic_site.models import HistoricSite
+from core.tags.models import Tag
+from core.tags.repository import slugify
+
+# Mayor que cualquier caracter de un slug: (prefijo + _KEY_END) acota las claves del prefijo
+_KEY_END = chr(0x10FFFF)
+
+# Sugerencias que se mantienen ordenadas por prefijo: el ``limit`` maximo de la API. Se guarda
+# el doble para que una baja casi nunca obligue a recalcular la lista
+_TOP_K = 25
+_TOP_KEEP = 2 * _TOP_K
+# Prefijos cuyas mejores sugerencias se calculan al armar el indice ("a", "la")
+_SHORT_PREFIX_LEN = 2
+# Prefijos con hasta estas claves se recorren en cada consulta; los de mas, con su lista
+_SCAN_LIMIT = 500
+
+
+@dataclass(frozen=True)
+class Suggestion:
+    type: str
+    id: int | None
+    label: str
+    score: int
+
+    def to_dict(self) -> dict:
+        data = {"type": self.type, "label": self.label}
+        if self.id is not None:
+            data["id"] = self.id
+        return data
+
+
+def _prefix_keys(text: str) -> set[str]:
+    """Claves de busqueda de un texto: el slug completo y el slug desde cada palabra"""
+    words = slugify(text).split("-")
+    return {"-".join(words[i:]) for i in range(len(words)) if words[i]}
+
+
+def _prefixes(keys: set[str]) -> set[str]:
+    return {key[:length] for key in keys for length in range(1, len(key) + 1)}
+
+
+class _Top:
+    """
+    Mejores sugerencias de un prefijo como ``(rango, clave de entrada)``, de mejor a peor.
+    ``complete`` indica que estan todas las del prefijo; si no, son exactamente las mejores
+    """
+
+    __slots__ = ("items", "complete")
+
+    def __init__(self, items: list, complete: bool) -> None:
+        self.items = items
+        self.complete = complete
+
+    def offer(self, item: tuple) -> None:
+        if any(entry_key == item[1] for _, entry_key in self.items):
+            return
+        # Si la lista no esta completa, algo peor que su ultimo puede no estar entre los mejores
+        if self.complete or (self.items and item < self.items[-1]):
+            insort(self.items, item)
+            if len(self.items) > _TOP_KEEP:
+                self.items.pop()
+                self.complete = False
+
+    def discard(self, entry_key: tuple[str, object]) -> bool:
+        for position, (_, key) in enumerate(self.items):
+            if key == entry_key:
+                del self.items[position]
+                return True
+        return False
+
+
+class SuggestIndex:
+    """
+    Indice de prefijos en memoria sobre nombres de sitios, tags, ciudades y provincias
+
+    Las claves se normalizan con ``slugify`` (sin acentos ni mayusculas) y se guardan en
+    una lista ordenada, asi cada consulta es una busqueda binaria sin ir a la base de datos.
+    Los sitios se rankean por ``visit_count``, los tags por ``usage_count`` y las
+    ciudades y provincias por cantidad de sitios.
+
+    Los prefijos cortos, y los que abarcan muchas claves desde la primera vez que se
+    consultan, guardan sus mejores sugerencias (``_Top``) y las escrituras las mantienen:
+    la consulta no depende de cuantas claves empiezan con el prefijo.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._keys: list[tuple[str, tuple[str, object]]] = []
+        self._entries: dict[tuple[str, object], tuple[Suggestion, set[str]]] = {}
+        self._sites: dict[int, tuple[str, str]] = {}
+        self._site_tags: dict[int, set[int]] = {}
+        self._places: Counter[tuple[str, str]] = Counter()
+        self._top: dict[str, _Top] = {}
+        self.built_at: float | None = None
+
+    # Consulta -------------------------------------------------------------
+    def search(self, query: str, limit: int = 10) -> list[Suggestion]:
+        """Devuelve las sugerencias que empiezan con ``query``, las mas populares primero"""
+        prefix = slugify(query)
+        if not prefix:
+            return []
+        with self._lock:
+            top = self._top.get(prefix)
+            if top is None and limit <= _TOP_K:
+                start, end = self._range(prefix)
+                if end - start > _SCAN_LIMIT:
+                    # Se calcula una vez; despues la mantienen las escrituras
+                    top = self._top[prefix] = self._compute_top(start, end)
+            if top is not None and limit <= _TOP_K:
+                return [self._entries[entry_key][0] for _, entry_key in top.items[:limit]]
+            start, end = self._range(prefix)
+            ranked = heapq.nsmallest(limit, map(self._rank, self._entry_keys(start, end)))
+            return [self._entries[entry_key][0] for _, entry_key in ranked]
+
+    def _range(self, prefix: str) -> tuple[int, int]:
+        start = bisect_left(self._keys, (prefix,))
+        return start, bisect_left(self._keys, (prefix + _KEY_END,), lo=start)
+
+    def _entry_keys(self, start: int, end: int) -> set[tuple[str, object]]:
+        # Una entrada puede tener varias claves con el mismo prefijo ("la-plata", "plata")
+        return {entry_key for _, entry_key in self._keys[start:end]}
+
+    def _rank(self, entry_key: tuple[str, object]) -> tuple:
+        suggestion = self._entries[entry_key][0]
+        return (-suggestion.score, suggestion.label), entry_key
+
+    def _top_of(self, entry_keys: set[tuple[str, object]]) -> _Top:
+        items = heapq.nsmallest(_TOP_KEEP, map(self._rank, entry_keys))
+        return _Top(items, complete=len(entry_keys) <= _TOP_KEEP)
+
+    def _compute_top(self, start: int, end: int) -> _Top:
+        return self._top_of(self._entry_keys(start, end))
+
+    # Mantenimiento --------------------------------------------------------
+    def rebuild(self) -> None:
+        """
+        Reconstruye el indice completo desde la base de datos. Se arma aparte y se
+        reemplaza de una vez: mientras tanto las consultas usan el anterior
+        """
+        sites = db.session.execute(
+            select(
+                HistoricSite.id, HistoricSite.name, HistoricSite.city,
+                HistoricSite.province, HistoricSite.visit_count,
+            )
+        ).all()
+        tags = db.session.execute(
+            select(Tag.id, Tag.name, Tag.usage_count)
+        ).all()
+        site_tags = db.session.execute(
+            select(tag_historic_site.c.id_historic_site, tag_historic_site.c.id_tag)
+        ).all()
+        fresh = SuggestIndex()
+        for site_id, tag_id in site_tags:
+            fresh._site_tags.setdefault(site_id, set()).add(tag_id)
+        for row in sites:
+            fresh._sites[row.id] = (row.city, row.province)
+            fresh._places[("city", row.city)] += 1
+            fresh._places[("province", row.province)] += 1
+            fresh._put(Suggestion("site", row.id, row.name, row.visit_count), bulk=True)
+        for (kind, name), count in fresh._places.items():
+            fresh._put(Suggestion(kind, None, name, count), bulk=True)
+        for row in tags:
+            fresh._put(Suggestion("tag", row.id, row.name, row.usage_count), bulk=True)
+        # Una sola ordenacion en lugar de una insercion ordenada por clave
+        fresh._keys.sort()
+        fresh._compute_short_tops()
+        with self._lock:
+            self._keys = fresh._keys
+            self._entries = fresh._entries
+            self._sites = fresh._sites
+            self._site_tags = fresh._site_tags
+            self._places = fresh._places
+            self._top = fresh._top
+            self.built_at = time.monotonic()
+
+    def _compute_short_tops(self) -> None:
+        """Mejores sugerencias de cada prefijo de hasta ``_SHORT_PREFIX_LEN`` letras, en una pasada"""
+        candidates: dict[str, set[tuple[str, object]]] = {}
+        for key, entry_key in self._keys:
+            for length in range(1, min(len(key), _SHORT_PREFIX_LEN) + 1):
+                candidates.setdefault(key[:length], set()).add(entry_key)
+        self._top = {prefix: self._top_of(entry_keys) for prefix, entry_keys in candidates.items()}
+
+    def refresh_sites(self, site_ids: list[int]) -> None:
+        """
+        Vuelve a leer los sitios indicados y los tags que tenian o tienen ahora, cuyo uso
+        puede haber cambiado
+        """
+        rows = db.session.execute(
+            select(
+                HistoricSite.id, HistoricSite.name, HistoricSite.city,
+                HistoricSite.province, HistoricSite.visit_count,
+            ).where(HistoricSite.id.in_(site_ids))
+        ).all()
+        site_tags = db.session.execute(
+            select(tag_historic_site.c.id_historic_site, tag_historic_site.c.id_tag)
+            .join(HistoricSite, HistoricSite.id == tag_historic_site.c.id_historic_site)
+            .where(HistoricSite.id.in_(site_ids))
+        ).all()
+        with self._lock:
+            affected_tags = set()
+            for site_id in site_ids:
+                self._drop_site(site_id)
+                affected_tags |= self._site_tags.pop(site_id, set())
+            for row in rows:
+                self._put_site(row)
+            for site_id, tag_id in site_tags:
+                self._site_tags.setdefault(site_id, set()).add(tag_id)
+                affected_tags.add(tag_id)
+        if affected_tags:
+            self.refresh_tags(list(affected_tags))
+
+    def refresh_tags(self, tag_ids: list[int] | None = None) -> None:
+        """Vuelve a leer los tags indicados, o todos si es None"""
+        # Con las eliminadas, para sacarlas del indice
+        stmt = select(Tag.id, Tag.name, Tag.usage_count, Tag.deleted)
+        if tag_ids is not None:
+            stmt = stmt.where(Tag.id.in_(tag_ids))
+        rows = db.session.execute(stmt, execution_options=INCLUDE_DELETED).all()
+        with self._lock:
+            for row in rows:
+                self._remove(("tag", row.id))
+                if not row.deleted:
+                    self._put(Suggestion("tag", row.id, row.name, row.usage_count))
+
+    def _put_site(self, row) -> None:
+        self._put(Suggestion("site", row.id, row.name, row.visit_count))
+        self._sites[row.id] = (row.city, row.province)
+        for kind, name in (("city", row.city), ("province", row.province)):
+            self._places[(kind, name)] += 1
+            self._remove((kind, name))
+            self._put(Suggestion(kind, None, name, self._places[(kind, name)]))
+
+    def _drop_site(self, site_id: int) -> None:
+        self._remove(("site", site_id))
+        city, province = self._sites.pop(site_id, (None, None))
+        for kind, name in (("city", city), ("province", province)):
+            if name is None:
+                continue
+            self._places[(kind, name)] -= 1
+            self._remove((kind, name))
+            if self._places[(kind, name)] > 0:
+                self._put(Suggestion(kind, None, name, self._places[(kind, name)]))
+            else:
+                del self._places[(kind, name)]
+
+    def _put(self, suggestion: Suggestion, bulk: bool = False) -> None:
+        entry_key = (suggestion.type, suggestion.id if suggestion.id is not None else suggestion.label)
+        keys = _prefix_keys(suggestion.label)
+        self._entries[entry_key] = (suggestion, keys)
+        for key in keys:
+            if bulk:
+                self._keys.append((key, entry_key))
+            else:
+                insort(self._keys, (key, entry_key))
+        if not bulk:
+            item = self._rank(entry_key)
+            for prefix in _prefixes(keys):
+                top = self._top.get(prefix)
+                if top is not None:
+                    top.offer(item)
+
+    def _remove(self, entry_key: tuple[str, object]) -> None:
+        entry = self._entries.pop(entry_key, None)
+        if entry is None:
+            return
+        for key in entry[1]:
+            position = bisect_left(self._keys, (key, entry_key))
+            if position < len(self._keys) and self._keys[position] == (key, entry_key):
+                del self._keys[position]
+        for prefix in _prefixes(entry[1]):
+            top = self._top.get(prefix)
+            # Solo si la lista queda corta se vuelve a recorrer el prefijo
+            if top is not None and top.discard(entry_key) and not top.complete and len(top.items) < _TOP_K:
+                self._top[prefix] = self._compute_top(*self._range(prefix))
+
+
+_index = SuggestIndex()
+
+
+def suggest(query: str, limit: int = 10) -> list[Suggestion]:
+    """
+    Sugerencias para autocompletar. El indice se arma la primera vez que se usa y se
+    reconstruye en segundo plano cada ``SUGGEST_INDEX_TTL`` segundos, para tomar visitas
+    nuevas y escrituras de otros procesos; entre medio se mantiene con las señales de
+    sitios y tags.
+    """
+    ttl = current_app.config.get("SUGGEST_INDEX_TTL")
+    if _index.built_at is None:
+        # Sin indice no hay que servir: se espera a que un solo hilo lo arme
+        with _rebuild_lock:
+            if _index.built_at is None:
+                _index.rebuild()
+    elif ttl and time.monotonic() - _index.built_at > ttl:
+        _rebuild_in_background(current_app._get_current_object())
+    return _index.search(query, limit)
+
+
+_rebuild_lock = threading.Lock()
+
+
+def _rebuild_in_background(app) -> None:
+    """Reconstruye el indice en otro hilo, salvo que ya haya una reconstruccion en curso"""
+    if not _rebuild_lock.acquire(blocking=False):
+        return
+
+    def run() -> None:
+        try:
+            with app.app_context():
+                _index.rebuild()
+        except Exception:
+            # Se reintenta con la proxima consulta; mientras tanto sirve el indice anterior
+            app.logger.exception("suggest index rebuild failed")
+        finally:
+            _rebuild_lock.release()
+
+    threading.Thread(target=run, name="suggest-rebuild", daemon=True).start()
+
+
+def _on_site_changed(sender, site_ids: list[int] = (), **extra) -> None:
+    if _index.built_at is not None and site_ids:
+        _index.refresh_sites(list(site_ids))
+
+
+def _on_tag_changed(sender, tag_ids: list[int] = (), **extra) -> None:
+    if _index.built_at is not None and tag_ids:
+        _index.refresh_tags(list(tag_ids))
+
+
+signals.site_changed.connect(_on_site_changed)
+signals.tag_changed.connect(_on_tag_changed)
+
+
+def reset() -> None:
+    """Descarta el indice; se vuelve a armar en la proxima consulta"""
+    _index.built_at = None
@@ -0,0 +1,402 @@
+"""
+Generador de datos sinteticos de alto volumen para pruebas de carga.
+
+A diferencia de ``core.seeds``, que crea unos pocos sitios de demostracion a traves de
+los repositorios, aca las filas se arman en memoria y se cargan con ``COPY FROM STDIN``
+en lotes que se envian en paralelo, cada uno por su propia conexion.
+
+Los ids se asignan de antemano (a partir del maximo existente) para poder generar las
+tablas relacionadas sin consultar la base, y cada lote usa su propio ``Random`` derivado
+de la semilla, de modo que el resultado es el mismo sin importar el orden en que terminen.
+"""
+
+import csv
+import io
+import random
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import select, text
+
+from core.auth.models import Role, User
+from core.database import db
+from core.encription import bcrypt
+from core.historic_site import repository as historic_site_repository
+from core.reviews import repository as reviews_repository
+from core.reviews.models import ReviewState
+from core.tags import repository as tags_repository
+from core.tags.models import Tag
+
+# Contraseña de todos los usuarios generados
+DEFAULT_PASSWORD = "sintetico1"
+
+# (ciudad, provincia, latitud, longitud, peso relativo)
+PLACES = [
+    ("Ciudad de Buenos Aires", "Buenos Aires", -34.6037, -58.3816, 30),
+    ("La Plata", "Buenos Aires", -34.9214, -57.9545, 8),
+    ("Mar del Plata", "Buenos Aires", -38.0055, -57.5426, 6),
+    ("Bahía Blanca", "Buenos Aires", -38.7196, -62.2724, 3),
+    ("Tandil", "Buenos Aires", -37.3217, -59.1332, 2),
+    ("San Antonio de Areco", "Buenos Aires", -34.2446, -59.4717, 1),
+    ("Córdoba", "Córdoba", -31.4201, -64.1888, 10),
+    ("Alta Gracia", "Córdoba", -31.6590, -64.4290, 2),
+    ("Villa Carlos Paz", "Córdoba", -31.4241, -64.4978, 2),
+    ("Rosario", "Santa Fe", -32.9442, -60.6505, 8),
+    ("Santa Fe", "Santa Fe", -31.6107, -60.6973, 4),
+    ("Mendoza", "Mendoza", -32.8895, -68.8458, 6),
+    ("San Rafael", "Mendoza", -34.6177, -68.3301, 2),
+    ("San Miguel de Tucumán", "Tucumán", -26.8083, -65.2176, 5),
+    ("Salta", "Salta", -24.7821, -65.4232, 5),
+    ("Cafayate", "Salta", -26.0730, -65.9761, 1),
+    ("San Salvador de Jujuy", "Jujuy", -24.1858, -65.2995, 3),
+    ("Humahuaca", "Jujuy", -23.2054, -65.3505, 1),
+    ("Santiago del Estero", "Santiago del Estero", -27.7834, -64.2642, 2),
+    ("San Fernando del Valle de Catamarca", "Catamarca", -28.4696, -65.7852, 2),
+    ("La Rioja", "La Rioja", -29.4131, -66.8558, 2),
+    ("San Juan", "San Juan", -31.5375, -68.5364, 3),
+    ("San Luis", "San Luis", -33.3017, -66.3378, 2),
+    ("Paraná", "Entre Ríos", -31.7413, -60.5115, 3),
+    ("Concepción del Uruguay", "Entre Ríos", -32.4846, -58.2321, 1),
+    ("Corrientes", "Corrientes", -27.4692, -58.8306, 3),
+    ("Posadas", "Misiones", -27.3671, -55.8961, 3),
+    ("San Ignacio", "Misiones", -27.2550, -55.5392, 1),
+    ("Resistencia", "Chaco", -27.4514, -58.9867, 3),
+    ("Formosa", "Formosa", -26.1775, -58.1781, 2),
+    ("Santa Rosa", "La Pampa", -36.6203, -64.2906, 2),
+    ("Neuquén", "Neuquén", -38.9516, -68.0591, 3),
+    ("San Carlos de Bariloche", "Río Negro", -41.1335, -71.3103, 3),
+    ("Viedma", "Río Negro", -40.8135, -62.9967, 1),
+    ("Rawson", "Chubut", -43.3002, -65.1023, 1),
+    ("Trelew", "Chubut", -43.2490, -65.3051, 2),
+    ("Río Gallegos", "Santa Cruz", -51.6230, -69.2168, 1),
+    ("El Calafate", "Santa Cruz", -50.3379, -72.2648, 1),
+    ("Ushuaia", "Tierra del Fuego", -54.8019, -68.3030, 1),
+]
+_PLACE_WEIGHTS = [place[4] for place in PLACES]
+
+SITE_KINDS = [
+    "Casa", "Iglesia", "Capilla", "Catedral", "Cabildo", "Museo", "Teatro", "Estación",
+    "Fuerte", "Palacio", "Escuela", "Mercado", "Puente", "Faro", "Estancia", "Monumento",
+    "Plaza", "Molino", "Biblioteca", "Hotel",
+]
+SITE_PATRONS = [
+    "San Martín", "Belgrano", "Sarmiento", "Rivadavia", "Moreno", "Güemes", "Alberdi",
+    "Mitre", "Pueyrredón", "Azurduy", "Saavedra", "Castelli", "Brown", "Laprida",
+    "Juana Manso", "Alfonsina Storni", "del Centenario", "de la Independencia",
+    "de los Inmigrantes", "del Puerto",
+]
+FIRST_NAMES = [
+    "María", "Juan", "Lucía", "Martín", "Sofía", "Mateo", "Valentina", "Santiago", "Camila",
+    "Tomás", "Julieta", "Joaquín", "Florencia", "Facundo", "Agustina", "Nicolás",
+]
+LAST_NAMES = [
+    "González", "Rodríguez", "Gómez", "Fernández", "López", "Díaz", "Martínez", "Pérez",
+    "García", "Sánchez", "Romero", "Sosa", "Álvarez", "Torres", "Ruiz", "Ramírez",
+]
+TAG_THEMES = [
+    "colonial", "jesuítico", "ferroviario", "art-nouveau", "art-decó", "neoclásico",
+    "religioso", "militar", "industrial", "portuario", "rural", "indígena",
+    "patrimonio-nacional", "arqueológico", "educativo", "gastronómico", "mirador",
+    "accesible", "nocturno", "familiar",
+]
+STATES = [("bueno", 55), ("regular", 35), ("malo", 10)]
+REVIEW_STATES = [(ReviewState.APPROVED, 80), (ReviewState.PENDING, 15), (ReviewState.REJECTED, 5)]
+REVIEW_COMMENTS = [
+    "Excelente lugar, muy bien conservado y con buena información para el visitante.",
+    "Vale la pena la visita, aunque algunos sectores necesitan mantenimiento.",
+    "Muy lindo, ideal para ir en familia. Las visitas guiadas son recomendables.",
+    "Interesante por su historia, pero los horarios de apertura son acotados.",
+    "Un imperdible de la ciudad. La arquitectura es impresionante.",
+    "Esperaba más; poca señalización y nada de información en el lugar.",
+]
+
+# Fecha mas antigua de alta de los sitios y reseñas generados
+_HISTORY_DAYS = 5 * 365
+
+
+@dataclass
+class GeneratedData:
+    """Rangos de ids creados por tabla"""
+
+    users: range = range(0)
+    tags: range = range(0)
+    sites: range = range(0)
+    images: range = range(0)
+    reviews: range = range(0)
+    favorites: int = 0
+
+    def counts(self) -> dict:
+        return {
+            "users": len(self.users),
+            "tags": len(self.tags),
+            "sites": len(self.sites),
+            "images": len(self.images),
+            "reviews": len(self.reviews),
+            "favorites": self.favorites,
+        }
+
+
+def user_email(user_id: int) -> str:
+    """Email del usuario generado con ese id"""
+    return f"usuario{user_id}@example.com"
+
+
+def generate(
+    sites: int,
+    reviews: int,
+    users: int,
+    tags: int = 200,
+    images_per_site: int = 3,
+    favorites_per_user: int = 10,
+    max_tags_per_site: int = 3,
+    seed: int = 42,
+    batch_size: int = 50_000,
+    workers: int = 4,
+) -> GeneratedData:
+    """
+    Genera y carga datos sinteticos sobre una base que ya tiene los datos de ``core.seeds``
+
+    Args:
+        sites: cantidad de sitios historicos
+        reviews: cantidad total de reseñas, repartidas al azar entre sitios y usuarios
+        users: cantidad de usuarios publicos
+        tags: cantidad de etiquetas
+        images_per_site: imagenes (solo metadatos) por sitio
+        favorites_per_user: favoritos por usuario
+        max_tags_per_site: maximo de etiquetas por sitio
+        seed: semilla del generador; la misma semilla produce los mismos datos
+        batch_size: filas por lote de ``COPY``
+        workers: lotes que se cargan en paralelo
+
+    Returns:
+        GeneratedData: rangos de ids creados
+    """
+    public_role_id = db.session.scalar(select(Role.id_role).where(Role.name == "Usuario público"))
+    author_id = db.session.scalar(
+        select(User.id).where(User.system_admin.is_(True)).order_by(User.id).limit(1)
+    )
+    if public_role_id is None or author_id is None:
+        raise ValueError("Faltan los datos base; ejecutar antes `flask seed-db`")
+
+    if not users or not sites:
+        # Sin sitios o sin usuarios no hay a quien asignar reseñas
+        reviews = 0
+
+    result = GeneratedData(
+        users=_next_ids("users", users),
+        tags=_next_ids("tag", tags),
+        sites=_next_ids("historic_site", sites),
+    )
+    result.images = _next_ids("image", sites * images_per_site)
+    result.reviews = _next_ids("review", reviews)
+    modifications = _next_ids("modification", sites)
+
+    tag_names = _tag_names(result.tags, seed)
+    password = bcrypt.generate_password_hash(DEFAULT_PASSWORD).decode("utf-8")
+    with _CopyLoader(db.engine, workers) as loader:
+        _load(loader, result, modifications, tag_names, password, public_role_id, author_id,
+              images_per_site, favorites_per_user, max_tags_per_site, seed, batch_size)
+    result.favorites = len(result.users) * min(favorites_per_user, len(result.sites))
+
+    # Agregados que en uso normal mantienen los repositorios
+    reviews_repository.refresh_rating_summaries()
+    tags_repository.refresh_usage_counts(list(result.tags))
+    historic_site_repository.refresh_site_cards()
+    db.session.commit()
+    with db.engine.connect() as conn:
+        for table in [*loader.tables, "site_card"]:
+            conn.execute(text(f"ANALYZE {table}"))
+        conn.commit()
+    return result
+
+
+def _load(loader, result, modifications, tag_names, password, public_role_id, author_id,
+          images_per_site, favorites_per_user, max_tags_per_site, seed, batch_size) -> None:
+    now = datetime.now(UTC)
+    # Primero las tablas referenciadas, despues las que tienen claves foraneas hacia ellas
+    loader.load(
+        "users",
+        ("id", "email", "name", "last_name", "password", "enabled", "system_admin", "id_role", "deleted"),
+        result.users, batch_size, seed,
+        lambda rng, user_id: [
+            (user_id, user_email(user_id), rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES),
+             password, "t", "f", public_role_id, "f")
+        ],
+    )
+    loader.load(
+        "tag", ("id", "name", "deleted"), result.tags, batch_size, seed,
+        lambda rng, tag_id: [(tag_id, tag_names[tag_id], "f")],
+    )
+    loader.load(
+        "historic_site",
+        ("id", "name", "short_description", "description", "city", "province", "location",
+         "state_of_conservation", "inauguration_year", "visible", "deleted", "visit_count",
+         "inserted_at", "updated_at"),
+        result.sites, batch_size, seed,
+        lambda rng, site_id: [_site_row(rng, site_id, now)],
+    )
+    loader.wait()
+
+    loader.load(
+        "modification", ("id", "id_historic_site", "id_user", "deleted", "date_time"),
+        modifications, batch_size, seed,
+        lambda rng, modification_id: [
+            (modification_id, result.sites[modification_id - modifications.start], author_id, "f",
+             _past(rng, now).isoformat())
+        ],
+    )
+    loader.load(
+        "tag_historic_site", ("id_historic_site", "id_tag"), result.sites, batch_size, seed,
+        lambda rng, site_id: [
+            (site_id, tag_id)
+            for tag_id in rng.sample(result.tags, min(rng.randint(0, max_tags_per_site), len(result.tags)))
+        ],
+    )
+    loader.load(
+        "image",
+        ("id", "id_historic_site", "image", "title", "order_index", "is_cover", "content_type", "size", "deleted"),
+        result.sites, batch_size, seed,
+        lambda rng, site_id: [
+            (result.images.start + (site_id - result.sites.start) * images_per_site + order, site_id,
+             f"https://picsum.photos/seed/sitio-{site_id}-{order}/1200/800", f"Vista {order + 1}",
+             order, "t" if order == 0 else "f", "image/jpeg", rng.randint(80_000, 2_500_000), "f")
+            for order in range(images_per_site)
+        ],
+    )
+    loader.load(
+        "review",
+        ("id", "historic_site_id", "user_id", "rating", "comment", "state", "deleted", "inserted_at", "updated_at"),
+        result.reviews, batch_size, seed,
+        lambda rng, review_id: [_review_row(rng, review_id, result, now)],
+    )
+    favorites = min(favorites_per_user, len(result.sites))
+    loader.load(
+        "user_favorite_sites", ("id_user", "id_historic_site", "deleted"), result.users, batch_size, seed,
+        lambda rng, user_id: [(user_id, site_id, "f") for site_id in rng.sample(result.sites, favorites)],
+    )
+    loader.wait()
+
+
+def _next_ids(table: str, count: int) -> range:
+    """Reserva ``count`` ids a partir del maximo actual y adelanta la secuencia de la tabla"""
+    if count <= 0:
+        return range(0)
+    start = db.session.execute(
+        text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"(SELECT COALESCE(MAX(id), 0) FROM {table}) + :count) - :count + 1"
+        ),
+        {"count": count},
+    ).scalar_one()
+    db.session.commit()
+    return range(start, start + count)
+
+
+def _tag_names(ids: range, seed: int) -> dict[int, str]:
+    existing = set(db.session.scalars(select(Tag.name)))
+    rng = random.Random(f"{seed}:tag-names")
+    names = {}
+    candidates = (
+        theme if round_ == 0 else f"{theme}-{round_}"
+        for round_ in range(len(ids) + len(existing) + 1)
+        for theme in rng.sample(TAG_THEMES, len(TAG_THEMES))
+    )
+    for tag_id in ids:
+        name = next(candidates)
+        while name in existing:
+            name = next(candidates)
+        names[tag_id] = name
+    return names
+
+
+def _past(rng: random.Random, now: datetime) -> datetime:
+    return now - timedelta(seconds=rng.randint(0, _HISTORY_DAYS * 86400))
+
+
+def _site_row(rng: random.Random, site_id: int, now: datetime) -> tuple:
+    city, province, lat, lon, _ = rng.choices(PLACES, weights=_PLACE_WEIGHTS)[0]
+    kind, patron = rng.choice(SITE_KINDS), rng.choice(SITE_PATRONS)
+    year = rng.randint(1580, 2000)
+    inserted_at = _past(rng, now).isoformat()
+    return (
+        site_id,
+        f"{kind} {patron} N° {site_id}",
+        f"{kind} de {city} inaugurado en {year}",
+        f"{kind} {patron}, ubicado en {city}, {province}. Construido en {year}, "
+        f"es uno de los {rng.randint(2, 40)} sitios históricos relevados en la zona.",
+        city,
+        province,
+        f"SRID=4326;POINT({lon + rng.gauss(0, 0.05):.6f} {lat + rng.gauss(0, 0.05):.6f})",
+        rng.choices([s for s, _ in STATES], weights=[w for _, w in STATES])[0],
+        year,
+        "t" if rng.random() < 0.95 else "f",
+        "f",
+        min(int(rng.paretovariate(1.2) * 10), 1_000_000),
+        inserted_at,
+        inserted_at,
+    )
+
+
+def _review_row(rng: random.Random, review_id: int, data: GeneratedData, now: datetime) -> tuple:
+    inserted_at = _past(rng, now).isoformat()
+    return (
+        review_id,
+        rng.choice(data.sites),
+        rng.choice(data.users),
+        rng.choices([5, 4, 3, 2, 1], weights=[35, 30, 18, 10, 7])[0],
+        rng.choice(REVIEW_COMMENTS),
+        rng.choices([s for s, _ in REVIEW_STATES], weights=[w for _, w in REVIEW_STATES])[0].name,
+        "f",
+        inserted_at,
+        inserted_at,
+    )
+
+
+class _CopyLoader:
+    """Arma lotes CSV y los carga con ``COPY FROM STDIN`` desde un pool de hilos"""
+
+    def __init__(self, engine, workers: int):
+        self.engine = engine
+        self.executor = ThreadPoolExecutor(max_workers=max(workers, 1))
+        self.pending = []
+        self.tables = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.executor.shutdown(cancel_futures=exc_info[0] is not None)
+
+    def load(self, table, columns, ids: range, batch_size: int, seed: int, rows_for) -> None:
+        """Encola la carga de ``table``: un lote por cada ``batch_size`` ids de ``ids``"""
+        self.tables.append(table)
+        statement = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+        for number, start in enumerate(range(0, len(ids), batch_size)):
+            batch = ids[start:start + batch_size]
+            rng = random.Random(f"{seed}:{table}:{number}")
+            self.pending.append(self.executor.submit(self._copy, statement, batch, rng, rows_for))
+
+    def wait(self) -> None:
+        """Espera los lotes encolados; propaga el primer error"""
+        pending, self.pending = self.pending, []
+        for future in pending:
+            future.result()
+
+    def _copy(self, statement, batch, rng, rows_for) -> None:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for item in batch:
+            writer.writerows(rows_for(rng, item))
+        buffer.seek(0)
+
+        connection = self.engine.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.copy_expert(statement, buffer)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
@@ -1,13 +1,13 @@
 from datetime import datetime
 
-from sqlalchemy import DateTime, String
+from sqlalchemy import DateTime, Index, Integer, String, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from core.associations import tag_historic_site
-from core.database import db
+from core.database import SoftDeleteMixin, db
 
 
-class Tag(db.Model):
+class Tag(db.Model, SoftDeleteMixin):
     __tablename__ = "tag"
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
@@ -16,6 +16,10 @@ class Tag(db.Model):
         DateTime(timezone=True), server_default=db.func.now(), nullable=False
     )
     deleted: Mapped[bool] = mapped_column(db.Boolean, default=False, nullable=False)
+    # Cantidad de sitios no eliminados que usan la etiqueta, mantenida por el repositorio de sitios
+    usage_count: Mapped[int] = mapped_column(
+        Integer, default=0, server_default="0", nullable=False
+    )
 
     historic_sites: Mapped[list["HistoricSite"]] = relationship(
         "HistoricSite",
@@ -23,10 +27,16 @@ class Tag(db.Model):
         back_populates="tags",
     )
     
+    __table_args__ = (
+        Index("ix_tag_live_usage_count", usage_count.desc(), "name", postgresql_where=text("NOT deleted")),
+        Index("ix_tag_deleted_at", "deleted_at", postgresql_where=text("deleted")),
+    )
+
     def to_dict(self) -> dict:
         return {
             "id": self.id,
             "name": self.name,
+            "usage_count": self.usage_count,
         }
 
     def __repr__(self):
@@ -1,7 +1,12 @@
 import re
 import unicodedata
 
-from core.database import db
+from sqlalchemy import exists, func, select, update
+
+from core import signals
+from core.associations import tag_historic_site
+from core.database import INCLUDE_DELETED, db
+from core.historic_site.models import HistoricSite
 from core.tags.models import Tag
 
 
@@ -11,6 +16,8 @@ def list_tags(
     """
     Obtiene una lista paginada de etiquetas desde la base de datos segun los parametros indicados
 
+    El total sale de una funcion de ventana en la misma consulta que la pagina.
+
     Args:
         page (int, optional): numero de pagina actual. Defaults to 1.
         per_page (int, optional): cantidad de elementos maxima de la pagina. Defaults to 25.
@@ -27,32 +34,48 @@ def list_tags(
     # filtro por búsqueda
     if search:
         query = query.filter(Tag.name.ilike(f"%{search}%"))
-    # orden
-    if order == "alfabetico":
-        query = query.order_by(Tag.name.asc())
-    elif order == "inverso":
-        query = query.order_by(Tag.name.desc())
-    elif order == "antiguos":
-        query = query.order_by(Tag.created_at.asc())
-    else:  # recientes por defecto
-        query = query.order_by(Tag.created_at.desc())
 
-    query = query.filter_by(deleted=False)
-
-    total = query.count()
+    rows = (
+        _order_tags(query, order)
+        .add_columns(func.count().over().label("total"))
+        .offset((page - 1) * per_page)
+        .limit(per_page)
+        .all()
+    )
+    if rows:
+        total = rows[0].total
+    else:
+        # Pagina fuera de rango: no hay filas de las que leer el total
+        total = query.count() if page > 1 else 0
     total_pages = (total + per_page - 1) // per_page
-    tags = query.offset((page - 1) * per_page).limit(per_page).all()
-    return tags, total_pages
+    return [row.Tag for row in rows], total_pages
 
 
-def list_all_tags() -> list[Tag]:
+def _order_tags(query, order: str):
+    """Aplica el orden de los listados de etiquetas"""
+    if order == "alfabetico":
+        return query.order_by(Tag.name.asc())
+    if order == "inverso":
+        return query.order_by(Tag.name.desc())
+    if order == "antiguos":
+        return query.order_by(Tag.created_at.asc())
+    if order == "populares":
+        return query.order_by(Tag.usage_count.desc(), Tag.name.asc())
+    # recientes por defecto
+    return query.order_by(Tag.created_at.desc())
+
+
+def list_all_tags(order: str = "alfabetico") -> list[Tag]:
     """
-    Obtiene todas las etiquetas ordenadas alfabeticamente
+    Obtiene todas las etiquetas, ordenadas alfabeticamente por defecto
+
+    Args:
+        order (str, optional): orden en el que se ordenan los tags. Defaults to "alfabetico".
 
     Returns:
         list[Tag]: lista con todas las etiquetas
     """
-    return db.session.query(Tag).order_by(Tag.name.asc()).filter_by(deleted=False).all()
+    return _order_tags(db.session.query(Tag), order).all()
 
 
 def create_tag(name: str) -> Tag:
@@ -77,19 +100,26 @@ def create_tag(name: str) -> Tag:
     if len(name_tag) > 50 or len(name_tag) < 3:
         raise ValueError("Debe ingresar entre 3 y 50 caracteres")
 
-    existing = db.session.query(Tag).filter_by(name=name_tag, deleted=False).first()
+    existing = db.session.query(Tag).filter_by(name=name_tag).first()
     if existing:
         raise ValueError(f"Ya existe un tag con el nombre '{name_tag}'.")
 
-    tag_deleted = db.session.query(Tag).filter_by(name=name_tag, deleted=True).first()
+    tag_deleted = (
+        db.session.query(Tag)
+        .execution_options(**INCLUDE_DELETED)
+        .filter_by(name=name_tag, deleted=True)
+        .first()
+    )
     if tag_deleted:
         tag_deleted.deleted = False
         db.session.commit()
+        signals.tag_changed.send(Tag, tag_ids=[tag_deleted.id])
         return tag_deleted
 
     new_tag = Tag(name=name_tag)
     db.session.add(new_tag)
     db.session.commit()
+    signals.tag_changed.send(Tag, tag_ids=[new_tag.id])
     return new_tag
 
 
@@ -117,11 +147,16 @@ def update_tag(tag_id: int, new_name: str) -> Tag:
     if len(name_tag) > 50 or len(name_tag) < 3:
         raise ValueError("Debe ingresar entre 3 y 50 caracteres")
 
-    existing = db.session.query(Tag).filter_by(name=name_tag, deleted=False).first()
+    existing = db.session.query(Tag).filter_by(name=name_tag).first()
     if existing:
         raise ValueError(f"Ya existe una etiqueta con el nombre '{name_tag}'.")
 
-    tag_deleted = db.session.query(Tag).filter_by(name=name_tag, deleted=True).first()
+    tag_deleted = (
+        db.session.query(Tag)
+        .execution_options(**INCLUDE_DELETED)
+        .filter_by(name=name_tag, deleted=True)
+        .first()
+    )
     if tag_deleted:
         db.session.delete(tag_deleted)
 
@@ -130,6 +165,7 @@ def update_tag(tag_id: int, new_name: str) -> Tag:
         raise ValueError("Etiqueta no encontrada.")
     tag.name = name_tag
     db.session.commit()
+    signals.tag_changed.send(Tag, tag_ids=[tag.id])
     return tag
 
 
@@ -147,12 +183,58 @@ def delete_tag(tag_id: int) -> None:
     tag = db.session.query(Tag).filter_by(id=tag_id).first()
     if not tag:
         raise ValueError("Etiqueta no encontrada.")
-    if tag.historic_sites and len(tag.historic_sites) > 0:
+    in_use = db.session.query(
+        exists().where(tag_historic_site.c.id_tag == tag.id)
+    ).scalar()
+    if in_use:
         raise ValueError(
             "No se puede eliminar la etiqueta porque está asociada a sitios históricos."
         )
     tag.deleted = True
     db.session.commit()
+    signals.tag_changed.send(Tag, tag_ids=[tag.id])
+
+
+def adjust_usage_counts(added: set[int] = frozenset(), removed: set[int] = frozenset()) -> None:
+    """
+    Suma uno al ``usage_count`` de las etiquetas que un sitio empieza a usar y resta uno al de
+    las que deja de usar, sin contar de nuevo la tabla de asociacion. No confirma la
+    transaccion, asi el conteo se guarda junto con el cambio de tags que lo origino
+
+    Args:
+        added (set[int], optional): etiquetas que el sitio empieza a usar
+        removed (set[int], optional): etiquetas que el sitio deja de usar
+    """
+    for tag_ids, delta in ((added - removed, 1), (removed - added, -1)):
+        if tag_ids:
+            db.session.execute(
+                update(Tag).where(Tag.id.in_(tag_ids)).values(usage_count=Tag.usage_count + delta),
+                execution_options={"synchronize_session": False},
+            )
+
+
+def refresh_usage_counts(tag_ids: list[int] | None = None) -> None:
+    """
+    Recalcula ``usage_count`` a partir de la tabla de asociacion. Las escrituras de sitios
+    usan adjust_usage_counts; el recuento completo queda para ``flask refresh-tag-usage`` y las
+    cargas masivas. No confirma la transaccion
+
+    Args:
+        tag_ids (list[int] | None, optional): etiquetas a recalcular, todas si es None
+    """
+    if tag_ids is not None and not tag_ids:
+        return
+    usage = (
+        select(func.count())
+        .select_from(tag_historic_site)
+        .join(HistoricSite, HistoricSite.id == tag_historic_site.c.id_historic_site)
+        .where(tag_historic_site.c.id_tag == Tag.id, HistoricSite.deleted == False)
+        .scalar_subquery()
+    )
+    stmt = update(Tag).values(usage_count=usage)
+    if tag_ids is not None:
+        stmt = stmt.where(Tag.id.in_(set(tag_ids)))
+    db.session.execute(stmt, execution_options={"synchronize_session": False})
 
 
 def get_tag_by_id(tag_id: int) -> Tag | None:
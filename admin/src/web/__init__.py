@@ -1,16 +1,26 @@
 from datetime import timezone, datetime, timedelta
 
+import click
 from flask import Flask, render_template, session
-from flask_jwt_extended import JWTManager, get_jwt, create_access_token, get_jwt_identity, set_access_cookies
+from flask_jwt_extended import JWTManager, get_jwt, get_jwt_identity, set_access_cookies
 from flask_cors import CORS
-from core import database, seeds
+from core import archive, database, migrations, seeds, synthetic
+from core.historic_site import repository as historic_site_repository
+from core.reviews import repository as reviews_repository
+from core.tags import repository as tags_repository
 from core.auth import repository
 from core.encription import bcrypt
 from flask_session import Session
+from web.compression import compression
+from web.edge_cache import edge_cache
+from web.instrumentation import sql_instrumentation
+from web.json_provider import APIJSONProvider
+from web.metrics import metrics_exporter
 from web.storage import storage
 from .api.auth_google import auth_google_bp
 
 from .api.routes import bp as api_bp
+from .api.tokens import is_token_revoked, renew_access_token
 from .controllers.auth import auth_bp
 from .controllers.feature_flags import feature_flags_bp
 from .controllers.historic_site import historic_site_bp
@@ -19,6 +29,20 @@ from .controllers.users import user_bp
 from .controllers.reviews import reviews_bp
 from .handlers.error import error_401, error_404, error_500
 
+def allowed_origins(app) -> list[str]:
+    """Orígenes del portal a los que se les permite usar la API con credenciales"""
+    # Definimos los orígenes permitidos hardcodeados para desarrollo local
+    # más lo que venga en el entorno
+    origins = [
+        "http://localhost:5173",
+        "http://127.0.0.1:5173",
+        app.config.get("FRONTEND_ORIGIN")
+    ]
+
+    # Filtramos para quitar duplicados o valores nulos
+    return list(set([origin for origin in origins if origin]))
+
+
 def create_app(env="development", static_folder="../../static"):
     app = Flask(__name__, static_folder=static_folder)
     app.config.from_object(f"web.config.{env.capitalize()}Config")
@@ -27,25 +51,21 @@ def create_app(env="development", static_folder="../../static"):
         SESSION_COOKIE_SECURE=False,
         SESSION_COOKIE_HTTPONLY=True,
     )
+    app.json = APIJSONProvider(app)
     Session(app)
     bcrypt.init_app(app)
+    metrics_exporter.init_app(app)
+    # Despues de metrics: los after_request corren en orden inverso y asi la latencia
+    # medida incluye la compresion
+    compression.init_app(app)
     database.init_app(app)
-    JWTManager(app)
+    sql_instrumentation.init_app(app)
+    JWTManager(app).token_in_blocklist_loader(is_token_revoked)
     storage.init_app(app)
+    edge_cache.init_app(app)
     if not app.config["TESTING"]:
-        # Definimos los orígenes permitidos hardcodeados para desarrollo local
-        # más lo que venga en el entorno
-        allowed_origins = [
-            "http://localhost:5173",
-            "http://127.0.0.1:5173",
-            app.config.get("FRONTEND_ORIGIN")
-        ]
-        
-        # Filtramos para quitar duplicados o valores nulos
-        allowed_origins = list(set([origin for origin in allowed_origins if origin]))
-
         # Habilitamos CORS para todas las rutas (/api/* es lo crítico, pero global está bien para dev)
-        CORS(app, supports_credentials=True, origins=allowed_origins)
+        CORS(app, supports_credentials=True, origins=allowed_origins(app))
     # if not app.config["TESTING"]:
     #     CORS(app, supports_credentials=True, origins=[app.config.get("FRONTEND_ORIGIN")])
     # if not app.config["TESTING"]:
@@ -112,21 +132,117 @@ def create_app(env="development", static_folder="../../static"):
     def reset_db():
         database.reset_db()
 
+    @app.cli.command("migrate-db")
+    @click.option("--to", "target", default=None, help="Versión hasta la que migrar (por defecto la última)")
+    def migrate_db(target):
+        """Aplica las migraciones pendientes del esquema."""
+        applied = migrations.upgrade(database.db.engine, target)
+        for migration in applied:
+            print(f"Applied {migration.version} {migration.description}")
+        print(f"Database at version {(migrations.applied_versions(database.db.engine) or ['none'])[-1]}.")
+
+    @app.cli.command("rollback-db")
+    @click.option("--to", "target", required=True, help="Versión a la que volver (0000 revierte todas)")
+    def rollback_db(target):
+        """Revierte las migraciones posteriores a una versión."""
+        for migration in migrations.downgrade(database.db.engine, target):
+            print(f"Reverted {migration.version} {migration.description}")
+        print(f"Database at version {(migrations.applied_versions(database.db.engine) or ['none'])[-1]}.")
+
     @app.cli.command("seed-db")
     def seed_db():
         print("Seeding database...")
         seeds.run()
         print("Database seeding complete.")
 
+    @app.cli.command("generate-data")
+    @click.option("--sites", default=1_000, show_default=True, help="Sitios históricos")
+    @click.option("--reviews", default=5_000, show_default=True, help="Reseñas en total")
+    @click.option("--users", default=200, show_default=True, help="Usuarios públicos")
+    @click.option("--tags", default=200, show_default=True)
+    @click.option("--images-per-site", default=3, show_default=True)
+    @click.option("--favorites-per-user", default=10, show_default=True)
+    @click.option("--seed", default=42, show_default=True, help="Semilla del generador")
+    @click.option("--batch-size", default=50_000, show_default=True, help="Filas por lote de COPY")
+    @click.option("--workers", default=4, show_default=True, help="Lotes cargados en paralelo")
+    def generate_data(sites, reviews, users, tags, images_per_site, favorites_per_user, seed, batch_size, workers):
+        """Carga datos sintéticos de volumen con COPY (requiere seed-db)."""
+        print("Generating synthetic data...")
+        started = datetime.now()
+        generated = synthetic.generate(
+            sites=sites,
+            reviews=reviews,
+            users=users,
+            tags=tags,
+            images_per_site=images_per_site,
+            favorites_per_user=favorites_per_user,
+            seed=seed,
+            batch_size=batch_size,
+            workers=workers,
+        )
+        elapsed = (datetime.now() - started).total_seconds()
+        print(f"Synthetic data complete in {elapsed:.1f}s: {generated.counts()}")
+        if generated.users:
+            print(f"Users log in as {synthetic.user_email(generated.users.start)} / {synthetic.DEFAULT_PASSWORD}")
+
+    @app.cli.command("refresh-rating-summaries")
+    def refresh_rating_summaries():
+        print("Refreshing rating summaries...")
+        reviews_repository.refresh_rating_summaries()
+        database.db.session.commit()
+        print("Rating summaries refresh complete.")
+
+    @app.cli.command("refresh-site-cards")
+    def refresh_site_cards():
+        print("Refreshing site cards...")
+        historic_site_repository.refresh_site_cards()
+        database.db.session.commit()
+        print("Site cards refresh complete.")
+
+    @app.cli.command("refresh-tag-usage")
+    def refresh_tag_usage():
+        print("Refreshing tag usage counts...")
+        tags_repository.refresh_usage_counts()
+        database.db.session.commit()
+        print("Tag usage counts refresh complete.")
+
+    @app.cli.command("archive")
+    @click.option("--days", type=int, default=None, help="Días desde el borrado (por defecto ARCHIVE_AFTER_DAYS)")
+    @click.option("--batch-size", type=int, default=None, help="Filas por transacción (por defecto ARCHIVE_BATCH_SIZE)")
+    def archive_deleted(days, batch_size):
+        """Mueve a las tablas *_archive las filas eliminadas hace más de N días."""
+        days = app.config["ARCHIVE_AFTER_DAYS"] if days is None else days
+        print(f"Archiving rows deleted more than {days} days ago...")
+        counts = archive.archive_deleted(
+            timedelta(days=days), batch_size or app.config["ARCHIVE_BATCH_SIZE"]
+        )
+        for table, count in sorted(counts.items()):
+            print(f"  {table}: {count}")
+        print("Archive complete.")
+
+    @app.cli.command("archive-restore")
+    @click.argument("kind", type=click.Choice(sorted(archive.KINDS)))
+    @click.argument("row_id", type=int)
+    def archive_restore(kind, row_id):
+        """Devuelve a las tablas vivas una fila archivada con sus dependientes."""
+        try:
+            counts = archive.restore(kind, row_id)
+        except ValueError as e:
+            raise click.ClickException(str(e)) from e
+        for table, count in sorted(counts.items()):
+            print(f"  {table}: {count}")
+        print(f"Restored {kind} {row_id}.")
+
     @app.after_request
     def refresh_expiring_jwts(response):
-        """Actualiza el token JWT si está a 30 minutos de expirar."""
+        """Actualiza el token JWT si está a 30 minutos de expirar, conservando sus claims de perfil."""
         try:
-            exp_timestamp = get_jwt()["exp"]
+            jwt = get_jwt()
+            exp_timestamp = jwt["exp"]
             now = datetime.now(timezone.utc)
             target_timestamp = datetime.timestamp(now + timedelta(minutes=30))
             if target_timestamp > exp_timestamp:
-                access_token = create_access_token(identity=get_jwt_identity())
+                access_token = renew_access_token(get_jwt_identity(), jwt)
                 set_access_cookies(response, access_token)
             return response
         except (RuntimeError, KeyError):
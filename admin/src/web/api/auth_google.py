@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify, redirect, current_app, session
-from flask_jwt_extended import create_access_token, set_access_cookies,unset_jwt_cookies
+from flask_jwt_extended import set_access_cookies,unset_jwt_cookies
 from google.oauth2 import id_token
 from google.auth.transport import requests as google_requests
 import requests as req
@@ -7,6 +7,7 @@ import secrets
 from urllib.parse import quote, unquote
 
 from core.auth import repository as user_repo
+from web.api.tokens import access_token_for
 
 auth_google_bp = Blueprint("auth_google_bp", __name__, url_prefix="/api/auth/google")
 
@@ -111,7 +112,7 @@ def google_callback():
         return jsonify({"error": "user_upsert_failed", "detail": str(e)}), 500
 
     try:
-        access_token = create_access_token(identity=str(user.id))
+        access_token = access_token_for(user)
 
         next_path = session.pop("oauth_next", "/") or "/"
         frontend = current_app.config.get("FRONTEND_ORIGIN", "http://127.0.0.1:5173")
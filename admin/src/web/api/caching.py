@@ -0,0 +1,87 @@
+from collections.abc import Callable
+from functools import wraps
+
+from flask import current_app, g, make_response, request
+from werkzeug.datastructures import ResponseCacheControl
+
+
+def add_surrogate_keys(*keys: str) -> None:
+    """Agrega claves al header ``Surrogate-Key`` de la respuesta actual (ver ``cache_policy``)"""
+    g.setdefault("surrogate_keys", []).extend(keys)
+
+
+def has_credentials() -> bool:
+    """Indica si la request viene autenticada y su respuesta puede ser personal"""
+    return bool(
+        request.cookies.get(current_app.config.get("JWT_ACCESS_COOKIE_NAME", "access_token_cookie"))
+        or "Authorization" in request.headers
+    )
+
+
+def cache_policy(
+    max_age: int = 0,
+    s_maxage: int | None = None,
+    stale_while_revalidate: int = 0,
+    private: bool = False,
+    keys: tuple[str, ...] = (),
+) -> Callable:
+    """
+    Define los headers de cache de un endpoint GET de la API
+
+    Las respuestas publicas llevan ``Cache-Control: public`` con ``max-age`` para el
+    navegador y ``s-maxage`` para la CDN (que se purga ante cada escritura, ver
+    ``web.edge_cache``), mas ``Surrogate-Key`` con ``keys`` (formateadas con los
+    parametros de la ruta) y las que agregue la vista con ``add_surrogate_keys``.
+    Si la request trae credenciales la respuesta puede incluir datos del usuario
+    (``favorited``), asi que se marca ``private`` igual que con ``private=True``.
+
+    Args:
+        max_age (int, optional): segundos de frescura en el navegador
+        s_maxage (int | None, optional): segundos de frescura en caches compartidas
+        stale_while_revalidate (int, optional): segundos en los que se puede servir
+            una copia vencida mientras se revalida
+        private (bool, optional): la respuesta es siempre del usuario
+        keys (tuple[str, ...], optional): claves de purga, ej. ``"site-{site_id}"``
+    """
+
+    def decorator(view: Callable) -> Callable:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            response = make_response(view(*args, **kwargs))
+            if request.method != "GET" or response.status_code != 200:
+                return response
+
+            is_private = private or has_credentials()
+            set_cache_control(response.cache_control, max_age, s_maxage, stale_while_revalidate, is_private)
+            if is_private:
+                return response
+
+            surrogate_keys = [key.format(**kwargs) for key in keys]
+            surrogate_keys.extend(g.pop("surrogate_keys", []))
+            if surrogate_keys:
+                response.headers["Surrogate-Key"] = " ".join(dict.fromkeys(surrogate_keys))
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def set_cache_control(
+    cache_control: ResponseCacheControl,
+    max_age: int = 0,
+    s_maxage: int | None = None,
+    stale_while_revalidate: int = 0,
+    private: bool = False,
+) -> None:
+    """Completa el ``Cache-Control`` de una respuesta segun los argumentos de ``cache_policy``"""
+    if private:
+        cache_control.private = True
+        cache_control.no_cache = True
+        return
+    cache_control.public = True
+    cache_control.max_age = max_age
+    if s_maxage is not None:
+        cache_control.s_maxage = s_maxage
+    if stale_while_revalidate:
+        cache_control.stale_while_revalidate = stale_while_revalidate
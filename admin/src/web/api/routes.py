@@ -1,22 +1,24 @@
+import hashlib
 from dataclasses import dataclass
 from typing import Optional
 
 from flask import request, jsonify, Response, Blueprint, current_app
-from flask_jwt_extended import create_access_token, set_access_cookies, jwt_required, get_jwt_identity, unset_jwt_cookies, verify_jwt_in_request
+from flask_jwt_extended import set_access_cookies, jwt_required, get_jwt, get_jwt_identity, unset_jwt_cookies, verify_jwt_in_request
 from marshmallow import ValidationError
-from sqlalchemy import func
 
+from core import database, suggest
 from core.auth import repository as user_repo
-from core.auth.models import User, user_favorite_sites
+from core.auth.models import User
 from core.database import db
 from core.feature_flags import repository as flags_repo
 from core.feature_flags.models import Flag
-from core.historic_site import repository as hs_repo, prepare_site_data, HistoricSiteSchema, HistoricSiteQuerySchema
-from core.historic_site.models import HistoricSite
+from core.historic_site import repository as hs_repo, prepare_site_data, HistoricSiteSchema, HistoricSiteQuerySchema, SiteIdsQuerySchema
+from core.historic_site.models import HistoricSite, SiteCard
 from core.reviews import ReviewSchema, repository as reviews_repo
 from core.reviews.models import Review, ReviewState
 from core.tags import repository as tag_repo
-from core.tags.models import Tag
+from web.api.caching import add_surrogate_keys, cache_policy
+from web.api.tokens import access_token_for, current_user_id, profile_from_claims
 
 bp = Blueprint("api_bp", __name__, url_prefix="/api")
 
@@ -33,7 +35,40 @@ class ApiErrorResponse:
     error: ApiError
 
 
+@bp.before_request
+def route_reads_to_replica() -> None:
+    """
+    Los GET de la API leen de una replica si hay alguna configurada y sana
+    """
+    if request.method == "GET":
+        database.use_replica()
+
+
+def _with_favorited(site_dicts: list[dict], user_id: int | None) -> list[dict]:
+    """
+    Agrega el flag favorited a los sitios serializados si hay un usuario autenticado
+    """
+    if user_id is None:
+        return site_dicts
+    favorite_ids = user_repo.get_favorite_ids_among(user_id, [site["id"] for site in site_dicts])
+    for site in site_dicts:
+        site["favorited"] = site["id"] in favorite_ids
+    return site_dicts
+
+
+def _site_exists(site_id: int) -> bool:
+    """
+    Indica si existe un sitio historico no eliminado con ese id
+    """
+    return db.session.query(
+        db.session.query(HistoricSite.id)
+        .filter(HistoricSite.id == site_id)
+        .exists()
+    ).scalar()
+
+
 @bp.get("/sites")
+@cache_policy(max_age=60, s_maxage=300, stale_while_revalidate=600, keys=("sites",))
 def list_sites() -> tuple[Response, int]:
     """
     Devuelve la lista de sitios historicos paginada
@@ -51,70 +86,32 @@ def list_sites() -> tuple[Response, int]:
                 }
             }), 400
 
-        # Query base
-        query = db.session.query(HistoricSite).filter(HistoricSite.deleted == False)
-        
+        # Query base: la proyeccion site_card solo tiene sitios no eliminados
+        query = db.session.query(SiteCard)
+
+        favorites_of = None
         if only_favorites:
             try:
                 verify_jwt_in_request()
-                current_user_id = get_jwt_identity()
-                
-                query = query.join(user_favorite_sites).filter(
-                    user_favorite_sites.c.id_user == current_user_id
-                )
+                favorites_of = int(get_jwt_identity())
             except Exception:
                 return jsonify(ApiErrorResponse(
                     ApiError("unauthorized", "You must be logged in to filter by favorites")
                 )), 401
 
-        # Filtros de texto
-        if params.get("name"):
-            query = query.filter(HistoricSite.name.ilike(f"%{params["name"]}%"))
-        if params.get("description"):
-            query = query.filter(HistoricSite.description.ilike(f"%{params["description"]}%"))
-        if params.get("city"):
-            query = query.filter(HistoricSite.city.ilike(f"%{params["city"]}%"))
-        if params.get("province"):
-            query = query.filter(HistoricSite.province.ilike(f"%{params["province"]}%"))
-        if params.get("state_of_conservation"):
-            query = query.filter(HistoricSite.state_of_conservation == params["state_of_conservation"])
-
-        # Filtro por tags
-        if params.get("tags"):
-            tag_list = [t.strip() for t in params["tags"].split(",") if t.strip()]
-            if tag_list:
-                query = query.join(HistoricSite.tags).filter(Tag.name.in_(tag_list))
-
-        # Filtro lat, long, radius
-        lat, long, radius = params.get("lat"), params.get("long"), params.get("radius")
-        if lat is not None and long is not None and radius is not None:
-            # radius en km, PostGIS ST_DWithin usa metros
-            radius_m = radius * 1000
-            point = func.ST_SetSRID(func.ST_MakePoint(long, lat), 4326)
-            query = query.filter(func.ST_DWithin(HistoricSite.location, point, radius_m))
-
-        # Ordenamiento
-        order_by = params["order_by"]
-        if order_by == "latest":
-            query = query.order_by(HistoricSite.inserted_at.desc())
-        elif order_by == "oldest":
-            query = query.order_by(HistoricSite.inserted_at.asc())
-        elif order_by == "rating-5-1":
-            query = query.order_by(HistoricSite.rating.desc().nullslast())
-        elif order_by == "rating-1-5":
-            query = query.order_by(HistoricSite.rating.asc().nullslast())
-        elif order_by == "most-visited":
-            query = query.order_by(HistoricSite.visit_count.desc())
-        elif order_by == "least-visited":
-            query = query.order_by(HistoricSite.visit_count.asc())
-        else:
-            # default
-            query = query.order_by(HistoricSite.inserted_at.desc())
+        query = hs_repo.filter_api_sites(query, params, favorites_of)
+        query = hs_repo.order_api_sites(query, params["order_by"])
 
         # Retorno paginado
         page = params["page"]
         per_page = params["per_page"]
-        return HistoricSite.to_collection_dict(query, page, per_page, 'api_bp.list_sites')
+        user_id = current_user_id()
+
+        def serialize(cards: list[SiteCard]) -> list[dict]:
+            add_surrogate_keys(*(f"site-{card.id}" for card in cards))
+            return _with_favorited([card.to_dict() for card in cards], user_id)
+
+        return SiteCard.to_collection_dict(query, page, per_page, 'api_bp.list_sites', serialize=serialize)
     except ValueError:
         return jsonify(ApiErrorResponse(ApiError("server_error", "An unexpected server error occurred"))), 500
 
@@ -138,29 +135,135 @@ def create_site() -> tuple[Response, int]:
 
         site_data = prepare_site_data(json, tag_repo)
         site = hs_repo.create_historic_site(current_user, **site_data)
-        site_dict = site.to_dict()
+        site_dict = site.to_dict(detail=True)
         return jsonify(site_dict), 201
     except ValueError:
         return jsonify(ApiErrorResponse(ApiError("server_error", "An unexpected server error occurred"))), 500
 
 
+def site_detail_body(document: bytes, extra: dict) -> bytes:
+    """
+    Cuerpo del detalle de un sitio: el documento cacheado mas los campos de esta request
+    """
+    return document[:-1] + b"," + current_app.json.dumps(extra)[1:].encode()
+
+
 @bp.get("/sites/<int:site_id>")
+# Cada vista suma una visita: no se cachea fuera del navegador
+@cache_policy(private=True)
 def get_site(site_id: int) -> tuple[Response, int]:
     """
     Obtiene un sitio por id
     """
     try:
-        site = db.session.query(HistoricSite).filter(HistoricSite.id == site_id, HistoricSite.deleted == False).first()
-
-        if not site or site.deleted:
+        card = hs_repo.increment_visit_count(site_id)
+        document = hs_repo.get_site_document(site_id, card.document_version) if card else None
+        if document is None:
             return jsonify(ApiErrorResponse(ApiError("not_found", "Site not found"))), 404
 
-        hs_repo.increment_visit_count(site_id)
-        return site.to_dict()
+        # El documento cacheado se envia tal cual, agregando solo lo que cambia por request
+        extra = {"visit_count": card.visit_count}
+        user_id = current_user_id()
+        if user_id is not None:
+            extra["favorited"] = site_id in user_repo.get_favorite_ids_among(user_id, [site_id])
+        return current_app.response_class(site_detail_body(document, extra), mimetype="application/json")
     except ValueError:
         return jsonify(ApiErrorResponse(ApiError("server_error", "An unexpected server error occurred"))), 500
     
+@bp.get("/sites/batch")
+# La vista agrega site-N por cada id pedido (tambien los que todavia no existen); los
+# documentos muestran nombres de tags, que se purgan con "tags"
+@cache_policy(max_age=60, s_maxage=300, stale_while_revalidate=600, keys=("tags",))
+def get_sites_batch() -> tuple[Response, int]:
+    """
+    Obtiene varios sitios por id (``ids=1,2,3``) con el mismo detalle que /sites/<id>, en el
+    orden pedido y sin sumar visitas. Los ids que no existen llevan un error en su lugar
+    """
+    try:
+        try:
+            ids = SiteIdsQuerySchema(current_app.config["API_BATCH_MAX_IDS"]).load(request.args.to_dict())["ids"]
+        except ValidationError as err:
+            return jsonify({
+                "error": {
+                    "code": "invalid_query",
+                    "message": "Parameter validation failed",
+                    "details": err.messages
+                }
+            }), 400
+
+        cards = hs_repo.get_site_document_versions(list(set(ids)))
+        documents = hs_repo.get_site_documents({site_id: card.document_version for site_id, card in cards.items()})
+        user_id = current_user_id()
+        favorite_ids = user_repo.get_favorite_ids_among(user_id, list(documents)) if user_id is not None else None
+        add_surrogate_keys(*(f"site-{site_id}" for site_id in ids))
+
+        items = []
+        for site_id in ids:
+            if site_id not in documents:
+                not_found = {"id": site_id, "error": ApiError("not_found", "Site not found")}
+                items.append(current_app.json.dumps(not_found).encode())
+                continue
+            extra = {"visit_count": cards[site_id].visit_count}
+            if favorite_ids is not None:
+                extra["favorited"] = site_id in favorite_ids
+            items.append(site_detail_body(documents[site_id], extra))
+        # Los documentos ya estan serializados: se arma la lista sin volver a decodificarlos
+        body = b'{"data":[' + b",".join(items) + b"]}"
+        return current_app.response_class(body, mimetype="application/json")
+    except ValueError:
+        return jsonify(ApiErrorResponse(ApiError("server_error", "An unexpected server error occurred"))), 500
+
+
+@bp.get("/sites/facets")
+@cache_policy(max_age=60, s_maxage=300, stale_while_revalidate=600, keys=("sites", "tags"))
+def get_site_facets() -> tuple[Response, int]:
+    """
+    Devuelve la cantidad de sitios por provincia, ciudad, tag, estado de conservacion
+    y rango de año de inauguracion para los filtros recibidos
+    """
+    try:
+        try:
+            params = HistoricSiteQuerySchema().load(request.args.to_dict())
+        except ValidationError as err:
+            return jsonify(ApiErrorResponse(
+                ApiError("invalid_query", "Parameter validation failed", err.messages)
+            )), 400
+
+        favorites_of = None
+        if params["only_favorites"]:
+            favorites_of = current_user_id()
+            if favorites_of is None:
+                return jsonify(ApiErrorResponse(
+                    ApiError("unauthorized", "You must be logged in to filter by favorites")
+                )), 401
+
+        return jsonify(hs_repo.get_site_facets(params, favorites_of)), 200
+    except ValueError:
+        return jsonify(ApiErrorResponse(ApiError("server_error", "An unexpected server error occurred"))), 500
+
+
+@bp.get("/suggest")
+@cache_policy(max_age=60, s_maxage=300, stale_while_revalidate=600, keys=("sites", "tags"))
+def get_suggestions() -> tuple[Response, int]:
+    """
+    Sugerencias de autocompletado sobre nombres de sitios, tags, ciudades y provincias
+    """
+    try:
+        query = request.args.get("q", "")
+        limit = request.args.get("limit", 10, type=int)
+        if not 1 <= limit <= 25:
+            return jsonify(ApiErrorResponse(
+                ApiError("invalid_query", "Parameter validation failed", {"limit": ["Must be between 1 and 25."]})
+            )), 400
+
+        suggestions = suggest.suggest(query, limit)
+        return jsonify({"data": [suggestion.to_dict() for suggestion in suggestions]}), 200
+    except ValueError:
+        return jsonify(ApiErrorResponse(ApiError("server_error", "An unexpected server error occurred"))), 500
+
+
 @bp.get("/sites/provinces")
+@cache_policy(max_age=300, s_maxage=3600, stale_while_revalidate=86400, keys=("sites",))
 def get_provinces() -> tuple[Response, int]:
     """
     Obtiene todas las provincias registradas 
@@ -185,12 +288,13 @@ def authenticate() -> tuple[Response, int]:
     if not user or not user.check_password(password):
         return jsonify(ApiErrorResponse(ApiError("invalid_credentials", "Invalid credentials"))), 401
 
-    access_token = create_access_token(identity=str(user.id))
+    access_token = access_token_for(user)
     response = jsonify()
     set_access_cookies(response, access_token)
     return response, 201
 
 @bp.get("/sites/<int:site_id>/reviews")
+@cache_policy(max_age=60, s_maxage=300, stale_while_revalidate=600, keys=("site-{site_id}",))
 def get_all_site_reviews(site_id: int) -> tuple[Response, int]:
     """
     Obtiene todas las reviews de un sitio paginadas
@@ -198,22 +302,36 @@ def get_all_site_reviews(site_id: int) -> tuple[Response, int]:
     try:
         page: int = request.args.get("page", 1, type=int)
         per_page: int = request.args.get("per_page", 10, type=int)
-        site: HistoricSite = db.session.query(HistoricSite).filter(HistoricSite.id == site_id, HistoricSite.deleted == False).first()
+        site: HistoricSite = db.session.query(HistoricSite).filter(HistoricSite.id == site_id).first()
 
-        if not site or site.deleted:
+        if not site:
             return jsonify(ApiErrorResponse(ApiError("not_found", "Site not found"))), 404
 
         query = db.session.query(Review).join(HistoricSite).filter(
             Review.historic_site_id == site.id,
             Review.state == ReviewState.APPROVED,
-            Review.deleted == False,
-        )
+        ).order_by(*reviews_repo.approved_reviews_order())
 
         return Review.to_collection_dict(query, page, per_page, 'api_bp.get_all_site_reviews', site_id=site_id)
     except ValueError:
         return jsonify(ApiErrorResponse(ApiError("server_error", "An unexpected server error occurred"))), 500
 
 
+@bp.get("/sites/<int:site_id>/reviews/summary")
+@cache_policy(max_age=60, s_maxage=300, stale_while_revalidate=600, keys=("site-{site_id}",))
+def get_site_reviews_summary(site_id: int) -> tuple[Response, int]:
+    """
+    Obtiene el histograma de calificaciones aprobadas de un sitio
+    """
+    try:
+        if not _site_exists(site_id):
+            return jsonify(ApiErrorResponse(ApiError("not_found", "Site not found"))), 404
+
+        return jsonify(reviews_repo.get_rating_summary(site_id)), 200
+    except ValueError:
+        return jsonify(ApiErrorResponse(ApiError("server_error", "An unexpected server error occurred"))), 500
+
+
 @bp.post("/sites/<int:site_id>/reviews")
 @jwt_required()
 def add_site_reviews(site_id: int) -> tuple[Response, int]:
@@ -227,7 +345,7 @@ def add_site_reviews(site_id: int) -> tuple[Response, int]:
         current_user = get_jwt_identity()
         review_data = request.get_json() or {}
         existing_review = db.session.query(Review).filter_by(
-            user_id=current_user, historic_site_id=site_id, deleted=False
+            user_id=current_user, historic_site_id=site_id
         ).first()
 
         if existing_review:
@@ -241,9 +359,9 @@ def add_site_reviews(site_id: int) -> tuple[Response, int]:
                 ApiError("invalid_data", "The comment must be between 20 and 1000 characters")
             )), 400
         
-        site = db.session.query(HistoricSite).filter(HistoricSite.id == site_id, HistoricSite.deleted == False).first()
+        site = db.session.query(HistoricSite).filter(HistoricSite.id == site_id).first()
 
-        if not site or site.deleted:
+        if not site:
             return jsonify(ApiErrorResponse(ApiError("not_found", "Site not found"))), 404
 
         try:
@@ -265,13 +383,14 @@ def add_site_reviews(site_id: int) -> tuple[Response, int]:
 
 
 @bp.get("/sites/<int:site_id>/reviews/<int:review_id>")
+@cache_policy(private=True)
 @jwt_required()
 def get_site_review(site_id: int, review_id: int) -> tuple[Response, int]:
     """
     Obtiene una review de un sitio historico por id
     """
     try:
-        site = db.session.query(HistoricSite).filter(HistoricSite.id == site_id, HistoricSite.deleted == False).first()
+        site = db.session.query(HistoricSite).filter(HistoricSite.id == site_id).first()
 
         if not site:
             return jsonify(ApiErrorResponse(ApiError("not_found", "Site not found"))), 404
@@ -279,7 +398,6 @@ def get_site_review(site_id: int, review_id: int) -> tuple[Response, int]:
         review = db.session.query(Review).filter(
             Review.id == review_id,
             Review.historic_site_id == site_id,
-            Review.deleted == False,
         ).first()
 
         if not review:
@@ -303,15 +421,14 @@ def delete_site_review(site_id: int, review_id: int) -> tuple[Response, int]:
         if not flags_repo.is_flag_enabled(Flag.REVIEWS_ENABLED):
             return jsonify(ApiErrorResponse(ApiError("service_unavailable", "The reviews are temporary disabled"))), 503
 
-        site = db.session.query(HistoricSite).filter(HistoricSite.id == site_id, HistoricSite.deleted == False).first()
+        site = db.session.query(HistoricSite).filter(HistoricSite.id == site_id).first()
 
-        if not site or site.deleted:
+        if not site:
             return jsonify(ApiErrorResponse(ApiError("not_found", "Site not found"))), 404
 
         review = db.session.query(Review).filter(
             Review.id == review_id,
             Review.historic_site_id == site_id,
-            Review.deleted == False,
         ).first()
 
         if not review:
@@ -321,8 +438,7 @@ def delete_site_review(site_id: int, review_id: int) -> tuple[Response, int]:
             return jsonify(
                 ApiErrorResponse(ApiError("forbidden", "You do not have permission to view this review"))), 403
 
-        review.deleted = True
-        db.session.commit()
+        reviews_repo.delete_review_db(review)
         return jsonify(""), 204
     except ValueError:
         return jsonify(ApiErrorResponse(ApiError("server_error", "An unexpected server error occurred"))), 500
@@ -335,17 +451,10 @@ def favorite_site(site_id: int) -> tuple[Response, int]:
     Agrega el sitio historico como favorito
     """
     try:
-        user = user_repo.get_user(get_jwt_identity())
-        site = db.session.query(HistoricSite).filter(HistoricSite.id == site_id, HistoricSite.deleted == False).first()
-
-        if not site or site.deleted:
+        if not _site_exists(site_id):
             return jsonify(ApiErrorResponse(ApiError("not_found", "Site not found"))), 404
 
-        if site in user.favorites:
-            return jsonify(""), 204
-
-        user.favorites.append(site)
-        db.session.commit()
+        user_repo.add_favorite(int(get_jwt_identity()), site_id)
         return jsonify(""), 204
     except ValueError:
         return jsonify(ApiErrorResponse(ApiError("server_error", "An unexpected error occurred"))), 418
@@ -358,63 +467,89 @@ def delete_favorite_site(site_id: int) -> tuple[Response, int]:
     Saca el sitio historico de los favoritos del usuario
     """
     try:
-        user = user_repo.get_user(get_jwt_identity())
-        site = db.session.query(HistoricSite).filter(HistoricSite.id == site_id, HistoricSite.deleted == False).first()
-
-        if not site or site.deleted:
+        if not _site_exists(site_id):
             return jsonify(ApiErrorResponse(ApiError("not_found", "Site not found"))), 404
 
-        if site not in user.favorites:
-            return jsonify(""), 204
-
-        user.favorites.remove(site)
-        db.session.commit()
+        user_repo.remove_favorite(int(get_jwt_identity()), site_id)
         return jsonify(""), 204
     except ValueError:
         return jsonify(ApiErrorResponse(ApiError("server_error", "An unexpected error occurred"))), 500
 
 
+@bp.get("/me/favorites/ids")
+@cache_policy(private=True)
+@jwt_required()
+def list_favorite_ids() -> tuple[Response, int]:
+    """
+    Obtiene solo los ids de los sitios favoritos del usuario.
+    Responde con ETag para que el cliente pueda revalidar con If-None-Match
+    """
+    try:
+        user_id = int(get_jwt_identity())
+        ids = user_repo.get_favorite_site_ids(user_id)
+        response = jsonify({"ids": ids})
+        response.set_etag(hashlib.sha1(f"{user_id}:{ids}".encode()).hexdigest())
+        response.headers["Cache-Control"] = "private, no-cache"
+        response.vary.add("Cookie")
+        return response.make_conditional(request)
+    except ValueError:
+        return jsonify(ApiErrorResponse(ApiError("server_error", "An unexpected error occurred"))), 500
+
+
 @bp.get("/me/favorites")
+@cache_policy(private=True)
 @jwt_required()
 def list_favorites() -> tuple[Response, int]:
     """
-    Obtiene todos los sitios historicos favoritos del usuario
+    Obtiene todos los sitios historicos favoritos del usuario, con las mismas tarjetas
+    que /api/sites
     """
     try:
-        user = user_repo.get_user(get_jwt_identity())
+        user_id = int(get_jwt_identity())
         page = request.args.get('page', 1, type=int)
         per_page = min(request.args.get('per_page', 10, type=int), 100)
-        query = db.session.query(HistoricSite).join(user_favorite_sites)\
-            .filter(user_favorite_sites.c.id_user == user.id, user_favorite_sites.c.deleted == False)
-        return HistoricSite.to_collection_dict(query, page, per_page, 'api_bp.list_favorites')
+        query = hs_repo.filter_api_sites(db.session.query(SiteCard), {}, favorites_of=user_id)
+        query = query.order_by(SiteCard.id)
+
+        def serialize(cards: list[SiteCard]) -> list[dict]:
+            # Todos son favoritos: no hace falta consultarlos como en el listado
+            return [{**card.to_dict(), "favorited": True} for card in cards]
+
+        return SiteCard.to_collection_dict(query, page, per_page, 'api_bp.list_favorites', serialize=serialize)
     except ValueError:
         return jsonify(ApiErrorResponse(ApiError("server_error", "An unexpected error occurred"))), 500
 
 
 @bp.get("/me/reviews")
+@cache_policy(private=True)
 @jwt_required()
 def list_reviews_of_user() -> tuple[Response, int]:
     """
-    Obtiene todas las reviews del usuario
+    Obtiene todas las reviews del usuario. Con ``site_id`` solo la del sitio indicado:
+    el detalle del sitio embebe unicamente las primeras reviews y la del usuario puede
+    no estar entre ellas
     """
     try:
-        user = user_repo.get_user(get_jwt_identity())
+        user_id = int(get_jwt_identity())
         page = request.args.get('page', 1, type=int)
         per_page = min(request.args.get('per_page', 10, type=int), 100)
         order_by = request.args.get('order_by', None, type=str)
+        site_id = request.args.get('site_id', None, type=int)
         query = db.session.query(Review).filter(
-            Review.user_id == user.id,
+            Review.user_id == user_id,
             Review.state == ReviewState.APPROVED,
-            Review.deleted == False
         )
-
+        if site_id is not None:
+            query = query.filter(Review.historic_site_id == site_id)
 
         if order_by == "desc":
             query = query.order_by(Review.inserted_at.desc())
         elif order_by == "asc":
             query = query.order_by(Review.inserted_at.asc())
 
-        return Review.to_collection_dict(query, page, per_page, 'api_bp.list_reviews_of_user')
+        return Review.to_collection_dict(
+            query, page, per_page, 'api_bp.list_reviews_of_user', site_id=site_id
+        )
     except ValueError:
         return jsonify(ApiErrorResponse(ApiError("server_error", "An unexpected error occurred"))), 500
 
@@ -424,44 +559,47 @@ def make_coffee() -> tuple[Response, int]:
     return jsonify(ApiErrorResponse(ApiError("im_a_teapot", "I'm a teapot"))), 418
 
 @bp.get("/me")
+@cache_policy(private=True)
 @jwt_required()
 def get_profile() -> tuple[Response, int]:
     """
-    Obtiene la información del usuario
+    Obtiene la información del usuario desde los claims del token.
+    Solo consulta al usuario si su perfil cambio desde que se emitio el token,
+    y en ese caso reemite la cookie con los datos nuevos
     """
-    user_id = get_jwt_identity()
+    user_id = int(get_jwt_identity())
+    claims = get_jwt()
 
-    user = user_repo.get_user(user_id)
+    version = user_repo.get_profile_version(user_id)
+    if version is None:
+        return jsonify(ApiErrorResponse(ApiError("not_found", "User not found"))), 404
+    if claims.get("ver") == version:
+        return jsonify(profile_from_claims(user_id, claims)), 200
 
+    user = user_repo.get_user(user_id)
     if not user:
         return jsonify(ApiErrorResponse(ApiError("not_found", "User not found"))), 404
 
-    return jsonify({
-        "id": user.id,
-        "email": user.email,
-        "name": user.name,
-        "avatar": getattr(user, "avatar", None)
-    }), 200
+    response = jsonify(profile_from_claims(user.id, user_repo.profile_claims(user)))
+    set_access_cookies(response, access_token_for(user))
+    return response, 200
 
 @bp.put("/me")
 @jwt_required()
 def edit_profile() -> tuple[Response, int]:
     """
-    Modifica nombre, apellido y avatar de un usuario
+    Modifica nombre, apellido y avatar de un usuario y reemite el token con los datos nuevos
     """
     try:
-        current_user = get_jwt_identity()
         user_data = request.get_json() or {}
-        user = user_repo.get_user(current_user)
+        user = user_repo.update_user(int(get_jwt_identity()), **user_data)
 
-        if not user or user.deleted:
+        if not user:
             return jsonify(ApiErrorResponse(ApiError("not_found", "User not found"))), 404
 
-        user = user_repo.update_user(
-            current_user,
-            **user_data
-        )
-        return jsonify(user.to_dict()), 201
+        response = jsonify(user.to_dict())
+        set_access_cookies(response, access_token_for(user))
+        return response, 201
     except ValueError:
         return jsonify(ApiErrorResponse(ApiError("server_error", "An unexpected server error occurred"))), 500
 
@@ -475,6 +613,7 @@ def logout() -> tuple[Response, int]:
     return response, 200
 
 @bp.get("/flags")
+@cache_policy(max_age=30, s_maxage=60, stale_while_revalidate=60, keys=("flags",))
 def get_flags() -> tuple[Response, int]:
     """
     Retorna el valor de las flags para que puedan ser llamdas desde el front end
@@ -492,13 +631,17 @@ def get_flags() -> tuple[Response, int]:
     except ValueError:
         return jsonify(ApiErrorResponse(ApiError("server_error", "An unexpected server error occurred"))), 500
     
+# Cada tag trae su usage_count, que cambia con las altas, bajas y ediciones de sitios
 @bp.get("/tags")
+@cache_policy(max_age=300, s_maxage=3600, stale_while_revalidate=86400, keys=("tags", "sites"))
 def get_tags() -> tuple[Response, int]:
     """
-    Retorna la lista de tags disponibles
+    Retorna la lista de tags disponibles, alfabeticamente o por popularidad (order_by=popular)
     """
     try:
-        tags = tag_repo.list_all_tags()
+        order = "populares" if request.args.get("order_by") == "popular" else "alfabetico"
+        tags = tag_repo.list_all_tags(order)
+        add_surrogate_keys(*(f"tag-{tag.id}" for tag in tags))
         tags_list = [tag.to_dict() for tag in tags]
         return jsonify(tags_list), 200
     except ValueError:
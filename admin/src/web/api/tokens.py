@@ -0,0 +1,58 @@
+from flask import current_app
+from flask_jwt_extended import (
+    create_access_token,
+    get_jwt_identity,
+    verify_jwt_in_request,
+)
+
+from core.auth import repository as user_repo
+from core.auth.models import User
+
+
+def access_token_for(user: User) -> str:
+    """
+    Emite el JWT del usuario con sus datos de perfil como claims adicionales
+    """
+    return create_access_token(identity=str(user.id), additional_claims=user_repo.profile_claims(user))
+
+
+def renew_access_token(identity: str, jwt: dict) -> str:
+    """
+    Reemite un token copiando los claims de perfil del anterior, sin consultar la base
+    """
+    claims = {name: jwt[name] for name in user_repo.PROFILE_CLAIMS if name in jwt}
+    return create_access_token(identity=identity, additional_claims=claims)
+
+
+def is_token_revoked(jwt_header: dict, jwt_payload: dict) -> bool:
+    """
+    Rechaza los tokens de usuarios eliminados o inexistentes (``token_in_blocklist_loader``).
+    Un token con una version de perfil vieja sigue valiendo: /api/me lo reemite
+    """
+    identity = jwt_payload.get(current_app.config["JWT_IDENTITY_CLAIM"])
+    return identity is None or user_repo.get_profile_version(int(identity)) is None
+
+
+def current_user_id() -> int | None:
+    """
+    Devuelve el id del usuario autenticado, o None si la request es anonima o el token no
+    es valido (vencido, mal formado o de un usuario eliminado)
+    """
+    try:
+        verify_jwt_in_request(optional=True)
+    except Exception:
+        return None
+    identity = get_jwt_identity()
+    return int(identity) if identity else None
+
+
+def profile_from_claims(user_id: int, jwt: dict) -> dict:
+    """
+    Arma la respuesta de /api/me a partir de los claims del token
+    """
+    return {
+        "id": user_id,
+        "email": jwt.get("email"),
+        "name": jwt.get("name"),
+        "avatar": jwt.get("avatar"),
+    }
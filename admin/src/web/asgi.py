@@ -0,0 +1,300 @@
+"""
+API publica de solo lectura servida por ASGI
+
+Atiende ``GET /api/sites`` y ``GET /api/sites/<id>`` con las mismas respuestas que
+``web/api/routes.py`` (cuerpo, errores, ``Cache-Control`` y ``Surrogate-Key``), pero sobre
+asyncio: mientras la base responde o un cliente lento recibe su respuesta el proceso
+sigue atendiendo a los demas, y una conexion del pool se ocupa solo durante las consultas.
+Las consultas se arman con las mismas funciones del repositorio sincronico (filtros,
+orden, visitas, documento del detalle) y se ejecutan con un engine asyncpg.
+
+Es opcional: requiere ``asyncpg`` (y ``greenlet``, que usa SQLAlchemy asyncio) y un
+servidor ASGI. El resto de la API y el panel siguen en la aplicacion Flask, asi que el
+proxy manda a este proceso solo esas dos rutas::
+
+    uvicorn --factory web.asgi:create_asgi_app --port 5001
+"""
+
+import asyncio
+from dataclasses import dataclass
+from urllib.parse import parse_qsl
+
+from flask import Flask
+from marshmallow import ValidationError
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from werkzeug.datastructures import Headers, MultiDict, ResponseCacheControl
+from werkzeug.exceptions import MethodNotAllowed, NotFound
+from werkzeug.http import parse_cookie
+from werkzeug.routing import Map, Rule
+
+from core import PaginatedAPIMixin
+from core.auth import repository as user_repo
+from core.historic_site import HistoricSiteQuerySchema, repository as hs_repo
+from core.historic_site.models import SiteCard
+from web import allowed_origins, create_app
+from web.api.caching import set_cache_control
+from web.api.routes import ApiError, ApiErrorResponse, site_detail_body
+from web.api.tokens import current_user_id
+
+# Las sentencias UPDATE del repositorio no tocan objetos de la sesion
+_NO_SYNC = {"synchronize_session": False}
+
+
+@dataclass
+class _Request:
+    method: str
+    path: str
+    script_name: str | None
+    args: MultiDict
+    headers: Headers
+    cookies: MultiDict
+
+
+@dataclass
+class _Response:
+    status: int
+    body: bytes
+    headers: Headers
+
+
+class AsyncReadAPI:
+    """
+    Aplicacion ASGI con las rutas publicas de lectura de sitios
+
+    Usa la configuracion de ``flask_app`` (base, JWT, CORS, JSON) y su mapa de URLs para
+    los enlaces de paginacion. El engine se crea al arrancar el servidor (o con la primera
+    request) y se cierra al apagarlo.
+    """
+
+    def __init__(self, flask_app: Flask) -> None:
+        self.flask_app = flask_app
+        self.url_map = Map([
+            Rule("/api/sites", endpoint="list_sites", methods=["GET"]),
+            Rule("/api/sites/<int:site_id>", endpoint="get_site", methods=["GET"]),
+        ], merge_slashes=False)
+        self.origins = set() if flask_app.config["TESTING"] else set(allowed_origins(flask_app))
+        self.engine: AsyncEngine | None = None
+        self.session = None
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        if self.engine is None:
+            self.startup()
+
+        headers = Headers([(k.decode("latin-1"), v.decode("latin-1")) for k, v in scope["headers"]])
+        request = _Request(
+            method=scope["method"],
+            path=scope["path"],
+            script_name=scope.get("root_path") or None,
+            args=MultiDict(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)),
+            headers=headers,
+            cookies=parse_cookie(headers.get("Cookie", "")),
+        )
+        response = await self._dispatch(request)
+        self._add_cors_headers(request, response)
+
+        body = b"" if request.method == "HEAD" else response.body
+        response.headers["Content-Length"] = str(len(response.body))
+        await send({
+            "type": "http.response.start",
+            "status": response.status,
+            "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in response.headers.items()],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    def startup(self) -> None:
+        config = self.flask_app.config
+        if config.get("ASYNC_DATABASE_URL"):
+            url = make_url(config["ASYNC_DATABASE_URL"])
+        else:
+            url = make_url(config["SQLALCHEMY_DATABASE_URI"]).set(drivername="postgresql+asyncpg")
+        self.engine = create_async_engine(
+            url,
+            pool_size=config["ASYNC_POOL_SIZE"],
+            max_overflow=config["ASYNC_POOL_MAX_OVERFLOW"],
+            pool_timeout=config["ASYNC_POOL_TIMEOUT"],
+            pool_recycle=config["ASYNC_POOL_RECYCLE"],
+            pool_pre_ping=True,
+        )
+        self.session = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    async def shutdown(self) -> None:
+        if self.engine is not None:
+            await self.engine.dispose()
+            self.engine = self.session = None
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.startup()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _dispatch(self, request: _Request) -> _Response:
+        urls = self.url_map.bind("localhost", script_name=request.script_name)
+        try:
+            endpoint, values = urls.match(request.path, method=request.method)
+        except NotFound:
+            return self._error(404, "not_found", "Resource not found")
+        except MethodNotAllowed as error:
+            return self._error(405, "method_not_allowed", "Method not allowed", Allow=", ".join(error.valid_methods))
+
+        try:
+            if endpoint == "list_sites":
+                return await self.list_sites(request)
+            return await self.get_site(request, values["site_id"])
+        except Exception:
+            self.flask_app.logger.exception("async api error on %s", request.path)
+            return self._error(500, "server_error", "An unexpected server error occurred")
+
+    async def list_sites(self, request: _Request) -> _Response:
+        """
+        Devuelve la lista de sitios historicos paginada (ver ``routes.list_sites``)
+        """
+        try:
+            params = HistoricSiteQuerySchema().load(request.args.to_dict())
+            only_favorites = request.args.get("only_favorites", "false").lower() == "true"
+        except ValidationError as err:
+            return self._json({
+                "error": {
+                    "code": "invalid_query",
+                    "message": "Parameter validation failed",
+                    "details": err.messages
+                }
+            }, 400)
+
+        user_id = await self._current_user_id(request)
+        if only_favorites and user_id is None:
+            return self._error(401, "unauthorized", "You must be logged in to filter by favorites")
+
+        query = hs_repo.filter_api_sites(select(SiteCard), params, user_id if only_favorites else None)
+        query = hs_repo.order_api_sites(query, params["order_by"])
+        page, per_page = params["page"], params["per_page"]
+
+        async with self.session() as session:
+            # Misma forma de contar que db.paginate
+            total = await session.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+            cards = (await session.scalars(query.limit(per_page).offset((page - 1) * per_page))).all()
+            favorite_ids = None
+            if user_id is not None:
+                site_ids = [card.id for card in cards]
+                favorite_ids = set(await session.scalars(user_repo.favorite_ids_query(user_id, site_ids))) if site_ids else set()
+
+        items = [card.to_dict() for card in cards]
+        if favorite_ids is not None:
+            for item in items:
+                item["favorited"] = item["id"] in favorite_ids
+
+        urls = self.flask_app.url_map.bind("localhost", script_name=request.script_name)
+        data = PaginatedAPIMixin.collection_dict(
+            items, page, per_page, total,
+            lambda number: urls.build("api_bp.list_sites", {"page": number, "per_page": per_page}),
+        )
+        response = self._json(data, 200)
+        self._cache(
+            request, response, max_age=60, s_maxage=300, stale_while_revalidate=600,
+            keys=("sites", *(f"site-{card.id}" for card in cards)),
+        )
+        return response
+
+    async def get_site(self, request: _Request, site_id: int) -> _Response:
+        """
+        Obtiene un sitio por id sumando la visita (ver ``routes.get_site``)
+        """
+        user_id = await self._current_user_id(request)
+        document = favorited = None
+        async with self.session() as session:
+            visits = await session.scalar(hs_repo.site_visit_update(site_id), execution_options=_NO_SYNC)
+            if visits is None:
+                await session.rollback()
+                return self._error(404, "not_found", "Site not found")
+            card = (await session.execute(hs_repo.card_visit_update(site_id, visits), execution_options=_NO_SYNC)).first()
+            await session.commit()
+            if card is None:
+                return self._error(404, "not_found", "Site not found")
+
+            document = hs_repo.cached_site_document(site_id, card.document_version)
+            if document is None:
+                stored = (await session.execute(hs_repo.stored_site_documents_query([site_id]))).first()
+                if stored is not None and stored.document is not None and stored.document_version == card.document_version:
+                    document = stored.document
+                    hs_repo.remember_site_document(site_id, card.document_version, document)
+            if user_id is not None:
+                favorited = site_id in set(await session.scalars(user_repo.favorite_ids_query(user_id, [site_id])))
+
+        if document is None:
+            # Solo despues de un cambio del sitio: se serializa con el repositorio sincronico
+            # (reviews embebidas, imagenes) en un hilo, una vez por version
+            document = await asyncio.to_thread(self._build_site_document, site_id, card.document_version)
+            if document is None:
+                return self._error(404, "not_found", "Site not found")
+
+        extra = {"visit_count": card.visit_count}
+        if favorited is not None:
+            extra["favorited"] = favorited
+        with self.flask_app.app_context():
+            body = site_detail_body(document, extra)
+        response = _Response(200, body, Headers({"Content-Type": "application/json"}))
+        # Cada vista suma una visita: no se cachea fuera del navegador
+        self._cache(request, response, private=True)
+        return response
+
+    def _build_site_document(self, site_id: int, version: int) -> bytes | None:
+        with self.flask_app.test_request_context(f"/api/sites/{site_id}"):
+            return hs_repo.get_site_document(site_id, version)
+
+    async def _current_user_id(self, request: _Request) -> int | None:
+        """
+        Devuelve el id del usuario del JWT, o None si la request es anonima o el token no
+        es valido. Verifica el token igual que la API Flask (``tokens.current_user_id``, que
+        rechaza los de usuarios eliminados), en un hilo porque puede consultar la base
+        """
+        if not request.cookies.get(self.flask_app.config["JWT_ACCESS_COOKIE_NAME"]) and "Authorization" not in request.headers:
+            return None
+        return await asyncio.to_thread(self._verify_identity, request)
+
+    def _verify_identity(self, request: _Request) -> int | None:
+        with self.flask_app.test_request_context(request.path, method=request.method, headers=request.headers):
+            return current_user_id()
+
+    def _cache(self, request: _Request, response: _Response, keys: tuple[str, ...] = (), private: bool = False, **policy) -> None:
+        # Mismos headers que el decorador cache_policy
+        config = self.flask_app.config
+        private = private or bool(
+            request.cookies.get(config.get("JWT_ACCESS_COOKIE_NAME", "access_token_cookie"))
+            or "Authorization" in request.headers
+        )
+        cache_control = ResponseCacheControl()
+        set_cache_control(cache_control, private=private, **policy)
+        response.headers["Cache-Control"] = cache_control.to_header()
+        if not private and keys:
+            response.headers["Surrogate-Key"] = " ".join(dict.fromkeys(keys))
+
+    def _add_cors_headers(self, request: _Request, response: _Response) -> None:
+        origin = request.headers.get("Origin")
+        if origin and origin in self.origins:
+            response.headers["Access-Control-Allow-Origin"] = origin
+            response.headers["Access-Control-Allow-Credentials"] = "true"
+            response.headers.add("Vary", "Origin")
+
+    def _json(self, data, status: int, **headers) -> _Response:
+        # Como jsonify, con salto de linea final
+        body = self.flask_app.json.dumps(data) + "\n"
+        return _Response(status, body.encode(), Headers({"Content-Type": "application/json", **headers}))
+
+    def _error(self, status: int, code: str, message: str, **headers) -> _Response:
+        return self._json(ApiErrorResponse(ApiError(code, message)), status, **headers)
+
+
+def create_asgi_app(env: str = "development") -> AsyncReadAPI:
+    return AsyncReadAPI(create_app(env))
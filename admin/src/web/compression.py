@@ -0,0 +1,135 @@
+import zlib
+from collections.abc import Callable, Iterable, Iterator
+
+from flask import current_app, request
+
+from core.cache import LRUCache
+
+try:
+    import brotli
+except ImportError:  # dependencia opcional: sin ella solo se ofrece gzip
+    brotli = None
+
+# Tipos que vale la pena comprimir; imagenes, zip, pdf, etc. ya vienen comprimidos
+COMPRESSIBLE_MIMETYPES = {
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "image/svg+xml",
+    "text/css",
+    "text/csv",
+    "text/html",
+    "text/javascript",
+    "text/plain",
+    "text/xml",
+}
+
+# Respuestas ya comprimidas por (path, ETag, codificacion); ver Compression
+_compressed_cache = LRUCache("compressed_responses", maxsize=256)
+
+
+def _compressor(encoding: str) -> tuple[Callable[[bytes], bytes], Callable[[], bytes]]:
+    """Funciones ``(comprimir_parte, terminar)`` de un compresor incremental"""
+    config = current_app.config
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=config["COMPRESS_BR_LEVEL"])
+        return compressor.process, compressor.finish
+    # wbits=31: formato gzip (cabecera y CRC) en lugar de zlib
+    compressor = zlib.compressobj(config["COMPRESS_LEVEL"], zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    compress, finish = _compressor(encoding)
+    return compress(data) + finish()
+
+
+def _compress_stream(chunks: Iterable[bytes], encoding: str, original) -> Iterator[bytes]:
+    """Comprime a medida que el generador original produce datos"""
+    # El compresor se crea ya, dentro de la request: el cuerpo se recorre fuera de ella
+    compress, finish = _compressor(encoding)
+    return _iter_compressed(chunks, compress, finish, original)
+
+
+def _iter_compressed(chunks, compress, finish, original) -> Iterator[bytes]:
+    try:
+        for chunk in chunks:
+            data = compress(chunk)
+            if data:
+                yield data
+        yield finish()
+    finally:
+        if hasattr(original, "close"):
+            original.close()
+
+
+class Compression:
+    """
+    Comprime las respuestas con gzip o brotli segun el ``Accept-Encoding`` del cliente
+
+    - Solo tipos de texto (``COMPRESSIBLE_MIMETYPES``); las imagenes y los archivos
+      servidos con ``send_file`` pasan sin tocar
+    - Las respuestas armadas en memoria se comprimen si superan ``COMPRESS_MIN_SIZE``;
+      las que se generan por partes (CSV) se comprimen parte por parte sin juntarlas
+    - Con ``COMPRESS_CACHE``, las respuestas cacheables que traen ETag guardan su version
+      comprimida para no volver a comprimirla mientras el ETag no cambie
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get("COMPRESS_ENABLED", True):
+            return app
+        app.after_request(_compress_response)
+        return app
+
+
+def _accepted_encoding() -> str | None:
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return request.accept_encodings.best_match(offered)
+
+
+def _compress_response(response):
+    if (
+        response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or response.direct_passthrough
+        or request.method == "HEAD"
+        or not 200 <= response.status_code < 300
+        or response.status_code in (204, 206)
+        or "Content-Encoding" in response.headers
+        or "no-transform" in response.cache_control
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = _accepted_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        original = response.response
+        response.response = _compress_stream(response.iter_encoded(), encoding, original)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < current_app.config["COMPRESS_MIN_SIZE"]:
+            return response
+        etag, _ = response.get_etag()
+        if etag and current_app.config["COMPRESS_CACHE"] and not response.cache_control.no_store:
+            key = (request.path, etag, encoding)
+            compressed = _compressed_cache.get_or_set(key, lambda: _compress(data, encoding))
+        else:
+            compressed = _compress(data, encoding)
+        response.set_data(compressed)
+
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # Mismo contenido con otra codificacion: el ETag fuerte deja de valer byte a byte
+        response.set_etag(etag, weak=True)
+    return response
+
+
+compression = Compression()
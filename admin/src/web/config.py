@@ -2,6 +2,17 @@ from datetime import timedelta
 from os import environ
 
 
+def replica_engines(urls: str | None) -> dict[str, str]:
+    """
+    Engines de replicas de solo lectura a partir de URLs separadas por coma.
+    La primera se llama "replica" y las siguientes "replica_2", "replica_3", ...
+    """
+    engines = {}
+    for number, url in enumerate(u.strip() for u in (urls or "").split(",") if u.strip()):
+        engines["replica" if number == 0 else f"replica_{number + 1}"] = url
+    return engines
+
+
 class Config:
     TESTING = False
     SECRET_KEY = environ.get("SECRET_KEY")
@@ -24,7 +35,77 @@ class Config:
     JWT_COOKIE_SECURE = False
     JWT_COOKIE_CSRF_PROTECT = False
 
-    
+    # Cantidad de reseñas aprobadas embebidas en el detalle de un sitio
+    API_EMBEDDED_REVIEWS = 5
+
+    # Maximo de ids por pedido en /api/sites/batch
+    API_BATCH_MAX_IDS = 50
+
+    # Cola de moderacion de reseñas
+    REVIEW_QUEUE_BATCH_SIZE = 25
+    REVIEW_CLAIM_TTL = timedelta(minutes=5)
+
+    # Facetas de busqueda: segundos de vida en cache y ancho del rango de años
+    FACETS_CACHE_TTL = 300
+    FACETS_YEAR_BUCKET = 50
+
+    # Segundos entre reconstrucciones completas del indice de sugerencias
+    SUGGEST_INDEX_TTL = 600
+
+    # Segundos que se cachea la version de perfil con la que se validan los claims del JWT
+    USER_VERSION_CACHE_TTL = 60
+
+    # Replicas de lectura: los GET de /api leen de una replica salvo que el cliente haya
+    # escrito en los ultimos REPLICA_STICKY_SECONDS o que la replica atrase mas de REPLICA_MAX_LAG_SECONDS
+    REPLICA_STICKY_SECONDS = 10
+    REPLICA_MAX_LAG_SECONDS = 5
+    REPLICA_LAG_CHECK_SECONDS = 5
+
+    # Instrumentacion SQL por request (web/instrumentation.py)
+    SQL_INSTRUMENTATION = True
+    SQL_SERVER_TIMING = environ.get("SQL_SERVER_TIMING", "false").lower() == "true"
+    SQL_SLOW_QUERY_MS = 200
+    SQL_N_PLUS_ONE_THRESHOLD = 5
+
+    # Metricas de Prometheus en /metrics (web/metrics.py), apagadas salvo en desarrollo y
+    # tests. Con METRICS_TOKEN se exige el header "Authorization: Bearer <token>", y fuera
+    # de desarrollo (METRICS_REQUIRE_TOKEN) no se pueden habilitar sin token
+    METRICS_ENABLED = environ.get("METRICS_ENABLED", "false").lower() == "true"
+    METRICS_TOKEN = environ.get("METRICS_TOKEN")
+    METRICS_REQUIRE_TOKEN = True
+
+    # Serializacion JSON (web/json_provider.py): usa orjson si esta instalado, salvo
+    # que se desactive; sin orjson queda la libreria estandar
+    JSON_FAST = environ.get("JSON_FAST", "true").lower() == "true"
+
+    # Compresion de respuestas (web/compression.py): gzip, o brotli si esta instalado
+    COMPRESS_ENABLED = environ.get("COMPRESS_ENABLED", "true").lower() == "true"
+    COMPRESS_MIN_SIZE = 500
+    COMPRESS_LEVEL = 6
+    COMPRESS_BR_LEVEL = 4
+    COMPRESS_CACHE = True
+
+    # Cache HTTP delante de la API (web/edge_cache.py). EDGE_CACHE activa la cache local
+    # que reemplaza a la CDN en desarrollo; EDGE_PURGE_URL recibe las purgas por Surrogate-Key
+    EDGE_CACHE = environ.get("EDGE_CACHE", "false").lower() == "true"
+    EDGE_CACHE_SIZE = 1024
+    EDGE_PURGE_URL = environ.get("EDGE_PURGE_URL")
+    EDGE_PURGE_TOKEN = environ.get("EDGE_PURGE_TOKEN")
+    EDGE_PURGE_TIMEOUT = 2
+
+    # API publica de lectura asincronica (web/asgi.py). Sin ASYNC_DATABASE_URL usa la base
+    # de SQLALCHEMY_DATABASE_URI con el driver asyncpg. El pool es de todo el proceso: las
+    # conexiones se toman solo mientras dura cada consulta, no mientras se envia la respuesta
+    ASYNC_DATABASE_URL = environ.get("ASYNC_DATABASE_URL")
+    ASYNC_POOL_SIZE = 20
+    ASYNC_POOL_MAX_OVERFLOW = 10
+    ASYNC_POOL_TIMEOUT = 10
+    ASYNC_POOL_RECYCLE = 300
+
+    # Archivo de filas eliminadas (core/archive.py, `flask archive`): dias que quedan en las
+    # tablas vivas despues del borrado logico y filas raiz movidas por transaccion
+    ARCHIVE_AFTER_DAYS = int(environ.get("ARCHIVE_AFTER_DAYS", 90))
+    ARCHIVE_BATCH_SIZE = 500
 
 
 class ProductionConfig(Config):
@@ -34,8 +115,12 @@ class ProductionConfig(Config):
     MINIO_SECURE = True
     MINIO_BUCKET = "grupo05"
     
-    SQLALCHEMY_ENGINES = {"default": environ.get("DATABASE_URL")}
+    SQLALCHEMY_ENGINES = {
+        "default": environ.get("DATABASE_URL"),
+        **replica_engines(environ.get("DATABASE_REPLICA_URLS")),
+    }
     SQLALCHEMY_DATABASE_URI = SQLALCHEMY_ENGINES["default"]
+    SQLALCHEMY_BINDS = {key: url for key, url in SQLALCHEMY_ENGINES.items() if key != "default"}
     SQLALCHEMY_ENGINE_OPTIONS = {
         "pool_size": 10,
         "pool_recycle": 60,
@@ -49,6 +134,9 @@ class ProductionConfig(Config):
     SESSION_COOKIE_DOMAIN = ".proyecto2025.linti.unlp.edu.ar"
 
 class DevelopmentConfig(Config):
+    SQL_SERVER_TIMING = True
+    METRICS_ENABLED = environ.get("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_REQUIRE_TOKEN = False
     
     MINIO_SERVER = environ.get("MINIO_SERVER") or "localhost:9000"
     MINIO_ACCESS_KEY = environ.get("MINIO_ACCESS_KEY") or "minioadmin"
@@ -69,13 +157,17 @@ class DevelopmentConfig(Config):
 
 
     SQLALCHEMY_ENGINES = {
-        "default": f"{DB_SCHEME}://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+        "default": f"{DB_SCHEME}://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}",
+        **replica_engines(environ.get("DATABASE_REPLICA_URLS")),
     }
     SQLALCHEMY_DATABASE_URI = SQLALCHEMY_ENGINES["default"]
+    SQLALCHEMY_BINDS = {key: url for key, url in SQLALCHEMY_ENGINES.items() if key != "default"}
 
 
 class TestingConfig(Config):
     TESTING = True
+    METRICS_ENABLED = True
+    METRICS_REQUIRE_TOKEN = False
     JWT_COOKIE_CSRF_PROTECT = False
     DB_USER = environ.get("POSTGRES_USER") or "admin"
     DB_PASSWORD = environ.get("POSTGRES_PASSWORD") or "admin"
@@ -85,9 +177,12 @@ class TestingConfig(Config):
     DB_SCHEME = "postgresql+psycopg2"
 
     SQLALCHEMY_ENGINES = {
-        "default": f"{DB_SCHEME}://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+        "default": f"{DB_SCHEME}://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}",
+        # Para probar el ruteo se puede apuntar a un segundo Postgres local
+        **replica_engines(environ.get("POSTGRES_TEST_REPLICA_URLS")),
     }
     SQLALCHEMY_DATABASE_URI = SQLALCHEMY_ENGINES["default"]
+    SQLALCHEMY_BINDS = {key: url for key, url in SQLALCHEMY_ENGINES.items() if key != "default"}
 
 
 config = {
@@ -8,6 +8,7 @@ from flask import (
     render_template,
     request,
     session,
+    stream_with_context,
     url_for,
     current_app,
     jsonify
@@ -60,8 +61,9 @@ def list(current_user=None):
         historic_site.to_dict() for historic_site in historic_sites_pagination.items
     ]
 
-    cities = [c[0] for c in repository.get_all_cities()]
-    provinces = [p[0] for p in repository.get_all_provinces()]
+    facets = repository.get_site_facets({})
+    cities = sorted(facet["value"] for facet in facets["cities"])
+    provinces = sorted(facet["value"] for facet in facets["provinces"])
     all_tags = tags_repository.list_all_tags()
 
     return render_template(
@@ -302,28 +304,28 @@ def export_csv(current_user=None):
         order = request.args.get("order", "alfabetico_nombre")
 
         # Aplicar los filtros
-        historic_sites = repository.list_historic_sites_paginated(
-            search=search,
-            city=city,
-            province=province,
-            tags=tags,
-            state=state,
-            visible=visible,
-            fecha_rango=fecha_rango,
-            order=order,
-            page=1,  # Página 1
-            per_page=10000,  # Número alto para obtener todos los resultados
-        )
+        filters = {
+            "search": search,
+            "city": city,
+            "province": province,
+            "tags": tags,
+            "state": state,
+            "visible": visible,
+            "fecha_rango": fecha_rango,
+            "order": order,
+        }
 
-        if not historic_sites:
+        if not repository.historic_sites_exist(**filters):
             flash(
                 "No hay sitios históricos para exportar con los filtros aplicados.",
                 "warning",
             )
             return redirect(url_for("historic_site_bp.list"))
 
-        # Generar CSV con los sitios filtrados
-        csv_content = repository.generate_csv_content(historic_sites.items)
+        # Generar CSV con los sitios filtrados; se leen de a lotes mientras se envia
+        csv_content = repository.generate_csv_content(
+            repository.iter_historic_sites_for_export(**filters)
+        )
 
         # Crear nombre de archivo
         timestamp = (datetime.now(UTC) - timedelta(hours=3)).strftime(
@@ -334,7 +336,7 @@ def export_csv(current_user=None):
 
         # Crear respuesta de descarga
         response = Response(
-            csv_content.getvalue(),
+            stream_with_context(csv_content),
             mimetype="text/csv; charset=utf-8",
             headers={"Content-Disposition": f"attachment; filename={filename}"},
         )
@@ -1,4 +1,6 @@
-from flask import Blueprint, redirect, render_template, request, url_for
+from datetime import datetime
+
+from flask import Blueprint, current_app, redirect, render_template, request, url_for
 
 from core.reviews import repository
 from core.historic_site import repository as historic_sites_repository
@@ -145,4 +147,168 @@ def delete_review(review_id: int, current_user=None):
             "reviews_bp.list_reviews",
         )
     )
-    
\ No newline at end of file
+
+
+def _bulk_selection() -> dict:
+    """Obtiene del formulario las reviews sobre las que aplicar una accion masiva
+
+    Si se marco "aplicar a todos los resultados" se devuelven los filtros del
+    listado (y si se confirmo aplicarla sin filtros); en otro caso, los ids seleccionados.
+
+    Returns:
+        dict: argumentos ``review_ids`` o ``filters`` y ``confirm_all`` de las acciones masivas
+    """
+    if request.form.get("apply_to") == "filter":
+        return {
+            "filters": {
+                "site_id": request.form.get("site_id", type=int),
+                "state": request.form.get("state", ""),
+                "rating": request.form.get("rating", type=int),
+                "date": request.form.get("fecha_rango", ""),
+                "user": request.form.get("search_user", ""),
+            },
+            "confirm_all": request.form.get("confirm_all") == "1",
+        }
+    return {"review_ids": request.form.getlist("review_ids", type=int)}
+
+
+def _redirect_to_filtered_list():
+    """Redirige al listado de reviews conservando los filtros aplicados"""
+    if request.form.get("return_to") == "queue":
+        return redirect(url_for("reviews_bp.moderation_queue"))
+    return redirect(
+        url_for(
+            "reviews_bp.list_reviews",
+            site_id=request.form.get("site_id", ""),
+            state=request.form.get("state", ""),
+            rating=request.form.get("rating", ""),
+            fecha_rango=request.form.get("fecha_rango", ""),
+            search_user=request.form.get("search_user", ""),
+            order=request.form.get("order", "recientes"),
+        )
+    )
+
+
+@reviews_bp.route("/bulk/approve", methods=["POST"])
+@permission_required("reviews_management")
+@admin_maintenance_check
+def bulk_approve_reviews(current_user=None):
+    """Aprueba en una sola transaccion las reviews seleccionadas o filtradas
+
+    Args:
+        current_user (_type_, optional): Usuario actual. Defaults to None.
+    """
+    try:
+        count, _ = repository.bulk_approve_reviews(**_bulk_selection())
+        success_message(f"{count} reseña(s) aprobada(s) correctamente")
+    except ValueError as e:
+        error_message(str(e))
+    return _redirect_to_filtered_list()
+
+
+@reviews_bp.route("/bulk/reject", methods=["POST"])
+@permission_required("reviews_management")
+@admin_maintenance_check
+def bulk_reject_reviews(current_user=None):
+    """Rechaza en una sola transaccion las reviews seleccionadas o filtradas
+
+    Args:
+        current_user (_type_, optional): Usuario actual. Defaults to None.
+    """
+    try:
+        reason = request.form.get("reason", "").strip()
+        count, _ = repository.bulk_reject_reviews(reason, **_bulk_selection())
+        success_message(f"{count} reseña(s) rechazada(s) correctamente")
+    except ValueError as e:
+        error_message(str(e))
+    return _redirect_to_filtered_list()
+
+
+@reviews_bp.route("/bulk/delete", methods=["POST"])
+@permission_required("reviews_management")
+@admin_maintenance_check
+def bulk_delete_reviews(current_user=None):
+    """Elimina en una sola transaccion las reviews seleccionadas o filtradas
+
+    Args:
+        current_user (_type_, optional): Usuario actual. Defaults to None.
+    """
+    try:
+        count, _ = repository.bulk_delete_reviews(**_bulk_selection())
+        success_message(f"{count} reseña(s) eliminada(s) correctamente")
+    except ValueError as e:
+        error_message(str(e))
+    return _redirect_to_filtered_list()
+
+
+@reviews_bp.route("/queue", methods=["GET"])
+@permission_required("reviews_management")
+@admin_maintenance_check
+def moderation_queue(current_user=None):
+    """Muestra el lote de reviews pendientes reclamado por el moderador actual
+
+    Si el moderador no tiene un lote vigente, reclama el siguiente de la cola.
+
+    Args:
+        current_user (User, optional): Usuario actual
+
+    Returns:
+        Response: Página HTML con el lote de reviews a moderar
+    """
+    reviews = repository.claimed_reviews(current_user.id)
+    if not reviews:
+        reviews = repository.claim_pending_reviews(
+            current_user.id,
+            batch_size=current_app.config["REVIEW_QUEUE_BATCH_SIZE"],
+            ttl=current_app.config["REVIEW_CLAIM_TTL"],
+        )
+    return render_template(
+        "reviews/queue.html",
+        reviews=reviews,
+        claim_minutes=int(current_app.config["REVIEW_CLAIM_TTL"].total_seconds() // 60),
+        user=current_user,
+    )
+
+
+@reviews_bp.route("/queue/next", methods=["POST"])
+@permission_required("reviews_management")
+@admin_maintenance_check
+def moderation_queue_next(current_user=None):
+    """Libera el lote actual y reclama el siguiente a partir de la ultima review vista
+
+    Args:
+        current_user (User, optional): Usuario actual
+    """
+    after = None
+    last_inserted_at = request.form.get("last_inserted_at")
+    last_id = request.form.get("last_id", type=int)
+    if last_inserted_at and last_id:
+        try:
+            after = (datetime.fromisoformat(last_inserted_at), last_id)
+        except ValueError:
+            # Cursor alterado o mal formado: se reclama desde el principio de la cola
+            after = None
+
+    repository.release_claims(current_user.id)
+    repository.claim_pending_reviews(
+        current_user.id,
+        batch_size=current_app.config["REVIEW_QUEUE_BATCH_SIZE"],
+        ttl=current_app.config["REVIEW_CLAIM_TTL"],
+        after=after,
+    )
+    return redirect(url_for("reviews_bp.moderation_queue"))
+
+
+@reviews_bp.route("/queue/release", methods=["POST"])
+@permission_required("reviews_management")
+@admin_maintenance_check
+def moderation_queue_release(current_user=None):
+    """Devuelve a la cola las reviews reclamadas por el moderador actual
+
+    Args:
+        current_user (User, optional): Usuario actual
+    """
+    repository.release_claims(current_user.id)
+    success_message("Las reseñas volvieron a la cola de moderación")
+    return redirect(url_for("reviews_bp.list_reviews"))
+
@@ -0,0 +1,245 @@
+import io
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import requests
+from flask import current_app, has_app_context
+from werkzeug.datastructures import ResponseCacheControl
+from werkzeug.http import parse_cache_control_header
+
+from core import signals
+
+_middlewares: "weakref.WeakSet[EdgeCacheMiddleware]" = weakref.WeakSet()
+
+
+@dataclass
+class _Entry:
+    status: str
+    headers: list[tuple[str, str]]
+    body: bytes
+    stored_at: float
+    ttl: float
+    stale_while_revalidate: float
+    keys: set[str] = field(default_factory=set)
+
+
+class EdgeCacheMiddleware:
+    """
+    Cache HTTP en memoria delante de la aplicacion, para probar localmente lo que haria
+    la CDN: guarda las respuestas GET ``public`` por ``s-maxage`` (o ``max-age``), sirve
+    copias vencidas durante ``stale-while-revalidate`` mientras las renueva en otro hilo
+    y descarta las que comparten alguna ``Surrogate-Key`` purgada.
+
+    Solo atiende las rutas bajo ``prefixes`` (el resto, como el panel de administracion,
+    pasa directo y sin juntar su cuerpo). No cachea requests con credenciales ni
+    respuestas con ``Set-Cookie``. Cada proceso tiene su propia copia y solo recibe las
+    purgas de sus propias escrituras.
+    """
+
+    def __init__(
+        self,
+        app,
+        maxsize: int = 1024,
+        credential_cookies: tuple[str, ...] = (),
+        prefixes: tuple[str, ...] = ("/api/",),
+    ) -> None:
+        self.app = app
+        self.maxsize = maxsize
+        self.credential_cookies = credential_cookies
+        self.prefixes = prefixes
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        self._refreshing: set[tuple] = set()
+        # Cambia con cada purga: una respuesta pedida antes de la purga no se guarda
+        self._generation = 0
+        self._lock = threading.Lock()
+        _middlewares.add(self)
+
+    def __call__(self, environ, start_response):
+        if (
+            environ["REQUEST_METHOD"] not in ("GET", "HEAD")
+            or not environ.get("PATH_INFO", "").startswith(self.prefixes)
+            or self._has_credentials(environ)
+        ):
+            return self.app(environ, start_response)
+
+        key = (
+            environ.get("PATH_INFO", ""),
+            environ.get("QUERY_STRING", ""),
+            environ.get("HTTP_ACCEPT_ENCODING", ""),
+        )
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None:
+            age = time.monotonic() - entry.stored_at
+            if age < entry.ttl:
+                return self._send(entry, "HIT", age, environ, start_response)
+            if age < entry.ttl + entry.stale_while_revalidate:
+                self._revalidate(key, environ)
+                return self._send(entry, "STALE", age, environ, start_response)
+        if environ["REQUEST_METHOD"] == "HEAD":
+            # Sin cuerpo no hay nada que guardar para los GET
+            return self.app(environ, start_response)
+
+        entry = self._fetch(key, environ)
+        if entry.ttl <= 0:
+            start_response(entry.status, entry.headers)
+            return [entry.body]
+        return self._send(entry, "MISS", 0, environ, start_response)
+
+    def purge(self, keys: set[str]) -> None:
+        """Descarta las respuestas que tengan alguna de las ``keys``"""
+        with self._lock:
+            self._generation += 1
+            for cache_key in [k for k, entry in self._entries.items() if entry.keys & keys]:
+                del self._entries[cache_key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def _has_credentials(self, environ) -> bool:
+        if "HTTP_AUTHORIZATION" in environ:
+            return True
+        cookies = environ.get("HTTP_COOKIE", "")
+        return any(f"{name}=" in cookies for name in self.credential_cookies)
+
+    def _fetch(self, key: tuple, environ) -> _Entry:
+        """Pide la respuesta a la aplicacion y la guarda si es cacheable"""
+        with self._lock:
+            generation = self._generation
+        captured = {}
+
+        def start_response(status, headers, exc_info=None):
+            captured["status"], captured["headers"] = status, headers
+            return lambda data: None
+
+        result = self.app(environ, start_response)
+        try:
+            body = b"".join(result)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+
+        entry = _Entry(captured["status"], captured["headers"], body, time.monotonic(), 0, 0)
+        self._make_cacheable(entry)
+        if entry.ttl > 0:
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[key] = entry
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+        return entry
+
+    @staticmethod
+    def _make_cacheable(entry: _Entry) -> None:
+        if not entry.status.startswith("200"):
+            return
+        headers = {name.lower(): value for name, value in entry.headers}
+        if "set-cookie" in headers:
+            return
+        cache_control = parse_cache_control_header(headers.get("cache-control"), cls=ResponseCacheControl)
+        if not cache_control.public or cache_control.private or cache_control.no_store or cache_control.no_cache:
+            return
+        entry.ttl = cache_control.s_maxage if cache_control.s_maxage is not None else (cache_control.max_age or 0)
+        entry.stale_while_revalidate = cache_control.stale_while_revalidate or 0
+        entry.keys = set(headers.get("surrogate-key", "").split())
+        # Como en una CDN, las claves de purga no llegan al cliente
+        entry.headers = [(name, value) for name, value in entry.headers if name.lower() != "surrogate-key"]
+
+    def _revalidate(self, key: tuple, environ) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        environ = {**environ, "wsgi.input": io.BytesIO(), "REQUEST_METHOD": "GET"}
+
+        def refresh():
+            try:
+                self._fetch(key, environ)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    @staticmethod
+    def _send(entry: _Entry, status: str, age: float, environ, start_response):
+        headers = [*entry.headers, ("Age", str(int(age))), ("X-Cache", status)]
+        start_response(entry.status, headers)
+        return [] if environ["REQUEST_METHOD"] == "HEAD" else [entry.body]
+
+
+def purge(keys: set[str]) -> None:
+    """
+    Purga las ``Surrogate-Key`` indicadas en las caches locales y, si esta configurado
+    ``EDGE_PURGE_URL``, en la CDN (POST con las claves en el header ``Surrogate-Key``)
+    """
+    if not keys:
+        return
+    for middleware in list(_middlewares):
+        middleware.purge(keys)
+    if not has_app_context() or not current_app.config.get("EDGE_PURGE_URL"):
+        return
+    config = current_app.config
+    headers = {"Surrogate-Key": " ".join(sorted(keys))}
+    if config.get("EDGE_PURGE_TOKEN"):
+        headers["Authorization"] = f"Bearer {config['EDGE_PURGE_TOKEN']}"
+    try:
+        requests.post(config["EDGE_PURGE_URL"], headers=headers, timeout=config["EDGE_PURGE_TIMEOUT"])
+    except requests.RequestException:
+        current_app.logger.warning("edge purge failed for %s", headers["Surrogate-Key"], exc_info=True)
+
+
+def _purge_sites(sender, site_ids: list[int], **extra) -> None:
+    # Los listados, facetas y provincias dependen de cualquier sitio
+    purge({"sites", *(f"site-{site_id}" for site_id in site_ids)})
+
+
+def _purge_tags(sender, tag_ids: list[int], **extra) -> None:
+    # Los listados muestran los nombres de los tags
+    purge({"tags", "sites", *(f"tag-{tag_id}" for tag_id in tag_ids)})
+
+
+def _purge_reviews(sender, site_ids: list[int], **extra) -> None:
+    # Las calificaciones cambian el orden de los listados
+    purge({"sites", *(f"site-{site_id}" for site_id in site_ids)})
+
+
+def _purge_flags(sender, **extra) -> None:
+    purge({"flags"})
+
+
+signals.site_changed.connect(_purge_sites)
+signals.tag_changed.connect(_purge_tags)
+signals.review_changed.connect(_purge_reviews)
+signals.flag_changed.connect(_purge_flags)
+
+
+class EdgeCache:
+    """
+    Con ``EDGE_CACHE`` pone ``EdgeCacheMiddleware`` delante de la aplicacion. Las purgas
+    por ``Surrogate-Key`` se envian siempre que las escrituras emiten sus señales
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if app.config.get("EDGE_CACHE"):
+            app.wsgi_app = EdgeCacheMiddleware(
+                app.wsgi_app,
+                maxsize=app.config["EDGE_CACHE_SIZE"],
+                credential_cookies=(app.config.get("JWT_ACCESS_COOKIE_NAME", "access_token_cookie"),),
+            )
+        return app
+
+
+edge_cache = EdgeCache()
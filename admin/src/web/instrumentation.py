@@ -0,0 +1,127 @@
+import os
+import re
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+from flask import current_app, g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Raiz de src/: los frames de aca adentro son codigo propio (repositorios, rutas)
+_SRC_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN \((?:\s*(?:\?|%\([^)]+\)s|%s),?)+\s*\)", re.IGNORECASE)
+
+
+def normalize_sql(statement: str) -> str:
+    """
+    Normaliza una sentencia para agrupar ejecuciones equivalentes: colapsa espacios,
+    reemplaza literales por ``?`` y las listas ``IN (...)`` por ``IN (...)``
+    """
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    statement = _STRING_LITERAL.sub("?", statement)
+    statement = _NUMBER_LITERAL.sub("?", statement)
+    return _IN_LIST.sub("IN (...)", statement)
+
+
+def calling_function() -> str:
+    """Primer frame de codigo propio en la pila, con la forma ``archivo:linea en funcion``"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(_SRC_ROOT) and filename != os.path.abspath(__file__):
+            return f"{os.path.relpath(filename, _SRC_ROOT)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+
+@dataclass
+class RequestSQLStats:
+    count: int = 0
+    duration: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+
+
+class SQLInstrumentation:
+    """
+    Mide las consultas SQL de cada request con los eventos de cursor de SQLAlchemy.
+
+    - ``Server-Timing``: cantidad de consultas y tiempo de base (si ``SQL_SERVER_TIMING``)
+    - Log de consultas mas lentas que ``SQL_SLOW_QUERY_MS`` con la funcion que las origino
+    - Aviso de posible N+1 cuando una misma sentencia se repite ``SQL_N_PLUS_ONE_THRESHOLD`` veces
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get("SQL_INSTRUMENTATION", True):
+            return app
+        if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+            event.listen(Engine, "handle_error", _discard_failed_execute)
+        app.before_request(_start_request)
+        app.after_request(_add_server_timing)
+        return app
+
+
+def _start_request() -> None:
+    g.sql_stats = RequestSQLStats()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("sql_started_at", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("sql_started_at")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    if not has_request_context():
+        return
+    stats = g.get("sql_stats")
+    if stats is None:
+        return
+
+    normalized = normalize_sql(statement)
+    stats.count += 1
+    stats.duration += elapsed
+    stats.statements[normalized] += 1
+
+    config = current_app.config
+    if elapsed * 1000 >= config["SQL_SLOW_QUERY_MS"]:
+        current_app.logger.warning(
+            "slow query (%.1f ms) from %s: %s", elapsed * 1000, calling_function(), normalized
+        )
+    if stats.statements[normalized] == config["SQL_N_PLUS_ONE_THRESHOLD"]:
+        current_app.logger.warning(
+            "possible N+1: statement repeated %d times in one request, from %s: %s",
+            stats.statements[normalized], calling_function(), normalized,
+        )
+
+
+def _discard_failed_execute(context) -> None:
+    # Una sentencia que fallo no llega a after_cursor_execute
+    started = context.connection.info.get("sql_started_at") if context.connection else None
+    if started:
+        started.pop()
+
+
+def _add_server_timing(response):
+    stats = g.get("sql_stats")
+    if stats is not None and current_app.config["SQL_SERVER_TIMING"]:
+        response.headers.add(
+            "Server-Timing", f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries"'
+        )
+    return response
+
+
+sql_instrumentation = SQLInstrumentation()
@@ -0,0 +1,72 @@
+from datetime import date, time
+from typing import Any
+
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # dependencia opcional: sin ella se usa la libreria estandar
+    orjson = None
+
+
+def _default(o: Any) -> Any:
+    # Fechas en ISO 8601 (el proveedor de Flask usa el formato de fecha HTTP), igual que orjson
+    if isinstance(o, (date, time)):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+class APIJSONProvider(DefaultJSONProvider):
+    """
+    Proveedor JSON de la aplicacion: fechas en ISO 8601 y, si orjson esta instalado y
+    ``JSON_FAST`` no lo desactiva, serializacion con orjson escribiendo los bytes de la
+    respuesta directamente, sin pasar por ``str``
+
+    Lo que orjson no puede serializar (enteros de mas de 64 bits, por ejemplo) vuelve
+    a la libreria estandar con la misma salida.
+    """
+
+    default = staticmethod(_default)
+
+    def __init__(self, app) -> None:
+        super().__init__(app)
+        self.fast = orjson is not None and app.config.get("JSON_FAST", True)
+
+    def _options(self, indent: bool = False, newline: bool = False) -> int:
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if newline:
+            option |= orjson.OPT_APPEND_NEWLINE
+        return option
+
+    def _dumps_fast(self, obj: Any, **options) -> bytes | None:
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options(**options))
+        except TypeError:
+            return None
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if self.fast and not kwargs:
+            data = self._dumps_fast(obj)
+            if data is not None:
+                return data.decode()
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if self.fast and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        if not self.fast:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        data = self._dumps_fast(obj, indent=indent, newline=True)
+        if data is None:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(data, mimetype=self.mimetype)
@@ -0,0 +1,325 @@
+import hmac
+import math
+import threading
+import time
+from collections.abc import Callable, Iterable
+
+from flask import Response, abort, current_app, g, request
+from sqlalchemy.pool import QueuePool
+
+from core import cache
+from core.database import db
+
+# Limites (en segundos) de los buckets de latencia; +Inf se agrega solo
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+class _ThreadShards:
+    """
+    Valores por hilo: cada hilo escribe solo en su propio diccionario, sin locks, y la
+    lectura los suma. Los diccionarios de hilos terminados se acumulan en uno solo
+    al leer, asi un servidor que crea un hilo por request no los junta indefinidamente
+    """
+
+    def __init__(self, merge: Callable) -> None:
+        self._merge = merge
+        self._local = threading.local()
+        self._shards: list[tuple[threading.Thread, dict]] = []
+        self._retired: dict = {}
+        self._lock = threading.Lock()
+
+    def shard(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def collect(self) -> dict:
+        with self._lock:
+            alive = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                else:
+                    self._fold(self._retired, dict(shard))
+            self._shards = alive
+            total: dict = {}
+            self._fold(total, self._retired)
+            for _, shard in alive:
+                # dict() copia de una vez bajo el GIL, sin carrera con el hilo que escribe
+                self._fold(total, dict(shard))
+        return total
+
+    def _fold(self, into: dict, values: dict) -> None:
+        for labels, value in values.items():
+            into[labels] = self._merge(into[labels], value) if labels in into else self._merge(None, value)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = _ThreadShards(lambda total, value: (total or 0) + value)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(labels[name] for name in self.labelnames)
+        shard = self._values.shard()
+        shard[key] = shard.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.collect().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = (*buckets, math.inf)
+        self._values = _ThreadShards(self._merge)
+
+    @staticmethod
+    def _merge(total: list | None, value: list) -> list:
+        # [conteo por bucket (no acumulado)..., suma]
+        if total is None:
+            return list(value)
+        return [a + b for a, b in zip(total, value, strict=True)]
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(labels[name] for name in self.labelnames)
+        shard = self._values.shard()
+        counts = shard.get(key)
+        if counts is None:
+            counts = shard[key] = [0] * len(self.buckets) + [0.0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        counts[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, counts in sorted(self._values.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts[:-1], strict=True):
+                cumulative += count
+                labels = _format_labels((*self.labelnames, "le"), (*key, _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(counts[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Collected:
+    """
+    Metrica que se lee de otra fuente al momento del scrape (``collect`` devuelve pares
+    ``(labels, valor)``); ``kind`` es "counter" si la fuente solo crece
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...],
+        collect: Callable[[], Iterable[tuple[tuple, float]]],
+        kind: str = "gauge",
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.kind = kind
+        self._collect = collect
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in self._collect():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: list = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class TimedQueuePool(QueuePool):
+    """``QueuePool`` que mide cuanto espera cada checkout por una conexion libre"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - started, engine=self.logging_name or "default")
+
+
+def _pool_gauge(measure: Callable) -> Callable:
+    def collect():
+        for key, engine in db.engines.items():
+            if isinstance(engine.pool, QueuePool):
+                yield (key or "default",), measure(engine.pool)
+    return collect
+
+
+def _cache_gauge(measure: Callable) -> Callable:
+    def collect():
+        for stats in sorted((c.stats() for c in cache.all_caches()), key=lambda s: s["name"]):
+            value = measure(stats)
+            if value is not None:
+                yield (stats["name"],), value
+    return collect
+
+
+registry = Registry()
+
+HTTP_REQUEST_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds",
+    "Latencia de las requests por blueprint, endpoint y status",
+    ("blueprint", "endpoint", "method", "status"),
+))
+DB_POOL_WAIT = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Espera para obtener una conexion del pool",
+    ("engine",),
+    POOL_WAIT_BUCKETS,
+))
+registry.register(Collected(
+    "db_pool_size", "Conexiones permanentes del pool", ("engine",), _pool_gauge(lambda p: p.size())
+))
+registry.register(Collected(
+    "db_pool_checked_out", "Conexiones en uso", ("engine",), _pool_gauge(lambda p: p.checkedout())
+))
+registry.register(Collected(
+    "db_pool_overflow", "Conexiones abiertas por encima de pool_size", ("engine",),
+    _pool_gauge(lambda p: max(p.overflow(), 0)),
+))
+registry.register(Collected(
+    "cache_hits_total", "Aciertos de la cache en memoria", ("cache",), _cache_gauge(lambda s: s["hits"]),
+    kind="counter",
+))
+registry.register(Collected(
+    "cache_misses_total", "Fallos de la cache en memoria", ("cache",), _cache_gauge(lambda s: s["misses"]),
+    kind="counter",
+))
+registry.register(Collected(
+    "cache_hit_ratio", "Aciertos sobre consultas totales de la cache", ("cache",),
+    _cache_gauge(lambda s: s["hits"] / (s["hits"] + s["misses"]) if s["hits"] + s["misses"] else None),
+))
+registry.register(Collected(
+    "cache_entries", "Entradas guardadas en la cache", ("cache",), _cache_gauge(lambda s: s["size"])
+))
+STORAGE_UPLOAD_DURATION = registry.register(Histogram(
+    "storage_upload_duration_seconds", "Latencia de las subidas a MinIO", ("outcome",)
+))
+STORAGE_UPLOAD_BYTES = registry.register(Counter(
+    "storage_upload_bytes_total", "Bytes subidos a MinIO", ("outcome",)
+))
+
+
+class Metrics:
+    """
+    Metricas del proceso en formato de texto de Prometheus, expuestas en ``/metrics``
+
+    Cada worker lleva sus propios valores; Prometheus los distingue por instancia.
+    Hay que llamar a ``init_app`` antes que a ``database.init_app`` para que los
+    engines se creen con ``TimedQueuePool``.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get("METRICS_ENABLED", False):
+            return app
+        if app.config.get("METRICS_REQUIRE_TOKEN", True) and not app.config.get("METRICS_TOKEN"):
+            raise RuntimeError("METRICS_ENABLED requiere METRICS_TOKEN fuera de desarrollo")
+        _time_pool_checkouts(app)
+        app.before_request(_start_timer)
+        app.after_request(_observe_request)
+        app.add_url_rule("/metrics", "metrics", _metrics_view)
+        return app
+
+
+def _time_pool_checkouts(app) -> None:
+    """Configura los engines (principal y binds) con ``TimedQueuePool`` y su nombre como etiqueta"""
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "poolclass": TimedQueuePool,
+        "pool_logging_name": "default",
+        **app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}),
+    }
+    app.config["SQLALCHEMY_BINDS"] = {
+        key: {
+            "poolclass": TimedQueuePool,
+            "pool_logging_name": key,
+            **(value if isinstance(value, dict) else {"url": value}),
+        }
+        for key, value in app.config.get("SQLALCHEMY_BINDS", {}).items()
+    }
+
+
+def _start_timer() -> None:
+    g.metrics_started_at = time.perf_counter()
+
+
+def _observe_request(response):
+    started = g.get("metrics_started_at")
+    if started is not None:
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - started,
+            blueprint=request.blueprint or "app",
+            # Sin endpoint (404) se agrupa para no crear una serie por URL
+            endpoint=request.endpoint or "unmatched",
+            method=request.method,
+            status=response.status_code,
+        )
+    return response
+
+
+def _metrics_view() -> Response:
+    token = current_app.config.get("METRICS_TOKEN")
+    if token and not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        abort(401)
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+
+metrics_exporter = Metrics()
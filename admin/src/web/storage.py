@@ -4,8 +4,11 @@ from minio.error import S3Error
 from flask import current_app
 from werkzeug.utils import secure_filename
 from datetime import timedelta
+import time
 import uuid
 
+from web.metrics import STORAGE_UPLOAD_BYTES, STORAGE_UPLOAD_DURATION
+
 class Storage:
     def __init__(self, app=None):
         self._client = None
@@ -78,6 +81,8 @@ class Storage:
 
         object_name = f"public/sites/{site_id}/{uuid.uuid4()}.{ext}"
 
+        started = time.perf_counter()
+        outcome = "error"
         try:
             self._client.put_object(
                 bucket_name=self._bucket,
@@ -86,8 +91,12 @@ class Storage:
                 length=size,
                 content_type=file.content_type or "image/jpeg"
             )
+            outcome = "ok"
         except S3Error as e:
             raise ValueError(f"Error MinIO: {e}")
+        finally:
+            STORAGE_UPLOAD_DURATION.observe(time.perf_counter() - started, outcome=outcome)
+            STORAGE_UPLOAD_BYTES.inc(size, outcome=outcome)
 
         endpoint = current_app.config["MINIO_SERVER"]
         # Agregar http:// o https:// según MINIO_SECURE
@@ -5,6 +5,7 @@ from geoalchemy2 import WKTElement
 from sqlalchemy import text
 from sqlalchemy.exc import OperationalError
 
+from core import cache, suggest
 from core.auth import repository as user_repo
 from core.auth.models import User
 from core.database import db
@@ -46,12 +47,23 @@ def app():
     ctx.pop()
 
 
+@pytest.fixture
+def as_json(app) -> Callable[[object], object]:
+    def _as_json(data):
+        """Pasa los datos por el proveedor JSON de la app (fechas a ISO 8601, etc.)."""
+        return app.json.loads(app.json.dumps(data))
+
+    return _as_json
+
+
 @pytest.fixture(scope="function")
 def client(app):
     db.create_all()
     yield app.test_client()
     db.session.remove()
     db.drop_all()
+    cache.clear_all()
+    suggest.reset()
 
 
 @pytest.fixture
@@ -167,3 +179,16 @@ def auth_headers(client, create_user) -> Callable[..., dict[str, str]]:
         return {"Cookie": cookie}
 
     return _auth_headers
+
+
+@pytest.fixture
+def panel_login(client) -> Callable[..., None]:
+    def _panel_login(user: User, *permissions: str) -> None:
+        """Deja al usuario logueado en el panel de administracion con los permisos dados."""
+        for name in permissions:
+            permission = user_repo.get_permission_by_name(name) or user_repo.create_permission(name=name)
+            user_repo.assign_permission_to_role(user.role, permission)
+        with client.session_transaction() as session:
+            session["user_id"] = user.id
+
+    return _panel_login
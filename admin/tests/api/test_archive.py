@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from sqlalchemy import func, select, update
+
+from core import archive
+from core.auth import repository as user_repo
+from core.database import db
+from core.historic_site import repository as historic_repo
+
+
+def _age_deletions(days: int) -> None:
+    """Lleva hacia atras la fecha de borrado de todas las filas eliminadas"""
+    for table in archive.KINDS.values():
+        db.session.execute(
+            update(table).where(table.c.deleted == True).values(deleted_at=func.now() - timedelta(days=days))
+        )
+    db.session.commit()
+
+
+def _ids(table) -> list[int]:
+    return list(db.session.scalars(select(table.c.id).order_by(table.c.id)))
+
+
+def test_archive_moves_deleted_site_with_dependents(client, create_user, create_site, create_review):
+    author = create_user()
+    reviewer = create_user(email="other@gmail.com")
+    site = create_site(user=author)
+    live = create_site(user=author, name="Cabildo")
+    review = create_review(user=reviewer, site=site)
+    user_repo.add_favorite(reviewer.id, site.id)
+    historic_repo.delete_historic_site(site.id, author.id)
+    user_repo.delete_user(reviewer.id)
+    user_repo.delete_user(author.id)
+
+    # Recien eliminados: todavia no se archivan
+    assert not archive.archive_deleted(timedelta(days=30))
+
+    _age_deletions(days=60)
+    counts = archive.archive_deleted(timedelta(days=30), batch_size=1)
+
+    assert counts["historic_site"] == 1
+    assert counts["review"] == 1
+    assert counts["user_favorite_sites"] == 1
+    assert counts["modification"] >= 1
+    # El autor, tambien eliminado, sigue referenciado por las modificaciones del sitio vivo
+    assert counts["users"] == 1
+    assert _ids(archive.site) == [live.id]
+    assert _ids(archive.user) == [author.id]
+    assert _ids(archive.ARCHIVE_TABLES["review"]) == [review.id]
+
+    # Restaurar la review trae de vuelta su sitio entero y a su autor, todavia eliminados
+    restored = archive.restore("review", review.id)
+
+    assert (restored["historic_site"], restored["review"], restored["users"]) == (1, 1, 1)
+    assert _ids(archive.site) == [site.id, live.id]
+    assert _ids(archive.ARCHIVE_TABLES["historic_site"]) == []
+    assert db.session.scalar(select(archive.site.c.deleted).where(archive.site.c.id == site.id))
+    favorites = archive.user_favorite_sites
+    assert db.session.execute(select(favorites.c.id_user, favorites.c.id_historic_site)).all() == [(reviewer.id, site.id)]
+    # La restauracion reinicia el plazo
+    assert not archive.archive_deleted(timedelta(days=30))
@@ -0,0 +1,91 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("asyncpg")
+
+from core.auth import repository as user_repo  # noqa: E402
+from web.asgi import AsyncReadAPI  # noqa: E402
+
+
+def _asgi_get(app, *paths: str, headers: dict[str, str] | None = None) -> list[tuple[int, dict, bytes]]:
+    """Hace GETs a la API asincronica en un mismo loop y cierra su pool al terminar."""
+    api = AsyncReadAPI(app)
+
+    async def get(path: str) -> tuple[int, dict, bytes]:
+        path, _, query = path.partition("?")
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "root_path": "",
+            "query_string": query.encode(),
+            "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        }
+        await api(scope, receive, send)
+        start, body = messages
+        return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}, body["body"]
+
+    async def run():
+        try:
+            return [await get(path) for path in paths]
+        finally:
+            await api.shutdown()
+
+    return asyncio.run(run())
+
+
+def test_async_list_sites_matches_flask(app, client, create_user, create_site):
+    user = create_user()
+    for name in ("Cabildo", "Catedral", "Casa Curutchet"):
+        create_site(user=user, name=name)
+
+    expected = client.get("/api/sites?per_page=2&order_by=oldest")
+    [(status, headers, body)] = _asgi_get(app, "/api/sites?per_page=2&order_by=oldest")
+
+    assert status == 200
+    assert json.loads(body) == expected.json
+    assert headers["cache-control"] == expected.headers["Cache-Control"]
+    assert headers["surrogate-key"] == expected.headers["Surrogate-Key"]
+
+
+def test_async_get_site_counts_visits(app, client, create_site):
+    site = create_site()
+
+    (_, _, first), (status, headers, second) = _asgi_get(app, f"/api/sites/{site.id}", f"/api/sites/{site.id}")
+    expected = client.get(f"/api/sites/{site.id}")
+
+    assert status == 200
+    assert headers["cache-control"] == "private, no-cache"
+    assert [json.loads(first)["visit_count"], json.loads(second)["visit_count"]] == [1, 2]
+    assert expected.json["visit_count"] == 3
+    assert {**json.loads(second), "visit_count": 3} == expected.json
+
+
+def test_async_errors_match_flask(app, client):
+    missing, favorites = _asgi_get(app, "/api/sites/999", "/api/sites?only_favorites=true")
+
+    assert (missing[0], json.loads(missing[2])) == (404, client.get("/api/sites/999").json)
+    assert (favorites[0], json.loads(favorites[2])) == (401, client.get("/api/sites?only_favorites=true").json)
+
+
+def test_async_rejects_token_of_deleted_user(app, client, create_user, create_site, auth_headers):
+    user = create_user()
+    create_site(user=user)
+    headers = auth_headers(user=user)
+    [(status, _, _)] = _asgi_get(app, "/api/sites?only_favorites=true", headers=headers)
+    assert status == 200
+
+    user_repo.delete_user(user.id)
+
+    [(status, _, body)] = _asgi_get(app, "/api/sites?only_favorites=true", headers=headers)
+    assert (status, json.loads(body)) == (401, client.get("/api/sites?only_favorites=true", headers=headers).json)
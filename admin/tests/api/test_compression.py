@@ -0,0 +1,23 @@
+import gzip
+import json
+
+
+def test_api_response_gzipped_when_accepted(client, app, create_site, monkeypatch):
+    monkeypatch.setitem(app.config, "COMPRESS_MIN_SIZE", 0)
+    create_site()
+
+    response = client.get("/api/sites", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert len(json.loads(gzip.decompress(response.get_data()))["data"]) == 1
+
+
+def test_response_not_compressed_without_accept_encoding_or_below_threshold(client, app, create_site):
+    create_site()
+
+    assert "Content-Encoding" not in client.get("/api/sites").headers
+    response = client.get("/api/sites/facets?province=Nada", headers={"Accept-Encoding": "gzip"})
+    assert len(response.get_data()) < app.config["COMPRESS_MIN_SIZE"]
+    assert "Content-Encoding" not in response.headers
@@ -0,0 +1,47 @@
+from core.tags import repository as tags_repo
+from web.edge_cache import EdgeCacheMiddleware
+
+
+def test_public_and_private_cache_policies(client, create_user, create_site, auth_headers):
+    user = create_user()
+    site = create_site(user=user)
+
+    response = client.get("/api/sites")
+    assert response.cache_control.public
+    assert response.cache_control.s_maxage == 300
+    assert response.cache_control.stale_while_revalidate == 600
+    assert set(response.headers["Surrogate-Key"].split()) == {"sites", f"site-{site.id}"}
+
+    response = client.get("/api/me/favorites", headers=auth_headers(user=user))
+    assert response.cache_control.private
+    assert "Surrogate-Key" not in response.headers
+
+
+def test_edge_cache_serves_hits_and_purges_on_write(client, app, monkeypatch):
+    middleware = EdgeCacheMiddleware(app.wsgi_app)
+    monkeypatch.setattr(app, "wsgi_app", middleware)
+    tags_repo.create_tag(name="Museo")
+
+    assert client.get("/api/tags").headers["X-Cache"] == "MISS"
+    response = client.get("/api/tags")
+    assert response.headers["X-Cache"] == "HIT"
+    assert "Surrogate-Key" not in response.headers
+
+    tags_repo.create_tag(name="Educativo")
+
+    response = client.get("/api/tags")
+    assert response.headers["X-Cache"] == "MISS"
+    assert [tag["name"] for tag in response.json] == ["educativo", "museo"]
+
+
+def test_site_write_purges_tag_usage_counts(client, app, monkeypatch, create_site):
+    middleware = EdgeCacheMiddleware(app.wsgi_app)
+    monkeypatch.setattr(app, "wsgi_app", middleware)
+    tags_repo.create_tag(name="Museo")
+
+    assert client.get("/api/tags").headers["X-Cache"] == "MISS"
+    assert client.get("/api/tags").headers["X-Cache"] == "HIT"
+
+    create_site()
+
+    assert client.get("/api/tags").headers["X-Cache"] == "MISS"
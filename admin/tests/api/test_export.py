@@ -0,0 +1,70 @@
+import csv
+import gzip
+import io
+
+from sqlalchemy import event
+
+from core.database import db
+from core.historic_site import repository as historic_repo
+
+
+def _statements(engine, fn) -> list[str]:
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    return statements
+
+
+def test_export_csv_streams_gzipped_rows(client, create_user, create_site, panel_login):
+    user = create_user()
+    create_site(user=user, name="Catedral de La Plata")
+    create_site(user=user, name="Teatro Colon", city="Buenos Aires", province="CABA")
+    panel_login(user, "export_csv")
+
+    response = client.get(
+        "/historic_sites/export-csv?province=Buenos Aires",
+        headers={"Accept-Encoding": "gzip"},
+    )
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in response.headers
+    rows = list(csv.reader(io.StringIO(gzip.decompress(response.get_data()).decode())))
+    assert rows[0][:2] == ["ID", "Nombre"]
+    assert [row[1] for row in rows[1:]] == ["Catedral de La Plata"]
+
+
+def test_export_csv_without_matches_redirects(client, create_user, create_site, panel_login):
+    user = create_user()
+    create_site(user=user)
+    panel_login(user, "export_csv")
+
+    response = client.get("/historic_sites/export-csv?province=Nada")
+
+    assert response.status_code == 302
+
+
+def test_export_reads_sites_in_batches_without_images(client, create_user, create_site):
+    user = create_user()
+    for index in range(5):
+        create_site(user=user, name=f"Sitio {index}")
+    db.session.expunge_all()
+
+    def export():
+        chunks = list(historic_repo.generate_csv_content(
+            historic_repo.iter_historic_sites_for_export(batch_size=2), chunk_rows=2
+        ))
+        # Encabezado y dos filas, dos filas, y la ultima fila
+        assert [chunk.count("\r\n") for chunk in chunks] == [3, 2, 1]
+
+    statements = _statements(db.engine, export)
+
+    assert not any("FROM image" in statement for statement in statements)
@@ -61,7 +61,10 @@ def test_get_favorite_sites(client, create_user, create_site, auth_headers, page
     endpoint = f"/api/me/favorites?page={page}&per_page={per_page}"
     response = client.get(endpoint, headers=headers)
     assert response.status_code == 200
-    assert response.json["data"] == [site.to_dict()]
+    # Mismas tarjetas que el listado de sitios
+    assert response.json["data"] == client.get("/api/sites", headers=headers).json["data"]
+    assert response.json["data"][0]["id"] == site.id
+    assert response.json["data"][0]["favorited"] is True
     assert response.json["_meta"] == {
         "page": page,
         "per_page": per_page,
@@ -73,3 +76,48 @@ def test_get_favorite_sites(client, create_user, create_site, auth_headers, page
         "next": None,
         "self": endpoint
     }
+
+
+def test_put_site_favorite_is_idempotent(client, create_user, create_site, auth_headers):
+    user = create_user()
+    site = create_site(user=user)
+    headers = auth_headers(user=user)
+    assert client.put(f"/api/sites/{site.id}/favorite", headers=headers).status_code == 204
+    assert client.put(f"/api/sites/{site.id}/favorite", headers=headers).status_code == 204
+    assert user.favorites == [site]
+
+
+def test_get_favorite_ids_401(client):
+    response = client.get("/api/me/favorites/ids")
+    assert response.status_code == 401
+
+
+def test_get_favorite_ids_with_etag(client, create_user, create_site, auth_headers):
+    user = create_user()
+    site = create_site(user=user)
+    user.favorites.append(site)
+    headers = auth_headers(user=user)
+
+    response = client.get("/api/me/favorites/ids", headers=headers)
+    assert response.status_code == 200
+    assert response.json == {"ids": [site.id]}
+    etag = response.headers["ETag"]
+
+    response = client.get("/api/me/favorites/ids", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_get_site_includes_favorited_for_authenticated_user(client, create_user, create_site, auth_headers):
+    user = create_user()
+    site = create_site(user=user)
+    headers = auth_headers(user=user)
+
+    response = client.get(f"/api/sites/{site.id}", headers=headers)
+    assert response.json["favorited"] is False
+
+    client.put(f"/api/sites/{site.id}/favorite", headers=headers)
+    response = client.get(f"/api/sites/{site.id}", headers=headers)
+    assert response.json["favorited"] is True
+
+    response = client.get(f"/api/sites/{site.id}")
+    assert "favorited" not in response.json
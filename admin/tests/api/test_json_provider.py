@@ -0,0 +1,20 @@
+from datetime import UTC, datetime
+
+
+def test_site_dates_serialized_as_iso_8601(client, create_site):
+    site = create_site()
+
+    response = client.get(f"/api/sites/{site.id}")
+
+    assert response.status_code == 200
+    assert datetime.fromisoformat(response.json["inserted_at"]) == site.inserted_at
+
+
+def test_fast_and_stdlib_serializers_agree(app, monkeypatch):
+    data = {"b": [1, 2.5, None], "a": datetime(2024, 5, 1, 12, 30, tzinfo=UTC), "c": "Córdoba"}
+
+    fast = app.json.loads(app.json.dumps(data))
+    monkeypatch.setattr(app.json, "fast", False)
+    stdlib = app.json.loads(app.json.dumps(data))
+
+    assert fast == stdlib == {"a": "2024-05-01T12:30:00+00:00", "b": [1, 2.5, None], "c": "Córdoba"}
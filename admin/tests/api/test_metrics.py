@@ -0,0 +1,37 @@
+import pytest
+from flask import Flask
+
+from web.metrics import Metrics
+
+
+def test_metrics_exposes_request_latency_by_blueprint(client):
+    client.get("/api/sites")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    body = response.get_data(as_text=True)
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert (
+        'http_request_duration_seconds_count{blueprint="api_bp",endpoint="api_bp.list_sites",'
+        'method="GET",status="200"}'
+    ) in body
+    assert 'db_pool_size{engine="default"}' in body
+
+
+def test_metrics_requires_token_when_configured(client, app, monkeypatch):
+    monkeypatch.setitem(app.config, "METRICS_TOKEN", "secreto")
+
+    assert client.get("/metrics").status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer secreto"})
+    assert response.status_code == 200
+
+
+def test_metrics_require_token_outside_development():
+    production = Flask(__name__)
+    production.config.update(METRICS_ENABLED=True, METRICS_REQUIRE_TOKEN=True, METRICS_TOKEN=None)
+
+    with pytest.raises(RuntimeError):
+        Metrics().init_app(production)
+
@@ -0,0 +1,40 @@
+from sqlalchemy import delete, select, text
+
+from core import migrations
+from core.database import db
+from core.tags.models import Tag
+
+# Lo que las bases creadas antes de las migraciones versionadas no tienen
+PRE_SERIES_DDL = (
+    "DROP TABLE site_card",
+    "DROP TABLE site_rating_summary",
+    "ALTER TABLE review DROP COLUMN claimed_by, DROP COLUMN claimed_until",
+    "ALTER TABLE users DROP COLUMN profile_version",
+    "ALTER TABLE tag DROP COLUMN usage_count",
+)
+
+
+def test_upgrade_brings_pre_series_database_up_to_date(client, create_user, create_site, create_review, create_tags):
+    create_tags()
+    user = create_user()
+    site = create_site(user=user)
+    tag = db.session.scalar(select(Tag).where(Tag.name == "Museo"))
+    site.tags.append(tag)
+    create_review(user=user, site=site, rating=4)
+    db.session.commit()
+    site_id, tag_id = site.id, tag.id
+    db.session.remove()
+
+    with db.engine.begin() as conn:
+        for statement in PRE_SERIES_DDL:
+            conn.execute(text(statement))
+        conn.execute(delete(migrations.schema_migrations))
+
+    applied = migrations.upgrade(db.engine)
+
+    assert [migration.version for migration in applied] == [m.version for m in migrations.discover()]
+    response = client.get(f"/api/sites/{site_id}")
+    assert response.status_code == 200
+    assert response.json["rating_summary"]["total"] == 1
+    assert response.json["tags"] == ["Museo"]
+    assert db.session.get(Tag, tag_id).usage_count == 1
@@ -0,0 +1,98 @@
+"""
+Regresiones de planes de consulta: corre EXPLAIN sobre las consultas de los caminos de
+lectura principales con un dataset sintetico y falla si alguna recorre entera una tabla
+grande (Seq Scan). Los totales de paginacion (``count(*)`` sin filtro) quedan afuera
+porque recorren la tabla por definicion.
+"""
+
+from collections.abc import Callable
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event, select
+
+from core import cache, suggest
+from core.auth import repository as user_repo
+from core.database import db
+from core.historic_site import repository as hs_repo
+from core.historic_site.models import SiteCard
+from core.reviews import repository as reviews_repo
+from tests.benchmarks import dataset
+
+# Tablas que crecen con el uso; las de catalogo (tags, categorias, roles) pueden recorrerse
+LARGE_TABLES = {"historic_site", "site_card", "review", "image", "modification", "users", "user_favorite_sites"}
+
+
+@pytest.fixture(scope="module")
+def seeded(app):
+    generated = dataset.seed(dataset.Scale(sites=5_000, users=500))
+    yield generated.sites[len(generated.sites) // 2], generated.users[0]
+    db.session.remove()
+    db.drop_all()
+    cache.clear_all()
+    suggest.reset()
+
+
+@contextmanager
+def captured_selects():
+    """Junta las sentencias SELECT (con sus parametros) que se ejecutan en el bloque"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+
+def _seq_scans(plan: dict) -> list[str]:
+    found = []
+    if plan["Node Type"] == "Seq Scan" and plan["Relation Name"] in LARGE_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scans(child))
+    return found
+
+
+def _is_count(statement: str) -> bool:
+    return statement.lstrip().lower().startswith("select count(*)")
+
+
+QUERIES: dict[str, Callable[[int, int], object]] = {
+    "api_sites_latest": lambda site_id, user_id: db.session.scalars(
+        hs_repo.order_api_sites(select(SiteCard), "latest").limit(20)
+    ).all(),
+    "api_sites_most_visited": lambda site_id, user_id: db.session.scalars(
+        hs_repo.order_api_sites(select(SiteCard), "most-visited").limit(20)
+    ).all(),
+    "api_sites_rating": lambda site_id, user_id: db.session.scalars(
+        hs_repo.order_api_sites(select(SiteCard), "rating-5-1").limit(20)
+    ).all(),
+    # Una version que nunca coincide obliga a rearmar el documento del detalle
+    "site_document": lambda site_id, user_id: hs_repo.get_site_documents({site_id: -1}),
+    "site_reviews": lambda site_id, user_id: reviews_repo.latest_approved_reviews([site_id], 10),
+    "site_images": lambda site_id, user_id: hs_repo.get_active_images(site_id),
+    "admin_sites_recent": lambda site_id, user_id: hs_repo.list_historic_sites_paginated(order="recientes"),
+    "user_favorites": lambda site_id, user_id: user_repo.get_favorite_site_ids(user_id),
+}
+
+
+@pytest.mark.parametrize("name", QUERIES)
+def test_query_avoids_seq_scan_on_large_tables(seeded, name):
+    site_id, user_id = seeded
+    with captured_selects() as statements:
+        QUERIES[name](site_id, user_id)
+    db.session.rollback()
+
+    assert statements
+    conn = db.session.connection()
+    for statement, parameters in statements:
+        if _is_count(statement):
+            continue
+        [[explained]] = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).all()
+        assert not _seq_scans(explained[0]["Plan"]), statement
+    db.session.rollback()
@@ -0,0 +1,193 @@
+"""
+Ruteo de las lecturas de la API a las replicas. Usa las replicas de
+POSTGRES_TEST_REPLICA_URLS si hay alguna; si no, un engine mas sobre la base de tests hace
+de replica, que para el ruteo es lo mismo.
+"""
+
+import pytest
+from flask import g
+from sqlalchemy import create_engine, event
+
+from core import database
+from core.database import STICKY_COOKIE, db
+from core.historic_site import repository as historic_repo
+
+LAG_CHECK = "pg_last_wal_receive_lsn"
+
+
+@pytest.fixture
+def replica_statements(app, monkeypatch):
+    """Sentencias que reciben las replicas; la medicion del atraso queda aparte"""
+    monkeypatch.setattr(database, "_replica_lag", {})
+    added = None
+    if not database.replica_keys():
+        added = create_engine(app.config["SQLALCHEMY_DATABASE_URI"])
+        monkeypatch.setitem(db.engines, "replica", added)
+
+    statements = {"queries": [], "lag_checks": []}
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements["lag_checks" if LAG_CHECK in statement else "queries"].append(statement)
+
+    engines = [db.engines[key] for key in database.replica_keys()]
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", capture)
+    yield statements
+    for engine in engines:
+        event.remove(engine, "before_cursor_execute", capture)
+    db.session.remove()
+    if added is not None:
+        added.dispose()
+
+
+def _new_request() -> None:
+    """El contexto de la app de los tests se comparte entre requests: se limpia el ruteo"""
+    g.pop("db_replica", None)
+    g.pop("db_wrote", None)
+
+
+@pytest.fixture
+def lagging_replica(app, replica_statements):
+    """
+    Congela lo que ve la replica: sus transacciones leen la foto de la base tomada al
+    llamar a la funcion devuelta, como una replica que todavia no aplico lo posterior
+    """
+    if app.config.get("SQLALCHEMY_BINDS"):
+        pytest.skip("la replica configurada no se puede atrasar a voluntad")
+    replica = db.engines["replica"]
+    holder = db.engine.connect().execution_options(isolation_level="REPEATABLE READ")
+
+    def freeze() -> None:
+        snapshot = holder.exec_driver_sql("SELECT pg_export_snapshot()").scalar()
+
+        def begin(conn):
+            conn.exec_driver_sql("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            conn.exec_driver_sql(f"SET TRANSACTION SNAPSHOT '{snapshot}'")
+
+        event.listen(replica, "begin", begin)
+        freeze.listener = begin
+
+    yield freeze
+    db.session.remove()
+    if hasattr(freeze, "listener"):
+        event.remove(replica, "begin", freeze.listener)
+    holder.close()
+
+
+def _is_write(statement: str) -> bool:
+    return statement.lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE"))
+
+
+def test_site_detail_reads_replica_without_sticking(client, create_site, replica_statements):
+    site = create_site()
+    _new_request()
+
+    response = client.get(f"/api/sites/{site.id}")
+
+    assert response.status_code == 200
+    assert response.json["visit_count"] == 1
+    # El documento se lee de la replica; la visita y el documento guardado van al primario
+    queries = replica_statements["queries"]
+    assert any("site_card" in statement for statement in queries)
+    assert not any(_is_write(statement) for statement in queries)
+    # Ni contar la visita ni guardar el documento obligan al cliente a leer del primario
+    assert client.get_cookie(STICKY_COOKIE) is None
+
+
+def test_write_sticks_client_to_primary(client, create_user, create_site, auth_headers, replica_statements):
+    user = create_user()
+    site = create_site(user=user)
+    headers = auth_headers(user=user)
+    assert client.get_cookie(STICKY_COOKIE) is None
+    _new_request()
+
+    response = client.put(f"/api/sites/{site.id}/favorite", headers=headers)
+
+    assert response.status_code == 204
+    cookie = client.get_cookie(STICKY_COOKIE)
+    assert cookie is not None and cookie.http_only
+
+    replica_statements["queries"].clear()
+    replica_statements["lag_checks"].clear()
+    _new_request()
+    response = client.get("/api/sites", headers=headers)
+
+    assert response.status_code == 200
+    assert replica_statements == {"queries": [], "lag_checks": []}
+
+
+def test_lagging_replica_falls_back_to_primary(client, app, create_site, replica_statements, monkeypatch):
+    create_site()
+    monkeypatch.setitem(app.config, "REPLICA_MAX_LAG_SECONDS", -1)
+    _new_request()
+
+    response = client.get("/api/sites")
+
+    assert response.status_code == 200
+    assert response.json["_meta"]["total_items"] == 1
+    assert replica_statements["lag_checks"]
+    assert replica_statements["queries"] == []
+
+
+def test_unreachable_replica_counts_as_lagging(app, monkeypatch):
+    monkeypatch.setattr(database, "_replica_lag", {})
+    unreachable = create_engine("postgresql+psycopg2://nobody@127.0.0.1:1/none")
+    monkeypatch.setitem(db.engines, "replica_unreachable", unreachable)
+
+    assert database.replica_lag("replica_unreachable") == float("inf")
+    unreachable.dispose()
+
+
+def test_batch_rebuilding_documents_stays_public(client, create_site, replica_statements):
+    site = create_site()
+    _new_request()
+
+    # Primera lectura: el documento se arma y se guarda en site_card
+    response = client.get(f"/api/sites/batch?ids={site.id}")
+
+    assert response.status_code == 200
+    assert response.cache_control.public
+    assert "Set-Cookie" not in response.headers
+
+
+def test_public_response_never_carries_sticky_cookie(app, replica_statements):
+    with app.test_request_context("/api/sites"):
+        g.db_wrote = True
+        public = app.response_class()
+        public.cache_control.public = True
+        private = app.response_class()
+
+        assert "Set-Cookie" not in database._stick_to_primary_after_write(public).headers
+        assert STICKY_COOKIE in database._stick_to_primary_after_write(private).headers["Set-Cookie"]
+        _new_request()
+
+
+def _edit_after_replica_froze(site, lagging_replica) -> None:
+    lagging_replica()
+    site.short_description = "Descripcion nueva"
+    historic_repo.refresh_site_cards([site.id])
+    db.session.commit()
+    _new_request()
+
+
+def test_site_detail_is_not_rebuilt_from_lagging_replica(client, create_site, lagging_replica):
+    site = create_site()
+    _edit_after_replica_froze(site, lagging_replica)
+
+    response = client.get(f"/api/sites/{site.id}")
+
+    assert response.status_code == 200
+    assert response.json["short_description"] == "Descripcion nueva"
+    # El documento guardado tambien es el nuevo
+    _new_request()
+    assert client.get(f"/api/sites/{site.id}").json["short_description"] == "Descripcion nueva"
+
+
+def test_site_batch_is_not_rebuilt_from_lagging_replica(client, create_site, lagging_replica):
+    site = create_site()
+    _edit_after_replica_froze(site, lagging_replica)
+
+    response = client.get(f"/api/sites/batch?ids={site.id}")
+
+    assert response.status_code == 200
+    assert response.json["data"][0]["short_description"] == "Descripcion nueva"
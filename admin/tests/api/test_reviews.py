@@ -1,4 +1,15 @@
-from core.reviews.models import ReviewState
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm.attributes import set_committed_value
+
+from core.auth import repository as user_repo
+from core.database import INCLUDE_DELETED, db
+from core.feature_flags import repository as flags_repo
+from core.feature_flags.models import Flag
+from core.reviews import repository as review_repo
+from core.reviews.models import Review, ReviewState
 
 
 def test_get_all_site_reviews_unauthorized(client, create_site):
@@ -34,14 +45,14 @@ def test_get_all_site_reviews_empty(client, create_user, create_site, create_rev
     }
 
 
-def test_get_all_site_reviews_200(client, create_review, auth_headers, create_user, create_site):
+def test_get_all_site_reviews_200(client, create_review, auth_headers, create_user, create_site, as_json):
     user = create_user()
     site = create_site(user=user)
     review = create_review(user=user, site=site)
     headers = auth_headers(user=user)
     response = client.get("/api/sites/1/reviews", headers=headers)
     assert response.status_code == 200
-    assert response.json["data"] == [review.to_dict()]
+    assert response.json["data"] == as_json([review.to_dict()])
     assert response.json["_meta"] == {
         "page": 1,
         "per_page": 10,
@@ -176,7 +187,7 @@ def test_get_site_review_404_site(client, create_user, create_site, auth_headers
     assert response.status_code == 404
     assert "Site not found" in response.json["error"]["message"]
 
-def test_get_site_review_200(client, create_user, create_site, create_review, auth_headers):
+def test_get_site_review_200(client, create_user, create_site, create_review, auth_headers, as_json):
     user = create_user()
     site = create_site(user=user)
     review = create_review(user=user, site=site)
@@ -184,7 +195,7 @@ def test_get_site_review_200(client, create_user, create_site, create_review, au
 
     response = client.get(f"/api/sites/{site.id}/reviews/{review.id}", headers=headers)
     assert response.status_code == 200
-    assert response.json == review.to_dict()
+    assert response.json == as_json(review.to_dict())
 
 
 def test_remove_site_review_401(client, create_site):
@@ -249,8 +260,33 @@ def test_remove_site_review_204(client, create_user, create_site, create_review,
 
     response = client.delete(f"/api/sites/{site.id}/reviews/{review.id}", headers=headers)
     assert response.status_code == 204
-    assert len(site.reviews) == 1
-    assert site.reviews[0].deleted == True
+    # La review sigue en la base, pero las consultas ya no la ven salvo que lo pidan
+    assert db.session.query(Review).filter_by(historic_site_id=site.id).count() == 0
+    stored = db.session.scalars(
+        select(Review).where(Review.historic_site_id == site.id), execution_options=INCLUDE_DELETED
+    ).all()
+    assert [(r.id, r.deleted) for r in stored] == [(review.id, True)]
+
+
+def test_review_of_deleted_user_keeps_its_author(client, create_user, create_site, create_review, auth_headers):
+    viewer = create_user()
+    author = create_user(email="author@gmail.com", name="Ana", last_name="Gómez")
+    site = create_site(user=viewer)
+    headers = auth_headers(user=viewer)
+    review = create_review(user=author, site=site)
+    db.session.commit()
+    user_repo.delete_user(author.id)
+    db.session.expire_all()
+
+    # Las colecciones ocultan lo eliminado, pero la referencia al autor sigue resolviendo
+    stored = db.session.get(Review, review.id)
+    assert stored.user is not None and stored.user.deleted
+    assert stored.to_dict()["user_name"] == "Ana Gómez"
+    assert author.reviews == [stored]
+
+    response = client.get(f"/api/sites/{site.id}/reviews", headers=headers)
+    assert response.status_code == 200
+    assert [r["user_name"] for r in response.json["data"]] == ["Ana Gómez"]
 
 
 def test_get_my_reviews_unauthorized(client):
@@ -316,6 +352,21 @@ def test_list_reviews_of_user_returns_only_user_approved_reviews(
     assert ids == {r1.id, r2.id}
 
 
+def test_list_reviews_of_user_filtered_by_site(client, create_user, create_site, create_review, auth_headers):
+    user = create_user()
+    headers = auth_headers(user=user)
+    site = create_site(user=user)
+    other_site = create_site(user=user, name="Cabildo")
+    review = create_review(user=user, site=site)
+    create_review(user=user, site=other_site)
+
+    response = client.get(f"/api/me/reviews?site_id={site.id}", headers=headers)
+
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json["data"]] == [review.id]
+    assert response.json["_links"]["self"] == f"/api/me/reviews?page=1&per_page=10&site_id={site.id}"
+
+
 
 def test_list_reviews_of_user_pagination(
     client, create_user, create_site, create_review, auth_headers
@@ -348,7 +399,7 @@ def test_list_reviews_of_user_pagination(
     assert data["_meta"]["page"] == 2
 
 
-def test_get_my_reviews_filters_deleted(client, create_user, create_site, create_review, auth_headers):
+def test_get_my_reviews_filters_deleted(client, create_user, create_site, create_review, auth_headers, as_json):
     user = create_user()
     headers = auth_headers(user=user)
     site = create_site(user=user)
@@ -363,7 +414,7 @@ def test_get_my_reviews_filters_deleted(client, create_user, create_site, create
     response = client.get("/api/me/reviews", headers=headers)
     assert response.status_code == 200
 
-    assert response.json["data"] == [r1.to_dict()]  # Solo la no eliminada
+    assert response.json["data"] == as_json([r1.to_dict()])  # Solo la no eliminada
     assert response.json["_meta"]["total_items"] == 1
 
 
@@ -372,11 +423,289 @@ def test_get_my_reviews_internal_error(client, create_user, auth_headers, monkey
     headers = auth_headers(user=user)
 
     # Simular ValueError dentro del try (como el except del método)
-    def fake_get_user(_):
+    def fake_to_collection_dict(*args, **kwargs):
         raise ValueError()
 
-    monkeypatch.setattr("core.auth.repository.get_user", fake_get_user)
+    monkeypatch.setattr(Review, "to_collection_dict", fake_to_collection_dict)
 
     response = client.get("/api/me/reviews", headers=headers)
     assert response.status_code == 500
     assert response.json["error"]["code"] == "server_error"
+
+
+def test_get_site_reviews_summary_404(client):
+    response = client.get("/api/sites/1/reviews/summary")
+    assert response.status_code == 404
+
+
+def test_get_site_reviews_summary_counts_only_approved(client, create_user, create_site, create_review):
+    user = create_user()
+    site = create_site(user=user)
+    for rating in (5, 4, 4):
+        review = create_review(user=user, site=site, state=ReviewState.PENDING, rating=rating)
+        review_repo.aprove_review(review)
+    create_review(user=user, site=site, state=ReviewState.PENDING, rating=1)
+
+    response = client.get(f"/api/sites/{site.id}/reviews/summary")
+    assert response.status_code == 200
+    assert response.json == {
+        "histogram": {"1": 0, "2": 0, "3": 0, "4": 2, "5": 1},
+        "total": 3,
+        "average": 4.33,
+    }
+
+
+def test_moderating_a_stale_review_counts_it_once(client, create_user, create_site, create_review):
+    user = create_user()
+    site = create_site(user=user)
+    review = create_review(user=user, site=site, state=ReviewState.PENDING, rating=5)
+    review_repo.aprove_review(review)
+
+    # Otro moderador la abrio antes de la aprobacion y todavia la ve pendiente
+    set_committed_value(review, "state", ReviewState.PENDING)
+    review_repo.aprove_review(review)
+
+    response = client.get(f"/api/sites/{site.id}/reviews/summary")
+    assert response.json["total"] == 1
+
+    set_committed_value(review, "state", ReviewState.PENDING)
+    review_repo.delete_review_db(review)
+
+    response = client.get(f"/api/sites/{site.id}/reviews/summary")
+    assert response.json["total"] == 0
+
+
+def test_site_reviews_summary_updates_on_delete(client, create_user, create_site, create_review, auth_headers):
+    user = create_user()
+    site = create_site(user=user)
+    review = create_review(user=user, site=site, state=ReviewState.PENDING, rating=5)
+    review_repo.aprove_review(review)
+    flags_repo.create_flag(name=Flag.REVIEWS_ENABLED.value, enabled=True)
+    headers = auth_headers(user=user)
+
+    response = client.delete(f"/api/sites/{site.id}/reviews/{review.id}", headers=headers)
+    assert response.status_code == 204
+
+    response = client.get(f"/api/sites/{site.id}")
+    assert response.json["rating_summary"]["total"] == 0
+    assert response.json["rating_summary"]["average"] is None
+
+
+# Cola de moderacion -----------------------------------------------------
+def _pending_reviews(create_user, create_site, create_review, count: int) -> list[Review]:
+    author = create_user(email="autor@gmail.com")
+    site = create_site(user=author)
+    reviews = [create_review(user=author, site=site, state=ReviewState.PENDING) for _ in range(count)]
+    db.session.commit()
+    return reviews
+
+
+def _claims() -> dict[int, int | None]:
+    db.session.expire_all()
+    return {review.id: review.claimed_by for review in db.session.scalars(select(Review))}
+
+
+def test_claim_pending_reviews_in_arrival_order(client, create_user, create_site, create_review):
+    moderator = create_user()
+    reviews = _pending_reviews(create_user, create_site, create_review, 3)
+    create_review(user=reviews[0].user, site=reviews[0].historic_site, state=ReviewState.APPROVED)
+    db.session.commit()
+
+    claimed = review_repo.claim_pending_reviews(moderator.id, batch_size=2)
+
+    assert [review.id for review in claimed] == [reviews[0].id, reviews[1].id]
+    assert review_repo.claimed_reviews(moderator.id) == claimed
+    # Otro moderador recibe lo que queda de la cola, no lo ya reclamado
+    other = create_user(email="otro@gmail.com")
+    assert [review.id for review in review_repo.claim_pending_reviews(other.id)] == [reviews[2].id]
+
+
+def test_claim_skips_reviews_locked_by_another_moderator(client, create_user, create_site, create_review):
+    moderator = create_user()
+    reviews = _pending_reviews(create_user, create_site, create_review, 4)
+    locked_query = (
+        select(Review.id)
+        .where(Review.id.in_([reviews[0].id, reviews[1].id]))
+        .with_for_update()
+    )
+
+    # Otra transaccion tiene tomadas las dos primeras mientras el moderador reclama
+    with db.engine.connect() as other, other.begin():
+        locked = set(other.scalars(locked_query))
+        claimed = review_repo.claim_pending_reviews(moderator.id, batch_size=2)
+
+    assert locked == {reviews[0].id, reviews[1].id}
+    assert [review.id for review in claimed] == [reviews[2].id, reviews[3].id]
+
+
+def test_expired_claim_returns_to_queue(client, create_user, create_site, create_review):
+    moderator = create_user()
+    other = create_user(email="otro@gmail.com")
+    reviews = _pending_reviews(create_user, create_site, create_review, 2)
+
+    review_repo.claim_pending_reviews(moderator.id, ttl=timedelta(0))
+
+    assert review_repo.claimed_reviews(moderator.id) == []
+    claimed = review_repo.claim_pending_reviews(other.id)
+    assert [review.id for review in claimed] == [review.id for review in reviews]
+
+
+def test_release_claims_returns_only_own_reviews(client, create_user, create_site, create_review):
+    moderator = create_user()
+    other = create_user(email="otro@gmail.com")
+    reviews = _pending_reviews(create_user, create_site, create_review, 2)
+    review_repo.claim_pending_reviews(moderator.id, batch_size=1)
+    review_repo.claim_pending_reviews(other.id, batch_size=1)
+
+    review_repo.release_claims(moderator.id)
+
+    assert _claims() == {reviews[0].id: None, reviews[1].id: other.id}
+
+
+def test_queue_claims_batch_for_moderator(client, app, create_user, create_site, create_review, panel_login, monkeypatch):
+    monkeypatch.setitem(app.config, "REVIEW_QUEUE_BATCH_SIZE", 2)
+    moderator = create_user()
+    reviews = _pending_reviews(create_user, create_site, create_review, 3)
+    panel_login(moderator, "reviews_management")
+
+    response = client.get("/reviews/queue")
+
+    assert response.status_code == 200
+    assert _claims() == {reviews[0].id: moderator.id, reviews[1].id: moderator.id, reviews[2].id: None}
+    # Mientras el reclamo siga vigente, la cola muestra el mismo lote
+    assert client.get("/reviews/queue").status_code == 200
+    assert _claims()[reviews[2].id] is None
+
+
+def test_queue_claim_expires_with_review_claim_ttl(
+    client, app, create_user, create_site, create_review, panel_login, monkeypatch
+):
+    monkeypatch.setitem(app.config, "REVIEW_CLAIM_TTL", timedelta(0))
+    moderator = create_user()
+    other = create_user(email="otro@gmail.com")
+    reviews = _pending_reviews(create_user, create_site, create_review, 2)
+    panel_login(moderator, "reviews_management")
+
+    assert client.get("/reviews/queue").status_code == 200
+
+    assert [review.id for review in review_repo.claim_pending_reviews(other.id)] == [r.id for r in reviews]
+
+
+def test_queue_next_claims_after_last_seen(client, app, create_user, create_site, create_review, panel_login, monkeypatch):
+    monkeypatch.setitem(app.config, "REVIEW_QUEUE_BATCH_SIZE", 1)
+    moderator = create_user()
+    reviews = _pending_reviews(create_user, create_site, create_review, 3)
+    panel_login(moderator, "reviews_management")
+    client.get("/reviews/queue")
+
+    response = client.post(
+        "/reviews/queue/next",
+        data={"last_inserted_at": reviews[0].inserted_at.isoformat(), "last_id": reviews[0].id},
+    )
+
+    assert response.status_code == 302
+    assert _claims() == {reviews[0].id: None, reviews[1].id: moderator.id, reviews[2].id: None}
+
+
+def test_queue_next_ignores_malformed_cursor(client, app, create_user, create_site, create_review, panel_login, monkeypatch):
+    monkeypatch.setitem(app.config, "REVIEW_QUEUE_BATCH_SIZE", 1)
+    moderator = create_user()
+    reviews = _pending_reviews(create_user, create_site, create_review, 2)
+    panel_login(moderator, "reviews_management")
+
+    response = client.post("/reviews/queue/next", data={"last_inserted_at": "ayer", "last_id": reviews[0].id})
+
+    assert response.status_code == 302
+    assert _claims() == {reviews[0].id: moderator.id, reviews[1].id: None}
+
+
+def test_queue_release_returns_batch(client, create_user, create_site, create_review, panel_login):
+    moderator = create_user()
+    reviews = _pending_reviews(create_user, create_site, create_review, 2)
+    panel_login(moderator, "reviews_management")
+    client.get("/reviews/queue")
+
+    response = client.post("/reviews/queue/release")
+
+    assert response.status_code == 302
+    assert _claims() == {review.id: None for review in reviews}
+
+
+# Acciones masivas -------------------------------------------------------
+def _states() -> dict[int, ReviewState]:
+    db.session.expire_all()
+    return {review.id: review.state for review in db.session.scalars(select(Review))}
+
+
+def test_bulk_action_with_empty_filters_requires_confirmation(client, create_user, create_site, create_review):
+    reviews = _pending_reviews(create_user, create_site, create_review, 2)
+    empty = {"site_id": None, "state": "", "rating": None, "date": "", "user": ""}
+
+    with pytest.raises(ValueError):
+        review_repo.bulk_approve_reviews(filters=empty)
+    assert set(_states().values()) == {ReviewState.PENDING}
+
+    count, _ = review_repo.bulk_approve_reviews(filters=empty, confirm_all=True)
+
+    assert count == 2
+    assert _states() == {review.id: ReviewState.APPROVED for review in reviews}
+
+
+def test_bulk_action_with_a_filter_needs_no_confirmation(client, create_user, create_site, create_review):
+    reviews = _pending_reviews(create_user, create_site, create_review, 2)
+    reviews[0].rating = 1
+    db.session.commit()
+
+    count, _ = review_repo.bulk_reject_reviews(
+        "Spam", filters={"site_id": None, "state": "", "rating": 1, "date": "", "user": ""}
+    )
+
+    assert count == 1
+    assert _states() == {reviews[0].id: ReviewState.REJECTED, reviews[1].id: ReviewState.PENDING}
+
+
+def test_bulk_approve_selected_reviews(client, create_user, create_site, create_review, panel_login):
+    moderator = create_user()
+    reviews = _pending_reviews(create_user, create_site, create_review, 3)
+    panel_login(moderator, "reviews_management")
+
+    response = client.post("/reviews/bulk/approve", data={"review_ids": [reviews[0].id, reviews[2].id]})
+
+    assert response.status_code == 302
+    assert _states() == {
+        reviews[0].id: ReviewState.APPROVED,
+        reviews[1].id: ReviewState.PENDING,
+        reviews[2].id: ReviewState.APPROVED,
+    }
+
+
+def test_bulk_delete_all_filtered_without_filters_needs_confirm_all(
+    client, create_user, create_site, create_review, panel_login
+):
+    moderator = create_user()
+    reviews = _pending_reviews(create_user, create_site, create_review, 2)
+    panel_login(moderator, "reviews_management")
+    form = {"apply_to": "filter", "site_id": "", "state": "", "rating": "", "fecha_rango": "", "search_user": ""}
+
+    assert client.post("/reviews/bulk/delete", data=form).status_code == 302
+    assert set(_states()) == {review.id for review in reviews}
+
+    assert client.post("/reviews/bulk/delete", data={**form, "confirm_all": "1"}).status_code == 302
+    assert _states() == {}
+
+
+def test_bulk_reject_filtered_by_site(client, create_user, create_site, create_review, panel_login):
+    moderator = create_user()
+    reviews = _pending_reviews(create_user, create_site, create_review, 1)
+    other_site = create_site(user=moderator, name="Cabildo")
+    other = create_review(user=moderator, site=other_site, state=ReviewState.PENDING)
+    db.session.commit()
+    panel_login(moderator, "reviews_management")
+
+    response = client.post(
+        "/reviews/bulk/reject",
+        data={"apply_to": "filter", "site_id": other_site.id, "reason": "Fuera de tema"},
+    )
+
+    assert response.status_code == 302
+    assert _states() == {reviews[0].id: ReviewState.PENDING, other.id: ReviewState.REJECTED}
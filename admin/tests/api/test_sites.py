@@ -1,4 +1,13 @@
 import pytest
+from geoalchemy2 import WKTElement
+
+from core import suggest
+from core.database import INCLUDE_DELETED, db
+from core.historic_site import repository as historic_repo
+from core.historic_site.models import HistoricSite, SiteCard
+from core.reviews import repository as reviews_repo
+from core.reviews.models import ReviewState
+from core.tags import repository as tags_repo
 
 
 def test_get_site_id_404(client):
@@ -10,7 +19,112 @@ def test_get_site_id_200(client, create_site):
     site = create_site()
     response = client.get("/api/sites/1")
     assert response.status_code == 200
-    assert response.json == site.to_dict()
+    assert response.json["id"] == site.id
+    assert response.json["name"] == site.name
+    assert (response.json["lat"], response.json["long"]) == pytest.approx((-34.9226, -57.9561))
+    assert response.json["visit_count"] == 1
+    assert response.json["reviews"] == []
+    assert response.json["reviews_next"] is None
+    assert response.json["rating_summary"]["total"] == 0
+
+
+def _approved_reviews(create_user, create_review, site, count: int) -> list:
+    """Crea ``count`` reviews aprobadas del sitio, cada una de un usuario distinto"""
+    reviews = []
+    for number in range(count):
+        user = create_user(email=f"reviewer{number}@gmail.com")
+        review = create_review(user=user, site=site, state=ReviewState.PENDING, rating=number % 5 + 1)
+        reviews.append(reviews_repo.aprove_review(review))
+    return reviews
+
+
+def test_get_site_embeds_only_latest_approved_reviews(client, create_user, create_site, create_review):
+    site = create_site(user=create_user())
+    reviews = _approved_reviews(create_user, create_review, site, 7)
+    create_review(user=create_user(email="pending@gmail.com"), site=site, state=ReviewState.PENDING)
+
+    response = client.get(f"/api/sites/{site.id}")
+
+    assert response.status_code == 200
+    # Las 5 mas recientes (API_EMBEDDED_REVIEWS) y el enlace al resto del listado
+    assert [r["id"] for r in response.json["reviews"]] == [r.id for r in reversed(reviews)][:5]
+    assert response.json["reviews_next"] == f"/api/sites/{site.id}/reviews?page=2&per_page=5"
+    assert response.json["rating_summary"]["total"] == 7
+
+
+def test_get_site_without_more_reviews_has_no_next(client, create_user, create_site, create_review):
+    site = create_site(user=create_user())
+    reviews = _approved_reviews(create_user, create_review, site, 5)
+
+    response = client.get(f"/api/sites/{site.id}")
+
+    assert [r["id"] for r in response.json["reviews"]] == [r.id for r in reversed(reviews)]
+    assert response.json["reviews_next"] is None
+
+
+def test_latest_approved_reviews_bounded_per_site(client, create_user, create_site, create_review):
+    user = create_user()
+    first = create_site(user=user, name="Cabildo")
+    second = create_site(user=user, name="Catedral")
+    empty = create_site(user=user, name="Museo")
+    first_reviews = _approved_reviews(create_user, create_review, first, 3)
+    second_review = create_review(user=user, site=second, state=ReviewState.PENDING)
+    reviews_repo.aprove_review(second_review)
+    create_review(user=create_user(email="pending@gmail.com"), site=second, state=ReviewState.PENDING)
+    deleted = create_review(user=create_user(email="deleted@gmail.com"), site=second)
+    deleted.deleted = True
+    db.session.commit()
+
+    latest = reviews_repo.latest_approved_reviews([first.id, second.id, empty.id], 2)
+
+    assert latest[first.id] == [first_reviews[2], first_reviews[1]]
+    assert latest[second.id] == [second_review]
+    assert latest[empty.id] == []
+    assert reviews_repo.latest_approved_reviews([first.id], 0) == {first.id: []}
+
+
+def test_get_site_document_rebuilt_on_change(client, create_user, create_site, create_review):
+    user = create_user()
+    site = create_site(user=user)
+    assert client.get(f"/api/sites/{site.id}").json["visit_count"] == 1
+
+    version = db.session.get(SiteCard, site.id).document_version
+    response = client.get(f"/api/sites/{site.id}")
+    assert response.json["visit_count"] == 2
+    assert response.json["reviews"] == []
+
+    review = create_review(user=user, site=site, state=ReviewState.PENDING, rating=4)
+    reviews_repo.aprove_review(review)
+    assert db.session.get(SiteCard, site.id).document_version > version
+
+    response = client.get(f"/api/sites/{site.id}")
+    assert response.json["rating_summary"]["total"] == 1
+    assert [r["id"] for r in response.json["reviews"]] == [review.id]
+    assert response.json["visit_count"] == 3
+
+
+def test_get_sites_batch_in_request_order(client, create_user, create_site):
+    user = create_user()
+    first = create_site(user=user, name="Cabildo")
+    second = create_site(user=user, name="Catedral")
+    detail = client.get(f"/api/sites/{second.id}").json
+
+    response = client.get(f"/api/sites/batch?ids={second.id},999,{first.id}")
+
+    assert response.status_code == 200
+    second_item, missing, first_item = response.json["data"]
+    assert second_item == detail
+    assert missing == {"id": 999, "error": {"code": "not_found", "message": "Site not found", "details": None}}
+    assert (first_item["id"], first_item["visit_count"]) == (first.id, 0)
+    # El batch no cuenta como visita
+    assert client.get(f"/api/sites/{second.id}").json["visit_count"] == 2
+
+
+@pytest.mark.parametrize("ids", ["", "1,a", "1,,2", ",".join(["1"] * 51)])
+def test_get_sites_batch_invalid_ids(client, ids):
+    response = client.get(f"/api/sites/batch?ids={ids}")
+    assert response.status_code == 400
+    assert response.json["error"]["code"] == "invalid_query"
 
 
 def test_post_sites_not_authenticated(client):
@@ -59,14 +173,14 @@ def test_get_sites_empty(client, page, per_page):
 
 
 @pytest.mark.parametrize("page,per_page", [(1, 10)])
-def test_get_sites_not_empty(client, create_site, create_user, page, per_page):
+def test_get_sites_not_empty(client, create_site, create_user, as_json, page, per_page):
     # Crear un sitio histórico de prueba
     user = create_user()
     site = create_site(user=user)
     endpoint = f"/api/sites?page={page}&per_page={per_page}"
     response = client.get(endpoint)
     assert response.status_code == 200
-    assert response.json["data"] == [site.to_dict()]
+    assert response.json["data"] == as_json([db.session.get(SiteCard, site.id).to_dict()])
     assert response.json["_meta"] == {
         "page": 1,
         "per_page": 10,
@@ -90,3 +204,253 @@ def test_get_sites_invalid_params(client, lat, long, per_page):
     assert "lat" in response.json["error"]["details"]
     assert "long" in response.json["error"]["details"]
     assert "per_page" in response.json["error"]["details"]
+
+
+def test_get_sites_facets_empty(client):
+    response = client.get("/api/sites/facets")
+    assert response.status_code == 200
+    assert response.json == {
+        "total": 0,
+        "provinces": [],
+        "cities": [],
+        "states_of_conservation": [],
+        "inauguration_years": [],
+        "tags": [],
+    }
+
+
+def test_get_sites_facets_counts(client, create_user, create_site):
+    user = create_user()
+    create_site(user=user, name="Catedral de La Plata")
+    create_site(user=user, name="Cabildo de Córdoba", city="Córdoba", province="Córdoba", state_of_conservation="regular")
+
+    response = client.get("/api/sites/facets")
+    assert response.status_code == 200
+    assert response.json["total"] == 2
+    assert {"value": "Buenos Aires", "count": 1} in response.json["provinces"]
+    assert {"value": "Córdoba", "count": 1} in response.json["provinces"]
+    assert response.json["inauguration_years"] == [{"from": 1850, "to": 1899, "count": 2}]
+
+    response = client.get("/api/sites/facets?province=Córdoba")
+    assert response.json["total"] == 1
+    assert response.json["cities"] == [{"value": "Córdoba", "count": 1}]
+    assert response.json["states_of_conservation"] == [{"value": "regular", "count": 1}]
+
+
+def test_get_sites_facets_invalidated_on_site_write(client, create_user, create_site):
+    user = create_user()
+    create_site(user=user, name="Catedral de La Plata")
+    assert client.get("/api/sites/facets").json["total"] == 1
+
+    create_site(user=user, name="Museo de La Plata")
+    assert client.get("/api/sites/facets").json["total"] == 2
+
+
+def test_get_tags_by_popularity_counts_site_usage(client, create_user, create_tags, auth_headers):
+    user = create_user()
+    create_tags()
+    headers = auth_headers(user=user)
+    site_data = {
+        "name": "Test Site",
+        "short_description": "Short desc",
+        "description": "Full desc",
+        "city": "Ciudad",
+        "province": "Provincia",
+        "lat": -31.42,
+        "long": -64.18,
+        "tags": ["Educativo"],
+        "state_of_conservation": "Bueno",
+        "inauguration_year": 1990
+    }
+    client.post("/api/sites", json=site_data, headers=headers)
+
+    response = client.get("/api/tags?order_by=popular")
+    assert response.status_code == 200
+    assert response.json[0] == {"id": response.json[0]["id"], "name": "educativo", "usage_count": 1}
+    assert all(tag["usage_count"] == 0 for tag in response.json[1:])
+
+
+def test_site_writes_adjust_only_their_tag_usage_counts(client, create_user, create_tags, create_site):
+    user = create_user()
+    create_tags()
+    site = create_site(user=user)
+    tags = {tag.name: tag for tag in tags_repo.list_all_tags()}
+    museo, educativo, clasico = tags["museo"], tags["educativo"], tags["clasico"]
+
+    def update_tags(tags):
+        historic_repo.update_historic_site(
+            site.id,
+            user.id,
+            name=site.name,
+            short_description=site.short_description,
+            description=site.description,
+            city=site.city,
+            province=site.province,
+            location=WKTElement(f"POINT({site.lon} {site.lat})", srid=4326),
+            state_of_conservation=site.state_of_conservation,
+            inauguration_year=site.inauguration_year,
+            visible=site.visible,
+            category=[],
+            tags=tags,
+        )
+
+    def usage():
+        db.session.expire_all()
+        return [tag.usage_count for tag in (museo, educativo, clasico)]
+
+    update_tags([museo, educativo])
+    assert usage() == [1, 1, 0]
+
+    update_tags([educativo, clasico])
+    assert usage() == [0, 1, 1]
+
+    historic_repo.delete_historic_site(site.id, user.id)
+    assert usage() == [0, 0, 0]
+
+
+def test_get_suggestions_folds_accents_and_ranks_by_visits(client, create_user, create_site):
+    user = create_user()
+    create_site(user=user, name="Catedral de La Plata")
+    cabildo = create_site(user=user, name="Cabildo de Córdoba", city="Córdoba", province="Córdoba")
+    client.get(f"/api/sites/{cabildo.id}")
+
+    response = client.get("/api/suggest?q=CA")
+    assert response.status_code == 200
+    assert [s["label"] for s in response.json["data"]][:2] == ["Cabildo de Córdoba", "Catedral de La Plata"]
+
+    response = client.get("/api/suggest?q=cordo")
+    assert {"type": "city", "label": "Córdoba"} in response.json["data"]
+
+
+def test_get_suggestions_updated_on_site_write(client, create_user, create_site):
+    user = create_user()
+    create_site(user=user, name="Catedral de La Plata")
+    assert client.get("/api/suggest?q=museo").json["data"] == []
+
+    museo = create_site(user=user, name="Museo de La Plata")
+    assert client.get("/api/suggest?q=museo").json["data"] == [{"type": "site", "id": museo.id, "label": "Museo de La Plata"}]
+
+
+def test_suggestions_rank_every_match_of_the_prefix():
+    index = suggest.SuggestIndex()
+    for site_id in range(3000):
+        index._put(suggest.Suggestion("site", site_id, f"Sitio {site_id:04d}", site_id), bulk=True)
+    index._keys.sort()
+
+    # Los mas visitados quedan al final del orden alfabetico del prefijo
+    assert [s.id for s in index.search("sitio", limit=2)] == [2999, 2998]
+
+
+def test_suggestions_keep_prefix_tops_on_writes():
+    index = suggest.SuggestIndex()
+    for site_id in range(3000):
+        index._put(suggest.Suggestion("site", site_id, f"Sitio {site_id:04d}", site_id), bulk=True)
+    index._keys.sort()
+    index._compute_short_tops()
+    assert [s.id for s in index.search("s", limit=1)] == [2999]
+    assert [s.id for s in index.search("sitio", limit=1)] == [2999]
+
+    # Las bajas de los primeros y un alta mejor se reflejan sin volver a recorrer el prefijo
+    for site_id in range(2999, 2950, -1):
+        index._remove(("site", site_id))
+    index._put(suggest.Suggestion("site", 5000, "Sitio nuevo", 2960))
+    index._put(suggest.Suggestion("site", 5001, "Sitio viejo", 1))
+
+    assert [s.id for s in index.search("s", limit=3)] == [5000, 2950, 2949]
+    assert [s.id for s in index.search("sitio", limit=3)] == [5000, 2950, 2949]
+
+
+def test_suggestions_refresh_only_tags_of_written_site(client, create_user, create_tags, auth_headers, monkeypatch):
+    user = create_user()
+    create_tags()
+    headers = auth_headers(user=user)
+    assert client.get("/api/suggest?q=edu").status_code == 200
+    refreshed = []
+    refresh_tags = suggest._index.refresh_tags
+    monkeypatch.setattr(
+        suggest._index, "refresh_tags", lambda tag_ids=None: refreshed.append(tag_ids) or refresh_tags(tag_ids)
+    )
+
+    client.post("/api/sites", json={
+        "name": "Test Site",
+        "short_description": "Short desc",
+        "description": "Full desc",
+        "city": "Ciudad",
+        "province": "Provincia",
+        "lat": -31.42,
+        "long": -64.18,
+        "tags": ["Educativo"],
+        "state_of_conservation": "Bueno",
+        "inauguration_year": 1990
+    }, headers=headers)
+
+    educativo = tags_repo.get_tags_by_names(["Educativo"])[0]
+    assert refreshed == [[educativo.id]]
+    assert suggest._index._entries[("tag", educativo.id)][0].score == 1
+
+
+def test_get_suggestions_invalid_limit(client):
+    response = client.get("/api/suggest?q=a&limit=100")
+    assert response.status_code == 400
+
+
+def test_server_timing_reports_sql_queries(client, app, create_site, monkeypatch):
+    create_site()
+    monkeypatch.setitem(app.config, "SQL_SERVER_TIMING", True)
+
+    response = client.get("/api/sites/1")
+    assert response.status_code == 200
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+    assert "queries" in response.headers["Server-Timing"]
+
+
+def test_get_sites_reads_site_cards(client, create_user, create_tags, create_site, auth_headers):
+    user = create_user()
+    create_tags()
+    headers = auth_headers(user=user)
+    site_data = {
+        "name": "Museo de La Plata",
+        "short_description": "Short desc",
+        "description": "Full desc",
+        "city": "La Plata",
+        "province": "Buenos Aires",
+        "lat": -34.91,
+        "long": -57.93,
+        "tags": ["Museo", "Educativo"],
+        "state_of_conservation": "bueno",
+        "inauguration_year": 1888
+    }
+    museo_id = client.post("/api/sites", json=site_data, headers=headers).json["id"]
+    create_site(user=user, name="Catedral de La Plata")
+
+    response = client.get("/api/sites?tags=museo,clasico")
+    assert response.status_code == 200
+    assert [s["name"] for s in response.json["data"]] == ["Museo de La Plata"]
+    assert response.json["data"][0]["tags"] == ["educativo", "museo"]
+    assert response.json["data"][0]["cover_image"] is None
+
+    # Renombrar un tag actualiza las tarjetas de sus sitios
+    museo_tag = next(tag for tag in tags_repo.list_all_tags() if tag.name == "museo")
+    tags_repo.update_tag(museo_tag.id, "Museos")
+    assert client.get("/api/sites?tags=museos").json["data"][0]["id"] == museo_id
+
+    historic_repo.delete_historic_site(museo_id, user.id)
+    assert db.session.get(SiteCard, museo_id) is None
+    assert [s["name"] for s in client.get("/api/sites").json["data"]] == ["Catedral de La Plata"]
+
+
+def test_soft_deleted_rows_hidden_unless_requested(client, create_user, create_site):
+    user = create_user()
+    site = create_site(user=user)
+    tag = tags_repo.create_tag(name="Museo")
+    historic_repo.delete_historic_site(site.id, user.id)
+    tags_repo.delete_tag(tag.id)
+    db.session.expunge_all()
+
+    assert historic_repo.get_historic_site(site.id) is None
+    assert tags_repo.get_tags_by_ids([tag.id]) == []
+    assert client.get(f"/api/sites/{site.id}/reviews/summary").status_code == 404
+    assert db.session.get(HistoricSite, site.id, execution_options=INCLUDE_DELETED).deleted
+
+    # Crear una etiqueta con el nombre de una eliminada la restaura
+    assert tags_repo.create_tag(name="Museo").id == tag.id
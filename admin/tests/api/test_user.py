@@ -1,5 +1,8 @@
 import pytest
 
+from core.auth import repository as user_repo
+
+
 def test_update_user_with_all_data(client, create_user, auth_headers):
     user = create_user()
     headers = auth_headers(user=user)
@@ -28,4 +31,43 @@ def test_update_user_only_name(client, create_user, auth_headers):
     assert response.status_code == 201
     assert user.name == "NuevoNombre"
     assert user.last_name == "Pérez"
-    assert user.avatar is None
\ No newline at end of file
+    assert user.avatar is None
+
+def test_get_profile_served_from_token_claims(client, create_user, auth_headers, monkeypatch):
+    user = create_user()
+    headers = auth_headers(user=user)
+
+    def fail_get_user(_):
+        raise AssertionError("get_user should not be called while the token is current")
+
+    monkeypatch.setattr("core.auth.repository.get_user", fail_get_user)
+
+    response = client.get("/api/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json == {"id": user.id, "email": user.email, "name": user.name, "avatar": None}
+
+
+def test_get_profile_revalidates_stale_token(client, create_user, auth_headers):
+    user = create_user()
+    headers = auth_headers(user=user)
+
+    client.put("/api/me", json={"name": "NuevoNombre"}, headers=headers)
+
+    # El token original quedo con la version anterior del perfil
+    response = client.get("/api/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json["name"] == "NuevoNombre"
+    assert "access_token_cookie" in response.headers.get("Set-Cookie", "")
+
+
+def test_token_of_deleted_user_is_rejected(client, create_user, auth_headers):
+    user = create_user()
+    headers = auth_headers(user=user)
+    assert client.get("/api/me/favorites/ids", headers=headers).status_code == 200
+
+    user_repo.delete_user(user.id)
+
+    assert client.get("/api/me/favorites/ids", headers=headers).status_code == 401
+    # En las rutas publicas la request pasa a ser anonima
+    response = client.get("/api/sites?only_favorites=true", headers=headers)
+    assert response.status_code == 401
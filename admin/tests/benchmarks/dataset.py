@@ -0,0 +1,70 @@
+"""Dataset sintetico de volumen configurable para los benchmarks."""
+
+from dataclasses import dataclass
+
+from sqlalchemy import func, select
+
+from core import seeds, synthetic
+from core.auth.models import User
+from core.database import db
+from core.historic_site.models import HistoricSite
+from core.tags.models import Tag
+
+
+@dataclass(frozen=True)
+class Scale:
+    sites: int
+    users: int
+    reviews_per_site: int = 5
+    favorites_per_user: int = 10
+    images_per_site: int = 3
+    tags: int = 200
+
+
+SCALES = {
+    "1k": Scale(sites=1_000, users=200),
+    "100k": Scale(sites=100_000, users=10_000),
+    "1m": Scale(sites=1_000_000, users=100_000),
+}
+
+
+def seed(scale: Scale, batch_size: int = 50_000, workers: int = 4) -> synthetic.GeneratedData:
+    """Recrea el esquema con los datos base de ``core.seeds`` y carga el volumen de ``scale``"""
+    db.drop_all()
+    db.create_all()
+    seeds.run()
+    return synthetic.generate(
+        sites=scale.sites,
+        reviews=scale.sites * scale.reviews_per_site,
+        users=scale.users,
+        tags=scale.tags,
+        images_per_site=scale.images_per_site,
+        favorites_per_user=scale.favorites_per_user,
+        batch_size=batch_size,
+        workers=workers,
+    )
+
+
+def sample_site_id() -> int:
+    """Id de un sitio para los casos de detalle (el del medio, sin sesgo hacia los extremos)"""
+    count = db.session.scalar(select(func.count()).select_from(HistoricSite))
+    return db.session.scalar(
+        select(HistoricSite.id).order_by(HistoricSite.id).offset(count // 2).limit(1)
+    )
+
+
+def sample_user_email() -> str:
+    """Email del primer usuario generado, que entra con ``synthetic.DEFAULT_PASSWORD``"""
+    return db.session.scalar(
+        select(User.email).where(User.email.like("usuario%@example.com")).order_by(User.id).limit(1)
+    )
+
+
+def sample_tag_names(count: int = 2) -> list[str]:
+    """Los tags mas usados, para que el filtro por tags no mida un resultado vacio"""
+    return list(db.session.scalars(select(Tag.name).order_by(Tag.usage_count.desc(), Tag.id).limit(count)))
+
+
+def sample_suggest_query(site_id: int) -> str:
+    """Prefijo de tres letras del nombre de un sitio generado ("cas" de "Casa San Martín N° 12")"""
+    return db.session.scalar(select(HistoricSite.name).where(HistoricSite.id == site_id))[:3].lower()
@@ -0,0 +1,87 @@
+"""
+Microbenchmark de la serializacion de coordenadas de los sitios.
+
+Compara, sin base de datos, el camino anterior (decodificar el WKB de ``location``
+con Shapely dos veces por sitio, una para ``lat`` y otra para ``lon``) con el actual
+(``lat``/``lon`` llegan como floats calculados con ``ST_Y``/``ST_X``)::
+
+    cd admin
+    python -m tests.benchmarks.geometry --rows 10000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import UTC, datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from geoalchemy2.shape import from_shape, to_shape  # noqa: E402
+from shapely.geometry import Point  # noqa: E402
+
+from core.historic_site.models import SiteCard  # noqa: E402
+
+
+def _cards(rows: int) -> list[SiteCard]:
+    rng = random.Random(42)
+    now = datetime.now(UTC)
+    cards = []
+    for i in range(rows):
+        lat, lon = rng.uniform(-55, -22), rng.uniform(-73, -53)
+        cards.append(SiteCard(
+            id=i,
+            name=f"Sitio {i}",
+            short_description="Descripcion breve",
+            city="La Plata",
+            province="Buenos Aires",
+            state_of_conservation="bueno",
+            inauguration_year=1900,
+            tags=["museo", "educativo"],
+            rating=4.5,
+            rating_count=10,
+            visit_count=100,
+            location=from_shape(Point(lon, lat), srid=4326),
+            lat=lat,
+            lon=lon,
+            inserted_at=now,
+            updated_at=now,
+        ))
+    return cards
+
+
+def _with_shapely(card: SiteCard) -> dict:
+    """Serializacion anterior: ``lat`` y ``lon`` decodificaban el WKB cada una"""
+    data = card.to_dict()
+    data["lat"] = to_shape(card.location).y
+    data["long"] = to_shape(card.location).x
+    return data
+
+
+def _throughput(serialize, cards: list[SiteCard], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for card in cards:
+            serialize(card)
+        best = min(best, time.perf_counter() - started)
+    return len(cards) / best
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    cards = _cards(args.rows)
+    before = _throughput(_with_shapely, cards, args.repeat)
+    after = _throughput(SiteCard.to_dict, cards, args.repeat)
+    print(f"shapely (antes)  {before:>12,.0f} sitios/s")
+    print(f"ST_Y/ST_X        {after:>12,.0f} sitios/s  ({after / before:.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
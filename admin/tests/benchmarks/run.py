@@ -0,0 +1,218 @@
+"""
+Benchmark de los caminos principales de la API y del panel de administracion.
+
+Carga un dataset sintetico en la base de testing, mide cada caso ``--repeat`` veces
+y guarda p50/p95 y cantidad de consultas SQL en un JSON que sirve de baseline::
+
+    cd admin
+    python -m tests.benchmarks.run --scale 1k --output baseline.json
+    python -m tests.benchmarks.run --scale 1k --skip-seed --compare baseline.json
+
+Con ``--compare`` termina con codigo 1 si algun caso empeora mas de ``--max-regression``.
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import replace
+from datetime import UTC, datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from core import cache, synthetic  # noqa: E402
+from tests.benchmarks import dataset  # noqa: E402
+from web import create_app  # noqa: E402
+
+_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+API_CASES = {
+    "api_sites_latest": "/api/sites?order_by=latest",
+    "api_sites_oldest": "/api/sites?order_by=oldest",
+    "api_sites_rating_desc": "/api/sites?order_by=rating-5-1",
+    "api_sites_rating_asc": "/api/sites?order_by=rating-1-5",
+    "api_sites_most_visited": "/api/sites?order_by=most-visited",
+    "api_sites_least_visited": "/api/sites?order_by=least-visited",
+    "api_sites_province": "/api/sites?province=Córdoba",
+    "api_sites_tags": "/api/sites?tags={tags}",
+    "api_sites_nearby": "/api/sites?lat=-34.92&long=-57.95&radius=200",
+    "api_sites_state": "/api/sites?state_of_conservation=bueno",
+    "api_sites_favorites": "/api/sites?only_favorites=true",
+    "api_site_detail": "/api/sites/{site_id}",
+    "api_site_reviews": "/api/sites/{site_id}/reviews",
+    "api_sites_facets": "/api/sites/facets",
+    "api_suggest": "/api/suggest?q={suggest_query}",
+    "api_me_favorites": "/api/me/favorites",
+}
+
+ADMIN_CASES = {
+    "admin_sites_list": "/historic_sites/list",
+    "admin_sites_export_csv": "/historic_sites/export-csv",
+    "admin_reviews_list": "/reviews/list",
+}
+
+
+def _percentile(samples: list[float], percentile: int) -> float:
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[percentile - 1]
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(client, url: str, repeat: int, warmup: int) -> dict:
+    """Mide una URL; los caches de la aplicacion se vacian antes de cada request"""
+    samples = []
+    queries = None
+    status = None
+    for i in range(warmup + repeat):
+        cache.clear_all()
+        started = time.perf_counter()
+        response = client.get(url)
+        elapsed = (time.perf_counter() - started) * 1000
+        status = response.status_code
+        match = _QUERIES.search(response.headers.get("Server-Timing", ""))
+        if match:
+            queries = int(match.group(1))
+        if i >= warmup:
+            samples.append(elapsed)
+    return {
+        "p50_ms": round(_percentile(samples, 50), 2),
+        "p95_ms": round(_percentile(samples, 95), 2),
+        "queries": queries,
+        "status": status,
+    }
+
+
+def run(args) -> dict:
+    scale = replace(
+        dataset.SCALES[args.scale],
+        **{
+            name: value
+            for name, value in (
+                ("sites", args.sites),
+                ("users", args.users),
+                ("reviews_per_site", args.reviews_per_site),
+                ("favorites_per_user", args.favorites_per_user),
+                ("images_per_site", args.images_per_site),
+            )
+            if value is not None
+        },
+    )
+
+    app = create_app(env="testing")
+    app.config.update(SQL_SERVER_TIMING=True, SQL_SLOW_QUERY_MS=float("inf"))
+
+    with app.app_context():
+        if not args.skip_seed:
+            started = time.perf_counter()
+            generated = dataset.seed(scale, batch_size=args.batch_size, workers=args.workers)
+            print(f"seeded {generated.counts()} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+        site_id = dataset.sample_site_id()
+        user_email = dataset.sample_user_email()
+        # Valores tomados de los datos generados: los casos de filtros no deben dar vacio
+        case_values = {
+            "site_id": site_id,
+            "tags": ",".join(dataset.sample_tag_names()),
+            "suggest_query": dataset.sample_suggest_query(site_id),
+        }
+        results = {}
+
+        with app.test_client() as client:
+            client.post("/api/auth", json={"email": user_email, "password": synthetic.DEFAULT_PASSWORD})
+            for name, url in API_CASES.items():
+                results[name] = measure(client, url.format(**case_values), args.repeat, args.warmup)
+                print(f"{name}: {results[name]}", file=sys.stderr)
+
+        with app.test_client() as client:
+            client.post("/auth/login", data={"email": "admin@gmail.com", "password": "admin1"})
+            for name, url in ADMIN_CASES.items():
+                results[name] = measure(client, url, args.repeat, args.warmup)
+                print(f"{name}: {results[name]}", file=sys.stderr)
+
+    return {
+        "meta": {
+            "commit": _commit(),
+            "scale": args.scale,
+            "dataset": scale.__dict__,
+            "repeat": args.repeat,
+            "timestamp": datetime.now(UTC).isoformat(),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, max_regression: float) -> list[str]:
+    """Imprime la diferencia con el baseline y devuelve los casos que empeoraron"""
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:<28} new")
+            continue
+        delta = (result["p95_ms"] - base["p95_ms"]) / base["p95_ms"] if base["p95_ms"] else 0.0
+        print(
+            f"{name:<28} p95 {base['p95_ms']:>9.2f} -> {result['p95_ms']:>9.2f} ms ({delta:+.0%})"
+            f"  queries {base['queries']} -> {result['queries']}"
+        )
+        more_queries = (
+            base["queries"] is not None
+            and result["queries"] is not None
+            and result["queries"] > base["queries"]
+        )
+        if delta > max_regression or more_queries:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=dataset.SCALES, default="1k")
+    parser.add_argument("--sites", type=int)
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--reviews-per-site", type=int)
+    parser.add_argument("--favorites-per-user", type=int)
+    parser.add_argument("--images-per-site", type=int)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--skip-seed", action="store_true", help="reusa los datos ya cargados")
+    parser.add_argument("--output", help="archivo JSON donde guardar los resultados")
+    parser.add_argument("--compare", help="baseline JSON contra el que comparar")
+    parser.add_argument(
+        "--max-regression", type=float, default=0.2, help="aumento de p95 tolerado (0.2 = 20%%)"
+    )
+    args = parser.parse_args(argv)
+
+    current = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+    else:
+        print(json.dumps(current, indent=2, ensure_ascii=False))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.max_regression)
+        if regressions:
+            print(f"regressions: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
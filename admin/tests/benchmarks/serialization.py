@@ -0,0 +1,128 @@
+"""
+Microbenchmark de la serializacion JSON de las respuestas de la API.
+
+Arma, sin base de datos, payloads con la forma real de una pagina de ``/api/sites``
+(100 tarjetas) y del detalle de un sitio (imagenes y reviews embebidas), y mide
+cuantas respuestas por segundo genera cada proveedor::
+
+    cd admin
+    python -m tests.benchmarks.serialization --repeat 200
+
+Sin orjson instalado solo se mide la libreria estandar.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import UTC, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+from web import json_provider  # noqa: E402
+from web.json_provider import APIJSONProvider  # noqa: E402
+
+
+def _card(rng: random.Random, i: int) -> dict:
+    now = datetime.now(UTC) - timedelta(days=rng.randint(0, 3000))
+    return {
+        "id": i,
+        "name": f"Sitio historico {i}",
+        "short_description": "Casona colonial declarada monumento histórico nacional",
+        "city": "Córdoba",
+        "province": "Córdoba",
+        "lat": rng.uniform(-55, -22),
+        "long": rng.uniform(-73, -53),
+        "state_of_conservation": "bueno",
+        "inauguration_year": rng.randint(1600, 1950),
+        "tags": ["museo", "arquitectura", "colonial"],
+        "inserted_at": now,
+        "updated_at": now,
+        "rating": round(rng.uniform(1, 5), 2),
+        "rating_count": rng.randint(0, 500),
+        "visit_count": rng.randint(0, 100_000),
+        "cover_image": {"url": f"https://cdn.example.com/sites/{i}/cover.jpg", "title": "Fachada"},
+        "favorited": rng.random() < 0.1,
+    }
+
+
+def _site_detail(rng: random.Random) -> dict:
+    detail = _card(rng, 1)
+    now = detail["inserted_at"]
+    detail.update(
+        description="Edificio del siglo XVIII. " * 30,
+        category=["Monumento"],
+        user_id=1,
+        rating_summary={"1": 3, "2": 5, "3": 20, "4": 60, "5": 112, "total": 200, "average": 4.36},
+        images_list=[
+            {
+                "id": n, "image": f"https://cdn.example.com/sites/1/{n}.jpg", "title": f"Imagen {n}",
+                "description": "Vista desde la plaza", "is_cover": n == 0, "order_index": n,
+                "created_at": now, "updated_at": now,
+            }
+            for n in range(10)
+        ],
+        reviews=[
+            {
+                "id": n, "site_id": 1, "rating": rng.randint(1, 5), "comment": "Muy lindo lugar para visitar. " * 5,
+                "user_id": n, "inserted_at": now, "updated_at": now,
+            }
+            for n in range(5)
+        ],
+        reviews_next="/api/sites/1/reviews?page=2&per_page=5",
+    )
+    return detail
+
+
+PAYLOADS = {
+    "api_sites_page": lambda rng: {
+        "data": [_card(rng, i) for i in range(100)],
+        "_meta": {"page": 1, "per_page": 100, "total_pages": 100, "total_items": 10_000},
+        "_links": {"self": "/api/sites?page=1&per_page=100", "next": "/api/sites?page=2&per_page=100"},
+    },
+    "api_site_detail": _site_detail,
+}
+
+
+def _providers(app: Flask) -> dict:
+    providers = {"stdlib (flask)": DefaultJSONProvider(app)}
+    stdlib = APIJSONProvider(app)
+    stdlib.fast = False
+    providers["stdlib (iso)"] = stdlib
+    if json_provider.orjson is not None:
+        providers["orjson"] = APIJSONProvider(app)
+    return providers
+
+
+def _throughput(provider, payload: dict, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        provider.response(payload)
+    return repeat / (time.perf_counter() - started)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    app = Flask(__name__)
+    providers = _providers(app)
+    with app.app_context():
+        for name, build in PAYLOADS.items():
+            payload = build(random.Random(42))
+            baseline = None
+            for provider_name, provider in providers.items():
+                rate = _throughput(provider, payload, args.repeat)
+                baseline = baseline or rate
+                size = len(provider.response(payload).get_data())
+                print(f"{name:<16} {provider_name:<15} {rate:>10,.0f} resp/s  {size:>8,} bytes  ({rate / baseline:.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())